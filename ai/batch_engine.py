@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Concurrent batch engine for OCR folder jobs
+Runs work units on a bounded pool and yields per-file results as they finish
+"""
+
+import os
+import asyncio
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class BatchEngine:
+    """Bounded, streaming batch runner
+
+    Each work unit is a list of file paths (a single PDF, or a small group of
+    images recognized together) and process_fn returns one result per path.
+    At most max_workers units are running at once; the next unit is only
+    pulled from the input once a worker thread has returned, so a
+    2,000-file folder never has more than a handful of documents in memory.
+
+    timeout applies per file (scaled by the unit size) and counts from when
+    the unit starts running. A unit that times out is reported as failed
+    and its result discarded; its thread cannot be interrupted, keeps its
+    slot until it returns, and is a daemon so it never blocks exit.
+    """
+
+    def __init__(self, process_fn: Callable[[List[str]], List[Dict[str, Any]]],
+                 max_workers: Optional[int] = None, timeout: Optional[float] = None):
+        self.process_fn = process_fn
+        self.max_workers = max(1, max_workers or min(4, os.cpu_count() or 1))
+        self.timeout = timeout
+
+    def _start(self, unit: List[str], loop: asyncio.AbstractEventLoop) -> Tuple[asyncio.Future, asyncio.Future]:
+        """Run process_fn(unit) on a new daemon thread; returns (started, finished) futures"""
+        started = loop.create_future()
+        finished = loop.create_future()
+        # A timed-out unit's outcome is never awaited
+        finished.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+        def settle(future: asyncio.Future, result: Any = None, error: Optional[BaseException] = None):
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+        def notify(*args):
+            try:
+                loop.call_soon_threadsafe(settle, *args)
+            except RuntimeError:
+                pass  # the stream has ended and its loop is closed
+
+        def run():
+            notify(started)
+            try:
+                result = self.process_fn(unit)
+            except Exception as e:
+                notify(finished, None, e)
+            else:
+                notify(finished, result)
+
+        threading.Thread(target=run, name="batch", daemon=True).start()
+        return started, finished
+
+    async def _run_unit(self, unit: List[str], started: asyncio.Future,
+                        finished: asyncio.Future) -> List[Dict[str, Any]]:
+        timeout = self.timeout * len(unit) if self.timeout else None
+
+        try:
+            await started
+            return await asyncio.wait_for(asyncio.shield(finished), timeout)
+        except asyncio.TimeoutError:
+            return [{
+                "success": False,
+                "error": f"Timed out after {self.timeout}s",
+                "file_path": file_path
+            } for file_path in unit]
+        except Exception as e:
+            return [{
+                "success": False,
+                "error": str(e),
+                "file_path": file_path
+            } for file_path in unit]
+
+    async def stream(self, units: Iterable[List[str]]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield one result per file, in completion order"""
+        loop = asyncio.get_running_loop()
+        unit_iter = iter(units)
+        live = set()     # threads that have not returned (as their finished futures)
+        reports = set()  # result tasks not yet yielded
+        exhausted = False
+
+        try:
+            while True:
+                # Backpressure: only pull new units while a thread is free
+                while not exhausted and len(live) < self.max_workers:
+                    try:
+                        unit = next(unit_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    started, finished = self._start(unit, loop)
+                    live.add(finished)
+                    reports.add(asyncio.ensure_future(self._run_unit(unit, started, finished)))
+
+                # Threads still running after a timeout are abandoned once nothing is left to report
+                if not reports and (exhausted or not live):
+                    break
+
+                done, _ = await asyncio.wait(reports | live, return_when=asyncio.FIRST_COMPLETED)
+                live = {future for future in live if not future.done()}
+                for task in done & reports:
+                    reports.discard(task)
+                    for result in task.result():
+                        yield result
+        finally:
+            for task in reports:
+                task.cancel()
+
+    def iter_results(self, units: Iterable[List[str]]) -> Iterator[Dict[str, Any]]:
+        """stream() for synchronous callers, driven on a private event loop"""
+        loop = asyncio.new_event_loop()
+        results = self.stream(units)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(results.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(results.aclose())
+            loop.close()
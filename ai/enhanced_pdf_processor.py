@@ -6,8 +6,8 @@ Supports hybrid text extraction + OCR for complex PDFs
 
 import sys
 import os
-import io
-from typing import Dict, List, Any, Optional, Tuple
+import hashlib
+from typing import Dict, List, Any, Optional, Tuple, Iterator
 from PIL import Image
 import numpy as np
 try:
@@ -24,6 +24,33 @@ except ImportError:
     HAS_FALLBACK = False
 import json
 
+from ocr_cache import CacheStore, make_cache_key
+from result_codec import encode_result, decode_result
+from pdf_session import PDFSession, pdf_session
+from layout import build_page_structure
+from field_extractor import extract_fields
+from instrumentation import measure, timed_iter
+from profiling import DocumentProfiler, profiled, attach_profile
+
+# Bump when analysis/text extraction output changes
+PDF_CACHE_VERSION = 1
+
+# Pages converted per poppler call when PyMuPDF is not available
+PDF_RENDER_CHUNK = 4
+
+# Text-layer blocks are reported in pixels at this DPI, like OCR'd pages
+TEXT_LAYOUT_DPI = 300
+
+# Words on one PDF line split into separate blocks across gaps wider than this
+# many line heights (table columns, label/value pairs)
+TEXT_LAYOUT_GAP_RATIO = 1.0
+
+# Page routing: pages with less text than this are OCR'd
+MIN_TEXT_CHARS = 50
+# ...as are pages mostly covered by images with only a little text on top
+SCAN_IMAGE_COVERAGE = 0.6
+SCAN_MAX_TEXT_CHARS = 200
+
 # Try to import additional PDF libraries
 try:
     import PyPDF2
@@ -46,9 +73,18 @@ except ImportError:
 class EnhancedPDFProcessor:
     """Enhanced PDF processor with hybrid text extraction and OCR"""
     
-    def __init__(self, cache_dir: str = "./pdf_cache"):
+    def __init__(self, cache_dir: str = "./pdf_cache", cache_store: Optional[CacheStore] = None,
+                 max_pages: Optional[int] = None, profiler: Optional[DocumentProfiler] = None):
+        """max_pages optionally caps the pages read from each PDF (None = all);
+        profiler samples process_pdf_hybrid calls for profiling"""
         self.cache_dir = cache_dir
-        os.makedirs(cache_dir, exist_ok=True)
+        self.max_pages = max_pages
+        self.profiler = profiler
+        
+        # Share the caller's cache store when given (SimpleOCR passes its own)
+        if cache_store is None:
+            cache_store = CacheStore(os.path.join(cache_dir, "cache.db"))
+        self.cache_store = cache_store
         
         # Print available PDF libraries
         print("📚 Available PDF Libraries:", file=sys.stderr)
@@ -56,25 +92,51 @@ class EnhancedPDFProcessor:
         print(f"   • pdfplumber: {'✅' if HAS_PDFPLUMBER else '❌'}", file=sys.stderr)
         print(f"   • PyMuPDF: {'✅' if HAS_PYMUPDF else '❌'}", file=sys.stderr)
     
-    def extract_text_from_pdf(self, pdf_path: str) -> Dict[str, Any]:
+    def _cached_step(self, step: str, pdf_path: str, compute) -> Dict[str, Any]:
+        """Memoize a per-file PDF step in the shared cache store"""
+        try:
+            key = make_cache_key(
+                self.cache_store.file_digest(pdf_path),
+                {"step": step, "version": PDF_CACHE_VERSION, "max_pages": self.max_pages}
+            )
+        except OSError:
+            return compute()
+        
+        data = self.cache_store.get(key, namespace="pdf")
+        if data is not None:
+            return json.loads(data)
+        
+        result = compute()
+        if result.get("success", True) and "error" not in result:
+            self.cache_store.put(key, json.dumps(result).encode("utf-8"), namespace="pdf")
+        return result
+    
+    def _page_limit(self, page_count: int) -> int:
+        """Number of pages to process, honouring max_pages"""
+        return page_count if self.max_pages is None else min(page_count, self.max_pages)
+    
+    def extract_text_from_pdf(self, pdf_path: str, session: Optional[PDFSession] = None) -> Dict[str, Any]:
         """Extract text directly from PDF (for text-based PDFs)"""
+        return self._cached_step("text", pdf_path, lambda: self._extract_text_from_pdf(pdf_path, session))
+    
+    def _extract_text_from_pdf(self, pdf_path: str, session: Optional[PDFSession] = None) -> Dict[str, Any]:
         extracted_text = []
         method_used = "none"
         
         # Method 1: Try PyMuPDF (fastest and most accurate)
         if HAS_PYMUPDF:
             try:
-                doc = fitz.open(pdf_path)
-                for page_num in range(min(len(doc), 20)):  # Limit to 20 pages
-                    page = doc[page_num]
-                    text = page.get_text()
-                    if text.strip():
-                        extracted_text.append({
-                            "page": page_num + 1,
-                            "text": text.strip(),
-                            "method": "PyMuPDF"
-                        })
-                doc.close()
+                with pdf_session(pdf_path, session) as pdf:
+                    if not pdf.available:
+                        raise RuntimeError(pdf.open_error)
+                    for page_num in range(1, self._page_limit(pdf.page_count) + 1):
+                        text = pdf.text(page_num)
+                        if text.strip():
+                            extracted_text.append({
+                                "page": page_num,
+                                "text": text.strip(),
+                                "method": "PyMuPDF"
+                            })
                 method_used = "PyMuPDF"
                 if extracted_text:
                     print(f"✅ Extracted text from {len(extracted_text)} pages using PyMuPDF", file=sys.stderr)
@@ -87,7 +149,7 @@ class EnhancedPDFProcessor:
             try:
                 import pdfplumber
                 with pdfplumber.open(pdf_path) as pdf:
-                    for page_num, page in enumerate(pdf.pages[:20]):  # Limit to 20 pages
+                    for page_num, page in enumerate(pdf.pages[:self.max_pages]):
                         text = page.extract_text()
                         if text and text.strip():
                             extracted_text.append({
@@ -107,7 +169,7 @@ class EnhancedPDFProcessor:
             try:
                 with open(pdf_path, 'rb') as file:
                     pdf_reader = PyPDF2.PdfReader(file)
-                    for page_num in range(min(len(pdf_reader.pages), 20)):
+                    for page_num in range(self._page_limit(len(pdf_reader.pages))):
                         page = pdf_reader.pages[page_num]
                         text = page.extract_text()
                         if text and text.strip():
@@ -125,8 +187,17 @@ class EnhancedPDFProcessor:
         
         return {"success": False, "text_pages": [], "method": "none", "error": "No text extraction method succeeded"}
     
-    def convert_pdf_to_images(self, pdf_path: str, dpi: int = 300, max_pages: int = 20) -> Tuple[List[Image.Image], Dict]:
-        """Convert PDF to high-quality images for OCR"""
+    @staticmethod
+    def _image_nbytes(image: Image.Image) -> int:
+        """Decoded size of an image, without copying its pixels"""
+        return image.width * image.height * len(image.getbands())
+    
+    def convert_pdf_to_images(self, pdf_path: str, dpi: int = 300, max_pages: Optional[int] = None,
+                              grayscale: bool = False, first_page: int = 1) -> Tuple[List[Image.Image], Dict]:
+        """Convert PDF pages first_page..max_pages to images for OCR
+        
+        Returns every page at once; use iter_pdf_pages for long documents.
+        """
         conversion_info = {
             "success": False,
             "pages_converted": 0,
@@ -145,18 +216,17 @@ class EnhancedPDFProcessor:
                 images = convert_from_path(
                     pdf_path, 
                     dpi=dpi,
-                    first_page=1, 
+                    first_page=first_page,
                     last_page=max_pages,
-                    fmt='PNG'  # PNG for better quality
+                    fmt='ppm',  # Lossless and uncompressed, so nothing to encode/decode
+                    grayscale=grayscale
                 )
                 
                 conversion_info.update({
                     "success": True,
                     "pages_converted": len(images),
                     "method": "pdf2image",
-                    "total_size_mb": sum(
-                        len(np.array(img).tobytes()) for img in images
-                    ) / (1024 * 1024)
+                    "total_size_mb": sum(self._image_nbytes(img) for img in images) / (1024 * 1024)
                 })
                 
                 print(f"✅ Converted {len(images)} pages to images ({conversion_info['total_size_mb']:.1f}MB)", file=sys.stderr)
@@ -172,18 +242,21 @@ class EnhancedPDFProcessor:
                 print(f"🔄 Using PyMuPDF fallback for PDF conversion...", file=sys.stderr)
                 
                 if HAS_FALLBACK:
-                    images = convert_pdf_to_images_fallback(pdf_path, dpi=dpi, max_pages=max_pages)
+                    images = convert_pdf_to_images_fallback(
+                        pdf_path, dpi=dpi, max_pages=max_pages, grayscale=grayscale, first_page=first_page
+                    )
                     conversion_info["method"] = "pymupdf_fallback"
                 else:
                     # Direct PyMuPDF conversion
                     doc = fitz.open(pdf_path)
-                    for page_num in range(min(len(doc), max_pages)):
+                    last_page = len(doc) if max_pages is None else min(len(doc), max_pages)
+                    for page_num in range(first_page - 1, last_page):
                         page = doc[page_num]
                         mat = fitz.Matrix(dpi/72.0, dpi/72.0)
-                        pix = page.get_pixmap(matrix=mat, alpha=False)
-                        img_data = pix.tobytes("png")
-                        img = Image.open(io.BytesIO(img_data))
-                        images.append(img)
+                        colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+                        pix = page.get_pixmap(matrix=mat, colorspace=colorspace, alpha=False)
+                        mode = "L" if pix.n == 1 else "RGB"
+                        images.append(Image.frombuffer(mode, (pix.width, pix.height), pix.samples, "raw", mode, pix.stride, 1))
                     doc.close()
                     conversion_info["method"] = "pymupdf_direct"
                 
@@ -191,9 +264,7 @@ class EnhancedPDFProcessor:
                     conversion_info.update({
                         "success": True,
                         "pages_converted": len(images),
-                        "total_size_mb": sum(
-                            len(np.array(img).tobytes()) for img in images
-                        ) / (1024 * 1024)
+                        "total_size_mb": sum(self._image_nbytes(img) for img in images) / (1024 * 1024)
                     })
                     
                     print(f"✅ Converted {len(images)} pages using PyMuPDF", file=sys.stderr)
@@ -210,8 +281,195 @@ class EnhancedPDFProcessor:
             
         return images, conversion_info
     
-    def analyze_pdf_content(self, pdf_path: str) -> Dict[str, Any]:
+    def iter_pdf_pages(self, pdf_path: str, dpi: int = 300, max_pages: Optional[int] = None,
+                       conversion_info: Optional[Dict] = None,
+                       session: Optional[PDFSession] = None) -> Iterator[Image.Image]:
+        """Yield PDF pages as images one at a time, so rendering overlaps OCR"""
+        for _, image in self._iter_page_images(pdf_path, dpi, None, max_pages, conversion_info, session):
+            yield image
+    
+    def _iter_page_images(self, pdf_path: str, dpi: int, page_numbers: Optional[List[int]],
+                          max_pages: Optional[int], conversion_info: Optional[Dict] = None,
+                          session: Optional[PDFSession] = None,
+                          grayscale: bool = False,
+                          embedded: bool = True) -> Iterator[Tuple[int, Image.Image]]:
+        """Yield (page_number, image) for the given 1-based pages, or the first max_pages
+        
+        With PyMuPDF, pages that are a single full-page scan yield the
+        embedded image at native resolution (when embedded is set); other
+        pages are rendered at dpi.
+        """
+        info = conversion_info if conversion_info is not None else {}
+        info.update({
+            "success": False,
+            "pages_converted": 0,
+            "dpi_used": dpi,
+            "method": "unknown",
+            "total_size_mb": 0.0,
+            "pages_extracted": 0
+        })
+        
+        if HAS_PYMUPDF:
+            with pdf_session(pdf_path, session) as pdf:
+                if pdf.available:
+                    info["method"] = "pymupdf_stream"
+                    if page_numbers is None:
+                        last_page = pdf.page_count if max_pages is None else min(pdf.page_count, max_pages)
+                        page_numbers = range(1, last_page + 1)
+                    for page_num in page_numbers:
+                        if page_num > pdf.page_count:
+                            continue
+                        image = pdf.embedded_page_image(page_num) if embedded else None
+                        if image is not None:
+                            info["pages_extracted"] += 1
+                        else:
+                            image = pdf.render(page_num, dpi, grayscale)
+                        info["total_size_mb"] += self._image_nbytes(image) / (1024 * 1024)
+                        info["pages_converted"] += 1
+                        info["success"] = True
+                        yield page_num, image
+                    return
+                info["error"] = pdf.open_error
+                print(f"⚠️  PyMuPDF could not open PDF: {pdf.open_error}", file=sys.stderr)
+        
+        # No PyMuPDF: convert a few pages at a time so only one chunk is in memory
+        wanted = set(page_numbers) if page_numbers is not None else None
+        if wanted is not None and not wanted:
+            return
+        first_page = min(wanted) if wanted else 1
+        last_page = max(wanted) if wanted else max_pages
+        
+        while last_page is None or first_page <= last_page:
+            chunk_last = first_page + PDF_RENDER_CHUNK - 1
+            if last_page is not None:
+                chunk_last = min(chunk_last, last_page)
+            if wanted is not None and not wanted.intersection(range(first_page, chunk_last + 1)):
+                first_page = chunk_last + 1
+                continue
+            
+            images, converted = self.convert_pdf_to_images(
+                pdf_path, dpi=dpi, max_pages=chunk_last, grayscale=grayscale, first_page=first_page
+            )
+            if not images:
+                # Past the last page (or conversion failed on the first chunk)
+                if not info["success"]:
+                    info.update(converted)
+                break
+            
+            info.update({
+                "success": True,
+                "method": converted.get("method", info["method"]),
+                "pages_converted": info["pages_converted"] + len(images),
+                "total_size_mb": info["total_size_mb"] + converted.get("total_size_mb", 0)
+            })
+            for offset, image in enumerate(images):
+                page_num = first_page + offset
+                if wanted is None or page_num in wanted:
+                    yield page_num, image
+            del images
+            first_page = chunk_last + 1
+    
+    def _page_fingerprints(self, pdf_path: str, page_numbers: List[int],
+                           session: Optional[PDFSession] = None) -> Dict[int, str]:
+        """Content fingerprint per page: content streams, geometry and embedded images"""
+        fingerprints = {}
+        if not HAS_PYMUPDF or not page_numbers:
+            return fingerprints
+        
+        try:
+            with pdf_session(pdf_path, session) as pdf:
+                for page_num in page_numbers:
+                    if page_num > pdf.page_count:
+                        continue
+                    page = pdf.page(page_num)
+                    hasher = hashlib.blake2b(digest_size=20)
+                    hasher.update(repr((page.rotation, tuple(page.rect))).encode("utf-8"))
+                    hasher.update(page.read_contents() or b"")
+                    for image_info in pdf.images(page_num):
+                        hasher.update(pdf.raw_stream(image_info[0]))
+                    fingerprints[page_num] = f"page-{hasher.hexdigest()}"
+        except Exception as e:
+            print(f"⚠️  Could not fingerprint PDF pages: {e}", file=sys.stderr)
+        
+        return fingerprints
+    
+    def _get_cached_page(self, key: str) -> Optional[Dict]:
+        try:
+            data = self.cache_store.get(key, namespace="page")
+            return decode_result(data) if data is not None else None
+        except Exception as e:
+            print(f"⚠️  Failed to read cached page: {e}", file=sys.stderr)
+            return None
+    
+    def _cache_page(self, key: str, ocr_result: Dict):
+        try:
+            self.cache_store.put(key, encode_result(ocr_result), namespace="page")
+        except Exception as e:
+            print(f"⚠️  Failed to cache page: {e}", file=sys.stderr)
+    
+    def ocr_pdf_pages(self, pdf_path: str, ocr_processor, page_numbers: Optional[List[int]] = None,
+                      dpi: int = 300, max_pages: Optional[int] = None,
+                      conversion_info: Optional[Dict] = None,
+                      session: Optional[PDFSession] = None,
+                      grayscale: bool = True) -> Dict[int, Dict]:
+        """OCR PDF pages, reusing cached results for pages that have not changed
+        
+        Pages are keyed by their content stream and image data (or, without
+        PyMuPDF, by their rendered pixels) plus DPI and engine settings, so an
+        edited page or a raised page limit only recomputes the affected pages.
+        Pages are rendered in grayscale by default, since preprocessing
+        converts to grayscale anyway. Returns {page_number: ocr_result}.
+        """
+        settings = {
+            "dpi": dpi,
+            "grayscale": grayscale,
+            "embedded_images": True,
+            "version": PDF_CACHE_VERSION,
+            # Page-level engine settings only: document options such as the
+            # page limit must not invalidate cached pages
+            "engine": getattr(ocr_processor, "page_cache_settings", {})
+        }
+        results: Dict[int, Dict] = {}
+        keys: Dict[int, str] = {}
+        
+        for page_num, fingerprint in self._page_fingerprints(pdf_path, page_numbers or [], session).items():
+            keys[page_num] = make_cache_key(fingerprint, settings)
+            cached = self._get_cached_page(keys[page_num])
+            if cached is not None:
+                results[page_num] = cached
+        
+        todo = None if page_numbers is None else [n for n in page_numbers if n not in results]
+        ocr_numbers = []
+        
+        def pages():
+            if todo == []:
+                return
+            for page_num, image in self._iter_page_images(pdf_path, dpi, todo, max_pages, conversion_info, session, grayscale):
+                if page_num not in keys:
+                    pixels = hashlib.blake2b(image.tobytes(), digest_size=20).hexdigest()
+                    keys[page_num] = make_cache_key(f"pixels-{image.size}-{pixels}", settings)
+                    cached = self._get_cached_page(keys[page_num])
+                    if cached is not None:
+                        results[page_num] = cached
+                        continue
+                ocr_numbers.append(page_num)
+                yield image
+        
+        ocr_results = ocr_processor.ocr_pages(timed_iter(pages(), "decode", self._image_nbytes))
+        for page_num, ocr_result in zip(ocr_numbers, ocr_results):
+            results[page_num] = ocr_result
+            self._cache_page(keys[page_num], ocr_result)
+        
+        reused = len(results) - len(ocr_numbers)
+        if reused:
+            print(f"♻️  Reused {reused} cached page(s), OCR'd {len(ocr_numbers)}", file=sys.stderr)
+        return results
+    
+    def analyze_pdf_content(self, pdf_path: str, session: Optional[PDFSession] = None) -> Dict[str, Any]:
         """Analyze PDF to determine best processing strategy"""
+        return self._cached_step("analysis", pdf_path, lambda: self._analyze_pdf_content(pdf_path, session))
+    
+    def _analyze_pdf_content(self, pdf_path: str, session: Optional[PDFSession] = None) -> Dict[str, Any]:
         analysis = {
             "file_size_mb": os.path.getsize(pdf_path) / (1024 * 1024),
             "is_text_based": False,
@@ -224,24 +482,23 @@ class EnhancedPDFProcessor:
         # Get basic PDF info
         try:
             if HAS_PYMUPDF:
-                doc = fitz.open(pdf_path)
-                analysis["page_count"] = len(doc)
-                
-                # Check first few pages for text content
-                text_pages = 0
-                image_pages = 0
-                
-                for page_num in range(min(5, len(doc))):  # Check first 5 pages
-                    page = doc[page_num]
-                    text = page.get_text().strip()
-                    images = page.get_images()
+                with pdf_session(pdf_path, session) as pdf:
+                    if not pdf.available:
+                        raise RuntimeError(pdf.open_error)
+                    analysis["page_count"] = pdf.page_count
                     
-                    if len(text) > 50:  # Significant text content
-                        text_pages += 1
-                    if images:  # Has images
-                        image_pages += 1
-                
-                doc.close()
+                    # Check first few pages for text content
+                    text_pages = 0
+                    image_pages = 0
+                    
+                    for page_num in range(1, min(5, pdf.page_count) + 1):  # Check first 5 pages
+                        text = pdf.text(page_num).strip()
+                        images = pdf.images(page_num)
+                        
+                        if len(text) > 50:  # Significant text content
+                            text_pages += 1
+                        if images:  # Has images
+                            image_pages += 1
                 
                 # Determine content type
                 if text_pages > 0 and image_pages > 0:
@@ -264,12 +521,123 @@ class EnhancedPDFProcessor:
         
         return analysis
     
+    def classify_pages(self, pdf_path: str, session: Optional[PDFSession] = None) -> Dict[str, Any]:
+        """Decide per page whether the text layer is usable or the page needs OCR"""
+        return self._cached_step("pages", pdf_path, lambda: self._classify_pages(pdf_path, session))
+    
+    def _classify_pages(self, pdf_path: str, session: Optional[PDFSession] = None) -> Dict[str, Any]:
+        if not HAS_PYMUPDF:
+            return {"success": False, "pages": [], "error": "PyMuPDF not available"}
+        
+        pages = []
+        try:
+            with pdf_session(pdf_path, session) as pdf:
+                if not pdf.available:
+                    raise RuntimeError(pdf.open_error)
+                for page_num in range(1, pdf.page_count + 1):
+                    page = pdf.page(page_num)
+                    text_chars = len(pdf.text(page_num).strip())
+                    
+                    # Share of the page area covered by placed images
+                    page_area = abs(page.rect) or 1.0
+                    covered = 0.0
+                    for info in pdf.image_info(page_num):
+                        rect = fitz.Rect(info["bbox"]) & page.rect
+                        covered += abs(rect)
+                    coverage = min(1.0, covered / page_area)
+                    
+                    needs_ocr = text_chars < MIN_TEXT_CHARS or (
+                        coverage >= SCAN_IMAGE_COVERAGE and text_chars < SCAN_MAX_TEXT_CHARS
+                    )
+                    pages.append({
+                        "page": page_num,
+                        "text_chars": text_chars,
+                        "image_coverage": round(coverage, 3),
+                        "needs_ocr": needs_ocr
+                    })
+        except Exception as e:
+            print(f"⚠️  Page classification failed: {e}", file=sys.stderr)
+            return {"success": False, "pages": [], "error": str(e)}
+        
+        return {"success": True, "pages": pages}
+    
+    def text_layer_layout(self, pdf_path: str, page_numbers: List[int],
+                          session: Optional[PDFSession] = None,
+                          dpi: int = TEXT_LAYOUT_DPI) -> Dict[int, Dict[str, Any]]:
+        """Text blocks and rows for text-layer pages, built from word geometry
+        
+        Produces the same page structure as OCR (coordinates in pixels at
+        dpi, confidence 1.0) without rendering anything. Returns
+        {page_number: structure}; pages without words are left out.
+        """
+        layouts = {}
+        if not HAS_PYMUPDF or not page_numbers:
+            return layouts
+        
+        scale = dpi / 72.0
+        try:
+            with pdf_session(pdf_path, session) as pdf:
+                for page_num in page_numbers:
+                    if page_num > pdf.page_count:
+                        continue
+                    
+                    lines: Dict[Tuple[int, int], List[Tuple]] = {}
+                    for x0, y0, x1, y1, word, block_no, line_no, _ in pdf.words(page_num):
+                        lines.setdefault((block_no, line_no), []).append((x0, y0, x1, y1, word))
+                    
+                    texts, boxes = [], []
+                    for words in lines.values():
+                        # Start a new block at wide horizontal gaps
+                        groups = [[words[0]]]
+                        for word in words[1:]:
+                            previous = groups[-1][-1]
+                            if word[0] - previous[2] > TEXT_LAYOUT_GAP_RATIO * (previous[3] - previous[1]):
+                                groups.append([word])
+                            else:
+                                groups[-1].append(word)
+                        
+                        for group in groups:
+                            x0 = min(w[0] for w in group)
+                            y0 = min(w[1] for w in group)
+                            x1 = max(w[2] for w in group)
+                            y1 = max(w[3] for w in group)
+                            texts.append(" ".join(w[4] for w in group))
+                            boxes.append([[x0, y0], [x1, y0], [x1, y1], [x0, y1]])
+                    
+                    if texts:
+                        layouts[page_num] = build_page_structure(
+                            np.asarray(boxes, dtype=np.float64) * scale, texts, np.ones(len(texts))
+                        )
+        except Exception as e:
+            print(f"⚠️  Could not build text layout: {e}", file=sys.stderr)
+        
+        return layouts
+    
+    def _attach_text_layouts(self, pdf_path: str, pages: List[Dict], session: PDFSession):
+        """Add positioned blocks/rows to the text-extracted pages in place"""
+        text_pages = {p["page_number"]: p for p in pages if p["extraction_method"] == "text"}
+        with measure("postprocess"):
+            layouts = self.text_layer_layout(pdf_path, list(text_pages), session)
+        for page_num, layout in layouts.items():
+            text_pages[page_num]["layout"] = layout
+            text_pages[page_num]["text_blocks"] = layout["total_blocks"]
+    
     def process_pdf_hybrid(self, pdf_path: str, ocr_processor=None) -> Dict[str, Any]:
-        """Process PDF using hybrid approach (text extraction + OCR)"""
+        """Process PDF using hybrid approach (text extraction + OCR)
+        
+        The PDF is opened once; analysis, text extraction, page routing and
+        rendering all share the same session.
+        """
+        with profiled(self.profiler, pdf_path) as capture, PDFSession(pdf_path) as session:
+            result = self._process_pdf_hybrid(pdf_path, ocr_processor, session)
+        return attach_profile(result, capture)
+    
+    def _process_pdf_hybrid(self, pdf_path: str, ocr_processor, session: PDFSession) -> Dict[str, Any]:
         print(f"📄 Processing PDF with hybrid approach: {os.path.basename(pdf_path)}", file=sys.stderr)
         
-        # Analyze PDF first
-        analysis = self.analyze_pdf_content(pdf_path)
+        # Analyze PDF first (reading the PDF's structure and text layer counts as decode)
+        with measure("decode"):
+            analysis = self.analyze_pdf_content(pdf_path, session)
         print(f"📊 PDF Analysis: {analysis['recommended_strategy']} - {analysis['page_count']} pages", file=sys.stderr)
         
         result = {
@@ -286,7 +654,8 @@ class EnhancedPDFProcessor:
         try:
             if analysis["recommended_strategy"] == "text_extraction":
                 # Pure text extraction
-                text_result = self.extract_text_from_pdf(pdf_path)
+                with measure("decode"):
+                    text_result = self.extract_text_from_pdf(pdf_path, session)
                 if text_result["success"]:
                     for page_data in text_result["text_pages"]:
                         result["pages"].append({
@@ -295,13 +664,14 @@ class EnhancedPDFProcessor:
                             "text": page_data["text"],
                             "confidence": 1.0  # Text extraction is 100% accurate
                         })
+                    self._attach_text_layouts(pdf_path, result["pages"], session)
                     result["combined_text"] = " ".join(page["text"] for page in result["pages"])
                     result["success"] = True
                     
             elif analysis["recommended_strategy"] == "hybrid":
                 # Try text extraction first, then OCR for image-heavy pages
-                text_result = self.extract_text_from_pdf(pdf_path)
-                ocr_pages = []
+                with measure("decode"):
+                    text_result = self.extract_text_from_pdf(pdf_path, session)
                 
                 if text_result["success"]:
                     # Add text-extracted pages
@@ -313,24 +683,44 @@ class EnhancedPDFProcessor:
                             "confidence": 1.0
                         })
                 
-                # For pages without sufficient text, use OCR
-                if ocr_processor and analysis["page_count"] > len(text_result.get("text_pages", [])):
-                    print("🔍 Using OCR for image-heavy pages...", file=sys.stderr)
-                    images, conversion_info = self.convert_pdf_to_images(pdf_path, dpi=250, max_pages=10)
+                # Route each page once: only pages that need OCR are rendered,
+                # one at a time, and their OCR result replaces any thin text layer
+                if ocr_processor:
+                    with measure("decode"):
+                        routing = self.classify_pages(pdf_path, session)
+                    if routing["success"]:
+                        ocr_page_numbers = [
+                            p["page"] for p in routing["pages"][:self.max_pages] if p["needs_ocr"]
+                        ]
+                    else:
+                        text_page_numbers = {p["page_number"] for p in result["pages"]}
+                        ocr_page_numbers = [
+                            n for n in range(1, self._page_limit(analysis["page_count"]) + 1)
+                            if n not in text_page_numbers
+                        ]
                     
-                    if images and ocr_processor:
-                        for i, image in enumerate(images):
-                            page_num = i + 1
-                            # Skip pages we already have text for
-                            if not any(p["page_number"] == page_num for p in result["pages"]):
-                                ocr_result = ocr_processor._extract_text_with_structure(image)
-                                result["pages"].append({
-                                    "page_number": page_num,
-                                    "extraction_method": "ocr",
-                                    "text": ocr_result["full_text"],
-                                    "confidence": ocr_result.get("avg_confidence", 0.8),
-                                    "text_blocks": len(ocr_result.get("text_blocks", []))
-                                })
+                    if ocr_page_numbers:
+                        print(f"🔍 Using OCR for {len(ocr_page_numbers)} image-heavy page(s)...", file=sys.stderr)
+                        conversion_info = {}
+                        ocr_results = self.ocr_pdf_pages(
+                            pdf_path, ocr_processor, ocr_page_numbers, dpi=250,
+                            conversion_info=conversion_info, session=session
+                        )
+                        result["conversion_info"] = conversion_info
+                        result["pages"] = [p for p in result["pages"] if p["page_number"] not in ocr_results]
+                        
+                        for page_num in sorted(ocr_results):
+                            ocr_result = ocr_results[page_num]
+                            result["pages"].append({
+                                "page_number": page_num,
+                                "extraction_method": "ocr",
+                                "text": ocr_result["full_text"],
+                                "confidence": ocr_result.get("avg_confidence", 0.8),
+                                "text_blocks": len(ocr_result.get("text_blocks", [])),
+                                "ocr_details": ocr_result
+                            })
+                
+                self._attach_text_layouts(pdf_path, result["pages"], session)
                 
                 # Sort pages by page number
                 result["pages"].sort(key=lambda x: x["page_number"])
@@ -341,14 +731,21 @@ class EnhancedPDFProcessor:
                 # OCR only for image-based PDFs
                 if ocr_processor:
                     print("🔍 Using OCR-only approach...", file=sys.stderr)
-                    images, conversion_info = self.convert_pdf_to_images(pdf_path)
+                    conversion_info = {}
+                    # Pages are rendered lazily (only those not already cached),
+                    # overlapping with OCR of earlier pages
+                    page_numbers = list(range(1, self._page_limit(analysis["page_count"]) + 1)) if analysis["page_count"] else None
+                    ocr_results = self.ocr_pdf_pages(
+                        pdf_path, ocr_processor, page_numbers, max_pages=self.max_pages,
+                        conversion_info=conversion_info, session=session
+                    )
                     result["conversion_info"] = conversion_info
                     
-                    if images:
-                        for i, image in enumerate(images):
-                            ocr_result = ocr_processor._extract_text_with_structure(image)
+                    if ocr_results:
+                        for page_num in sorted(ocr_results):
+                            ocr_result = ocr_results[page_num]
                             result["pages"].append({
-                                "page_number": i + 1,
+                                "page_number": page_num,
                                 "extraction_method": "ocr",
                                 "text": ocr_result["full_text"],
                                 "confidence": ocr_result.get("avg_confidence", 0.8),
@@ -363,7 +760,13 @@ class EnhancedPDFProcessor:
             
             # Extract structured data if successful
             if result["success"] and result["combined_text"]:
-                result["structured_data"] = self.extract_pdf_structured_data(result["combined_text"], analysis)
+                # Layout rows of every page (text layer or OCR) feed line items and the vendor
+                rows = [
+                    row
+                    for page in result["pages"]
+                    for row in (page.get("ocr_details") or page.get("layout") or {}).get("rows", [])
+                ]
+                result["structured_data"] = self.extract_pdf_structured_data(result["combined_text"], analysis, rows)
                 
         except Exception as e:
             result["error"] = str(e)
@@ -371,110 +774,12 @@ class EnhancedPDFProcessor:
         
         return result
     
-    def extract_pdf_structured_data(self, text: str, pdf_analysis: Dict) -> Dict[str, Any]:
-        """Extract structured data specifically for PDF documents"""
-        import re
-        from datetime import datetime
-        
-        structured = {
-            "document_type": "PDF Document",
-            "invoice_number": None,
-            "po_number": None,  
-            "vendor_name": None,
-            "total_amount": None,
-            "date": None,
-            "line_items": [],
-            "contact_info": {}
-        }
-        
-        text_lower = text.lower()
-        
-        # Enhanced PDF-specific patterns
-        
-        # Invoice/Document number patterns
-        invoice_patterns = [
-            r'invoice\s*(?:no\.?|number)?\s*:?\s*([A-Za-z0-9\-\/]+)',
-            r'bill\s*(?:no\.?|number)?\s*:?\s*([A-Za-z0-9\-\/]+)',
-            r'document\s*(?:no\.?|number)?\s*:?\s*([A-Za-z0-9\-\/]+)'
-        ]
-        
-        for pattern in invoice_patterns:
-            match = re.search(pattern, text_lower)
-            if match:
-                structured["invoice_number"] = match.group(1).upper()
-                break
-        
-        # PO number patterns
-        po_patterns = [
-            r'po\s*(?:no\.?|number)?\s*:?\s*([A-Za-z0-9\-\/]+)',
-            r'purchase\s*order\s*(?:no\.?|number)?\s*:?\s*([A-Za-z0-9\-\/]+)',
-            r'p\.o\.?\s*(?:no\.?|number)?\s*:?\s*([A-Za-z0-9\-\/]+)'
-        ]
-        
-        for pattern in po_patterns:
-            match = re.search(pattern, text_lower)
-            if match:
-                structured["po_number"] = match.group(1).upper()
-                break
-        
-        # Company/Vendor name (look for "To:" or first few lines)
-        lines = text.split('\n')[:10]
-        for line in lines:
-            line = line.strip()
-            if len(line) > 5 and not any(keyword in line.lower() for keyword in 
-                ['invoice', 'bill', 'po no', 'date', 'total', 'amount']):
-                if structured["vendor_name"] is None or len(line) > len(structured["vendor_name"]):
-                    structured["vendor_name"] = line
-        
-        # Enhanced amount detection
-        amount_patterns = [
-            r'total\s*(?:amount)?\s*:?\s*(?:rs\.?|₹|\$)?\s*([0-9,]+\.?\d*)',
-            r'grand\s*total\s*:?\s*(?:rs\.?|₹|\$)?\s*([0-9,]+\.?\d*)',
-            r'net\s*amount\s*:?\s*(?:rs\.?|₹|\$)?\s*([0-9,]+\.?\d*)',
-            r'(?:rs\.?|₹|\$)\s*([0-9,]+\.?\d*)\s*(?:total|grand|net)?'
-        ]
-        
-        amounts = []
-        for pattern in amount_patterns:
-            matches = re.findall(pattern, text_lower)
-            amounts.extend(matches)
-        
-        if amounts:
-            # Convert amounts to float and find the largest (likely the total)
-            numeric_amounts = []
-            for amt in amounts:
-                try:
-                    numeric_amounts.append(float(amt.replace(',', '')))
-                except:
-                    pass
-            if numeric_amounts:
-                structured["total_amount"] = str(max(numeric_amounts))
-        
-        # Date patterns
-        date_patterns = [
-            r'date\s*:?\s*(\d{1,2}[-\/\.]\d{1,2}[-\/\.]\d{2,4})',
-            r'dated?\s*:?\s*(\d{1,2}[-\/\.]\d{1,2}[-\/\.]\d{2,4})',
-            r'(\d{1,2}\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\w*\s+\d{4})'
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, text_lower)
-            if match:
-                structured["date"] = match.group(1)
-                break
-        
-        # Contact information
-        email_pattern = r'([a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})'
-        phone_pattern = r'(\+?\d{1,4}[\s-]?\(?\d{3,4}\)?[\s-]?\d{3,4}[\s-]?\d{3,9})'
-        
-        emails = re.findall(email_pattern, text)
-        phones = re.findall(phone_pattern, text)
-        
-        if emails:
-            structured["contact_info"]["email"] = emails[0]
-        if phones:
-            structured["contact_info"]["phone"] = phones[0]
-        
+    def extract_pdf_structured_data(self, text: str, pdf_analysis: Dict,
+                                    rows: Optional[List[List[Dict]]] = None) -> Dict[str, Any]:
+        """Extract structured data specifically for PDF documents (rows: the pages' layout rows)"""
+        with measure("extraction", len(text.encode("utf-8"))):
+            structured = extract_fields(text, rows)
+        structured["document_type"] = structured["document_type"] or "PDF Document"
         return structured
 
 def test_pdf_processor():
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Structured field extraction
+Finds PO/invoice numbers, dates, totals, vendor and contact details with one
+combined scan per document (or per batch of documents), and detects the
+document type with a keyword trie
+"""
+
+import re
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+_ID = r'([a-z0-9\-/]*\d[a-z0-9\-/]*)'
+_AMOUNT = r'(\d[\d,]*(?:\.\d+)?)'
+_CURRENCY = r'(?:rs\.?|₹|\$)'
+_DATE_NUMERIC = r'\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}'
+_DATE_TEXT = r'\d{1,2}\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{2,4}'
+
+# (field, pattern with exactly one capture group); within a field, earlier
+# patterns take priority over later ones wherever they occur in the text
+FIELD_PATTERNS: List[Tuple[str, str]] = [
+    ("po_number", r'\bpurchase\s*order\s*(?:no\.?|number|#)?\s*:?\s*' + _ID),
+    ("po_number", r'\bp\.?\s?o\.?\s*(?:no\.?|number|#)\s*:?\s*' + _ID),
+    ("invoice_number", r'\binvoice\s*(?:no\.?|number|#)?\s*:?\s*' + _ID),
+    ("invoice_number", r'\binv\.?\s*(?:no\.?|#)\s*:?\s*' + _ID),
+    ("invoice_number", r'\bbill\s*(?:no\.?|number|#)\s*:?\s*' + _ID),
+    ("invoice_number", r'\bdocument\s*(?:no\.?|number|#)\s*:?\s*' + _ID),
+    ("date", r'\bdated?\s*:?\s*(' + _DATE_NUMERIC + '|' + _DATE_TEXT + r')\b'),
+    ("date", r'\b(' + _DATE_NUMERIC + '|' + _DATE_TEXT + r')\b'),
+    ("total_amount", r'\b(?:grand\s*total|net\s*amount|total\s*(?:amount)?)\s*:?\s*' + _CURRENCY + r'?\s*' + _AMOUNT),
+    ("amount", _CURRENCY + r'\s*' + _AMOUNT),
+    ("vendor_name", r'\b(?:vendor|supplier|from)\s*:\s*([a-z][a-z &.,]*[a-z.])[ \t]*(?:\n|$)'),
+    ("email", r'([a-z0-9._%+-]+@[a-z0-9.-]+\.[a-z]{2,})'),
+    ("phone", r'(\+?\d{1,4}[\s-]?\(?\d{3,4}\)?[\s-]?\d{3,4}[\s-]?\d{3,9})'),
+]
+
+# Checked in order: the first type with any keyword in the text wins
+DOCUMENT_TYPES: List[Tuple[str, Sequence[str]]] = [
+    ("Purchase Order", ("purchase order", "po no", "p.o.")),
+    ("Invoice", ("invoice", "bill")),
+]
+
+# Lines containing these are headers/labels, not the vendor name
+VENDOR_EXCLUDE = ("invoice", "bill", "purchase", "order", "po no", "date", "total", "amount")
+
+# The vendor name is looked for in this many leading rows / text lines
+VENDOR_SCAN_ROWS = 5
+VENDOR_SCAN_LINES = 10
+
+# Rows reported as candidate line items
+MAX_LINE_ITEMS = 20
+LINE_ITEM_EXCLUDE = ("po no", "date", "total")
+
+# Joins batch documents; \x00 is in no pattern, so no match can span two documents
+_SEPARATOR = "\n\x00\n"
+
+
+def trie_pattern(words: Sequence[str]) -> str:
+    """Regex for a set of keywords, factored into a trie
+
+    Shared prefixes are matched once, so the regex engine walks the
+    keyword set like an automaton instead of trying each word in turn.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word.lower():
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return "(?:" + body + ")?" if "" in node else body
+
+    return emit(trie)
+
+
+class FieldExtractor:
+    """Precompiled field scanner and document-type detector
+
+    All field patterns are combined into one alternation of lookaheads, so
+    a single pass over the text reports every field match. At any one
+    position the first listed pattern wins; field patterns start on
+    different keywords, so in practice they do not compete.
+    """
+
+    def __init__(self, field_patterns: Sequence[Tuple[str, str]] = FIELD_PATTERNS,
+                 document_types: Sequence[Tuple[str, Sequence[str]]] = DOCUMENT_TYPES):
+        self._fields: Dict[str, Tuple[str, int]] = {}
+        alternatives = []
+        for index, (field, pattern) in enumerate(field_patterns):
+            name = f"f{index}"
+            self._fields[name] = (field, index)
+            alternatives.append(f"(?=(?P<{name}>{pattern}))")
+        self._scanner = re.compile("|".join(alternatives), re.IGNORECASE)
+        # Each alternative's value is the capture group right inside its named group
+        self._value_group = {name: self._scanner.groupindex[name] + 1 for name in self._fields}
+
+        self._document_types = [name for name, _ in document_types]
+        self._keyword_types = {keyword.lower(): name for name, keywords in document_types for keyword in keywords}
+        self._keywords = re.compile(trie_pattern(list(self._keyword_types)), re.IGNORECASE)
+        self._vendor_exclude = re.compile(trie_pattern(VENDOR_EXCLUDE), re.IGNORECASE)
+        self._line_item_exclude = re.compile(trie_pattern(LINE_ITEM_EXCLUDE), re.IGNORECASE)
+
+    def extract(self, text: str, rows: Optional[List[List[Dict]]] = None) -> Dict[str, Any]:
+        """Structured fields for one document; rows are OCR rows of text blocks, if any"""
+        return self.extract_batch([text], [rows])[0]
+
+    def extract_batch(self, texts: Sequence[str],
+                      rows: Optional[Sequence[Optional[List[List[Dict]]]]] = None) -> List[Dict[str, Any]]:
+        """Structured fields for many documents with one scan over all of them"""
+        texts = [text or "" for text in texts]
+        rows = list(rows) if rows is not None else [None] * len(texts)
+
+        starts = []
+        offset = 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + len(_SEPARATOR)
+        joined = _SEPARATOR.join(texts)
+
+        # field -> [(pattern priority, position, value)] per document
+        found: List[Dict[str, List[Tuple[int, int, str]]]] = [{} for _ in texts]
+        last_end: Dict[str, int] = {}
+        for match in self._scanner.finditer(joined):
+            name = match.lastgroup
+            start, end = match.span(name)
+            # Lookaheads also match inside an earlier hit; keep hits of one pattern disjoint
+            if start < last_end.get(name, -1):
+                continue
+            last_end[name] = end
+            field, priority = self._fields[name]
+            doc = bisect_right(starts, start) - 1
+            found[doc].setdefault(field, []).append((priority, start, match.group(self._value_group[name])))
+
+        types: List[set] = [set() for _ in texts]
+        for match in self._keywords.finditer(joined):
+            types[bisect_right(starts, match.start()) - 1].add(self._keyword_types[match.group(0).lower()])
+
+        return [
+            self._finalize(found[i], types[i], texts[i], rows[i])
+            for i in range(len(texts))
+        ]
+
+    def _finalize(self, found: Dict[str, List[Tuple[int, int, str]]], types: set, text: str,
+                  rows: Optional[List[List[Dict]]]) -> Dict[str, Any]:
+        def first(field: str) -> Optional[str]:
+            hits = found.get(field)
+            return min(hits)[2].strip() if hits else None
+
+        # Labelled totals win over bare currency amounts; the largest is the total
+        amounts = found.get("total_amount") or found.get("amount") or []
+        values = []
+        for _, _, amount in amounts:
+            try:
+                values.append((float(amount.replace(",", "")), amount.replace(",", "")))
+            except ValueError:
+                pass
+        total = max(values)[1] if values else None
+
+        po_number = first("po_number")
+        invoice_number = first("invoice_number")
+        contact_info = {}
+        if first("email"):
+            contact_info["email"] = first("email")
+        if first("phone"):
+            contact_info["phone"] = first("phone")
+
+        return {
+            "document_type": next((name for name in self._document_types if name in types), None),
+            "po_number": po_number.upper() if po_number else None,
+            "invoice_number": invoice_number.upper() if invoice_number else None,
+            "vendor_name": first("vendor_name") or self._vendor_from_layout(text, rows),
+            "date": first("date"),
+            "total_amount": total,
+            "line_items": self._line_items(rows),
+            "contact_info": contact_info
+        }
+
+    def _vendor_from_layout(self, text: str, rows: Optional[List[List[Dict]]]) -> Optional[str]:
+        """Longest non-label line near the top of the document"""
+        if rows:
+            lines = [" ".join(block["text"] for block in row) for row in rows[:VENDOR_SCAN_ROWS]]
+        else:
+            lines = text.split("\n")[:VENDOR_SCAN_LINES]
+
+        vendor = None
+        for line in lines:
+            line = line.strip()
+            if len(line) > 5 and not self._vendor_exclude.search(line):
+                if vendor is None or len(line) > len(vendor):
+                    vendor = line
+        return vendor
+
+    def _line_items(self, rows: Optional[List[List[Dict]]]) -> List[Dict[str, str]]:
+        """Rows that look like item lines (contain numbers, are not headers/totals)"""
+        items = []
+        for row in rows or []:
+            row_text = " ".join(block["text"] for block in row)
+            if (len(row_text) > 10 and any(char.isdigit() for char in row_text)
+                    and not self._line_item_exclude.search(row_text)):
+                items.append({"text": " | ".join(block["text"] for block in row)})
+                if len(items) >= MAX_LINE_ITEMS:
+                    break
+        return items
+
+
+_default_extractor: Optional[FieldExtractor] = None
+
+
+def _extractor() -> FieldExtractor:
+    global _default_extractor
+    if _default_extractor is None:
+        _default_extractor = FieldExtractor()
+    return _default_extractor
+
+
+def extract_fields(text: str, rows: Optional[List[List[Dict]]] = None) -> Dict[str, Any]:
+    """Structured fields for one document using the shared compiled extractor"""
+    return _extractor().extract(text, rows)
+
+
+def extract_fields_batch(texts: Sequence[str],
+                         rows: Optional[Sequence[Optional[List[List[Dict]]]]] = None) -> List[Dict[str, Any]]:
+    """Structured fields for many documents in one scan"""
+    return _extractor().extract_batch(texts, rows)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Size-aware image loading
+Decodes large photos close to the size OCR will actually use (JPEG DCT
+scaling, HEIF thumbnails) and turns them upright using EXIF orientation
+"""
+
+import math
+import sys
+from typing import Optional, Tuple
+
+from PIL import Image, ImageOps
+
+# HEIF decode and embedded thumbnails come from pillow-heif, registered on
+# the first image load: None = not tried yet, False = not installed
+_heif = None
+
+# Identifies the decode recipe in cache keys; bump when it changes
+LOADER_VERSION = "draft-v1"
+
+_EXIF_ORIENTATION = 0x0112
+_HEIF_BRANDS = (b'heic', b'heix', b'hevc', b'mif1', b'msf1')
+
+
+def heif_support():
+    """The pillow_heif module with its Pillow opener registered, or None"""
+    global _heif
+    if _heif is None:
+        try:
+            import pillow_heif
+            pillow_heif.register_heif_opener()
+            _heif = pillow_heif
+        except ImportError:
+            print("Warning: pillow-heif not available. HEIF images may not work.", file=sys.stderr)
+            _heif = False
+    return _heif or None
+
+
+def looks_like_heif(file_path: str) -> bool:
+    """True if the file starts with a HEIF/HEIC ftyp box, whatever its extension"""
+    with open(file_path, 'rb') as f:
+        header = f.read(12)
+    return header[4:8] == b'ftyp' and header[8:12] in _HEIF_BRANDS
+
+
+def _reduced_size(size: Tuple[int, int], max_side: int) -> Tuple[int, int]:
+    """Smallest size with the same aspect ratio that still covers max_side"""
+    scale = max_side / max(size)
+    return max(1, math.ceil(size[0] * scale)), max(1, math.ceil(size[1] * scale))
+
+
+def _open(file_path: str) -> Image.Image:
+    heif = heif_support()
+    try:
+        return Image.open(file_path)
+    except Exception:
+        # HEIF files with a wrong extension can still be read through pillow-heif
+        if heif is not None and looks_like_heif(file_path):
+            return heif.open_heif(file_path).to_pillow()
+        raise
+
+
+def load_image(file_path: str, max_side: Optional[int] = None, grayscale: bool = False) -> Image.Image:
+    """Open an image decoded as close to max_side as the format allows
+
+    JPEGs use draft mode, so the decoder's DCT scaling (1/2, 1/4, 1/8)
+    skips detail that would be thrown away by the resize anyway, and with
+    grayscale=True only the luma channel is decoded. HEIF images use an
+    embedded thumbnail when one is at least max_side. The result is never
+    smaller than max_side (the exact resize stays with preprocessing) and
+    is rotated/flipped according to its EXIF orientation.
+    """
+    image = _open(file_path)
+
+    oversized = max_side is not None and max(image.size) > max_side
+    if image.format == "JPEG":
+        mode = "L" if grayscale and image.mode == "RGB" else image.mode
+        if oversized or mode != image.mode:
+            image.draft(mode, _reduced_size(image.size, max_side) if oversized else image.size)
+    elif image.format == "HEIF" and oversized and hasattr(heif_support(), "thumbnail"):
+        image = heif_support().thumbnail(image, min_box=max_side)
+
+    if image.getexif().get(_EXIF_ORIENTATION, 1) != 1:
+        image = ImageOps.exif_transpose(image)
+    return image
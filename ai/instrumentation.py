@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Per-stage instrumentation for OCR requests
+Records wall time, CPU time and bytes for each pipeline stage of a
+document, and aggregates them into counters/histograms that a
+long-running process can expose in the Prometheus text format.
+
+Stages are only measured while a StageRecorder is active (see recording()),
+so uninstrumented requests pay a single context-variable lookup per stage.
+Batched and tiled pages run detection and recognition inside one EasyOCR
+call; their model time is reported under "recognition".
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+STAGES = ("cache_lookup", "decode", "preprocess", "detection", "recognition", "postprocess", "extraction")
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current: contextvars.ContextVar = contextvars.ContextVar("ocr_stage_recorder", default=None)
+
+
+class StageRecorder:
+    """Thread-safe per-document totals: {stage: wall_ms, cpu_ms, bytes, calls}
+
+    CPU time is the process's CPU time over the stage, so it includes
+    library thread pools (torch, OpenCV) and, when documents overlap, any
+    other work the process did meanwhile.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        # Whether the document came from the result cache (None = not looked up)
+        self.cache_hit: Optional[bool] = None
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, wall_ms: float, cpu_ms: float = 0.0, nbytes: int = 0, calls: int = 1):
+        with self._lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = {"wall_ms": 0.0, "cpu_ms": 0.0, "bytes": 0, "calls": 0}
+            entry["wall_ms"] += wall_ms
+            entry["cpu_ms"] += cpu_ms
+            entry["bytes"] += nbytes
+            entry["calls"] += calls
+
+    @contextmanager
+    def stage(self, name: str, nbytes: int = 0):
+        """Time the block as a stage; the block may set the yielded dict's bytes"""
+        sized = {"bytes": nbytes}
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield sized
+        finally:
+            self.add(name, (time.perf_counter() - wall) * 1000, (time.process_time() - cpu) * 1000, sized["bytes"])
+
+    def merge(self, other: "StageRecorder", share: float = 1.0):
+        """Add another recorder's totals, times and bytes scaled by share (for work split across documents)"""
+        for name, entry in other.as_dict().items():
+            self.add(name, entry["wall_ms"] * share, entry["cpu_ms"] * share,
+                     int(entry["bytes"] * share), entry["calls"])
+
+    def as_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Stages in pipeline order, times rounded to 0.01 ms"""
+        with self._lock:
+            names = [s for s in STAGES if s in self.stages] + sorted(set(self.stages) - set(STAGES))
+            return {
+                name: {
+                    "wall_ms": round(self.stages[name]["wall_ms"], 2),
+                    "cpu_ms": round(self.stages[name]["cpu_ms"], 2),
+                    "bytes": int(self.stages[name]["bytes"]),
+                    "calls": int(self.stages[name]["calls"])
+                }
+                for name in names
+            }
+
+
+@contextmanager
+def recording(recorder: Optional[StageRecorder]):
+    """Make recorder the target of measure() calls in this context (None disables)"""
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+
+
+def current() -> Optional[StageRecorder]:
+    return _current.get()
+
+
+@contextmanager
+def measure(name: str, nbytes: int = 0):
+    """Time a stage into the active recorder, if any (yields the dict holding its bytes)"""
+    recorder = _current.get()
+    if recorder is None:
+        yield {"bytes": nbytes}
+        return
+    with recorder.stage(name, nbytes) as sized:
+        yield sized
+
+
+def record(name: str, wall_ms: float, cpu_ms: float = 0.0, nbytes: int = 0):
+    """Add an already-measured stage (e.g. from a worker process) to the active recorder"""
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.add(name, wall_ms, cpu_ms, nbytes)
+
+
+def timed_iter(items: Iterable, name: str, size_fn=None) -> Iterator:
+    """Time each step of an iterator as a stage
+
+    The recorder is captured when this is called, so the iterator may be
+    consumed on another thread (e.g. the page pipeline's render thread).
+    """
+    recorder = _current.get()
+    if recorder is None:
+        return iter(items)
+
+    def timed():
+        iterator = iter(items)
+        while True:
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            recorder.add(name, (time.perf_counter() - wall) * 1000, (time.process_time() - cpu) * 1000,
+                         size_fn(item) if size_fn else 0)
+            yield item
+
+    return timed()
+
+
+def document_class(file_type: str, processing_method: Optional[str] = None) -> str:
+    """Coarse document class used to label metrics"""
+    if file_type != ".pdf":
+        return "image"
+    return {
+        "text_extraction": "pdf_text",
+        "hybrid": "pdf_mixed",
+        "ocr_only": "pdf_scanned"
+    }.get(processing_method, "pdf")
+
+
+def _labels(**labels: str) -> str:
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metrics:
+    """Process-wide counters and stage latency histograms
+
+    Rendered with render() in the Prometheus text exposition format
+    (version 0.0.4).
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.documents: Dict[tuple, int] = {}
+        self.pages: Dict[str, int] = {}
+        self.cache: Dict[str, int] = {}
+        # (stage, class) -> [bucket counts..., count, sum_seconds]
+        self.latency: Dict[tuple, List[float]] = {}
+        self.cpu_seconds: Dict[tuple, float] = {}
+        self.bytes: Dict[tuple, int] = {}
+
+    def observe(self, document_class: str, stages: Dict[str, Dict[str, Any]], success: bool = True,
+                pages: int = 0, cache_hit: Optional[bool] = None):
+        """Fold one document's stage totals into the aggregates"""
+        with self._lock:
+            status = "success" if success else "error"
+            self.documents[(document_class, status)] = self.documents.get((document_class, status), 0) + 1
+            self.pages[document_class] = self.pages.get(document_class, 0) + pages
+            if cache_hit is not None:
+                result = "hit" if cache_hit else "miss"
+                self.cache[result] = self.cache.get(result, 0) + 1
+
+            for name, entry in stages.items():
+                key = (name, document_class)
+                seconds = entry["wall_ms"] / 1000
+                histogram = self.latency.get(key)
+                if histogram is None:
+                    histogram = self.latency[key] = [0] * (len(self.buckets) + 2)
+                for i, bound in enumerate(self.buckets):
+                    if seconds <= bound:
+                        histogram[i] += 1
+                histogram[-2] += 1
+                histogram[-1] += seconds
+                self.cpu_seconds[key] = self.cpu_seconds.get(key, 0.0) + entry["cpu_ms"] / 1000
+                self.bytes[key] = self.bytes.get(key, 0) + entry["bytes"]
+
+    def render(self) -> str:
+        """Prometheus text exposition of every metric"""
+        lines: List[str] = []
+
+        def header(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            header("ocr_documents_total", "counter", "Documents processed, by document class and status.")
+            for (cls, status), value in sorted(self.documents.items()):
+                lines.append(f"ocr_documents_total{_labels(document_class=cls, status=status)} {value}")
+
+            header("ocr_pages_total", "counter", "Pages processed, by document class.")
+            for cls, value in sorted(self.pages.items()):
+                lines.append(f"ocr_pages_total{_labels(document_class=cls)} {value}")
+
+            header("ocr_cache_lookups_total", "counter", "Result cache lookups, by result.")
+            for result, value in sorted(self.cache.items()):
+                lines.append(f"ocr_cache_lookups_total{_labels(result=result)} {value}")
+
+            header("ocr_stage_duration_seconds", "histogram", "Wall time per document spent in each stage.")
+            for (name, cls), histogram in sorted(self.latency.items()):
+                for bound, count in zip(self.buckets + ("+Inf",), histogram[:-2] + [histogram[-2]]):
+                    lines.append(f"ocr_stage_duration_seconds_bucket{_labels(stage=name, document_class=cls, le=bound)} {count}")
+                labels = _labels(stage=name, document_class=cls)
+                lines.append(f"ocr_stage_duration_seconds_count{labels} {histogram[-2]}")
+                lines.append(f"ocr_stage_duration_seconds_sum{labels} {histogram[-1]:.6f}")
+
+            header("ocr_stage_cpu_seconds_total", "counter", "Process CPU time spent in each stage.")
+            for (name, cls), value in sorted(self.cpu_seconds.items()):
+                lines.append(f"ocr_stage_cpu_seconds_total{_labels(stage=name, document_class=cls)} {value:.6f}")
+
+            header("ocr_stage_bytes_total", "counter", "Bytes handled by each stage.")
+            for (name, cls), value in sorted(self.bytes.items()):
+                lines.append(f"ocr_stage_bytes_total{_labels(stage=name, document_class=cls)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every SimpleOCR instance in the process
+METRICS = Metrics()
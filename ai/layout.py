@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Page layout structure
+Builds the text_blocks / rows / full_text page structure shared by OCR
+results and PDF text-layer pages
+"""
+
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Blocks whose centre lines are within this fraction of the median line
+# height of a row's latest block join that row
+ROW_TOLERANCE_RATIO = 0.5
+
+
+def group_rows(x_min: np.ndarray, centers: np.ndarray, heights: np.ndarray) -> np.ndarray:
+    """Assign a row id to each block, rows numbered top to bottom
+
+    Blocks are taken left to right and each joins the row whose latest
+    block has the nearest centre line, if it is within a fraction of the
+    median line height; otherwise it starts a new row. Comparing against
+    the row's latest block (rather than the previous top in reading
+    order) lets rows follow a skewed baseline without small steps
+    chaining neighbouring lines together.
+
+    The pass is sequential, so it runs over plain floats: the rows'
+    latest centre lines are kept sorted and the nearest is found by
+    bisection, O(N log rows) for N blocks.
+    """
+    count = len(centers)
+    if count == 0:
+        return np.empty(0, dtype=np.int64)
+
+    tolerance = max(1.0, ROW_TOLERANCE_RATIO * float(np.median(heights)))
+    center_list = np.asarray(centers, dtype=np.float64).tolist()
+    row_ids = [0] * count
+    # Latest centre line of every row, sorted, with the matching row ids
+    latest: List[float] = []
+    latest_rows: List[int] = []
+    sums: List[float] = []
+    sizes: List[int] = []
+
+    for j in np.lexsort((centers, x_min)).tolist():
+        center = center_list[j]
+        i = bisect_left(latest, center)
+        # The nearest latest centre is just below or just above
+        nearest = None
+        if i < len(latest) and latest[i] - center <= tolerance:
+            nearest = i
+        if i > 0 and center - latest[i - 1] <= tolerance and (
+                nearest is None or center - latest[i - 1] <= latest[i] - center):
+            nearest = i - 1
+
+        if nearest is None:
+            row = len(sums)
+            sums.append(0.0)
+            sizes.append(0)
+        else:
+            row = latest_rows.pop(nearest)
+            del latest[nearest]
+        row_ids[j] = row
+        sums[row] += center
+        sizes[row] += 1
+        i = bisect_left(latest, center)
+        latest.insert(i, center)
+        latest_rows.insert(i, row)
+
+    # Renumber rows by their mean centre line, top to bottom
+    means = np.asarray(sums) / np.asarray(sizes)
+    rank = np.empty(len(sums), dtype=np.int64)
+    rank[np.argsort(means, kind="stable")] = np.arange(len(sums))
+    return rank[np.asarray(row_ids, dtype=np.int64)]
+
+
+def build_page_structure(boxes: np.ndarray, texts: Sequence[str], confidences: np.ndarray,
+                         bboxes: Optional[Sequence[Any]] = None) -> Dict[str, Any]:
+    """Build text blocks and rows from (N, 4, 2) quadrilaterals
+
+    Extents and reading order are vectorized, row clustering is one
+    bisection pass (see group_rows), and the per-block dicts are only
+    built once at the end. bboxes, if given, are
+    stored as each block's "bbox" in place of the integer box corners.
+    full_text keeps the input order.
+    """
+    count = len(texts)
+    if count == 0:
+        return {"text_blocks": [], "full_text": "", "rows": [], "total_blocks": 0, "avg_confidence": 0}
+
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(count, 4, 2)
+    confidences = np.asarray(confidences, dtype=np.float64)
+
+    # Position metrics for every box at once
+    mins = boxes.min(axis=1)
+    maxs = boxes.max(axis=1)
+    x_min, y_min = mins[:, 0].astype(np.int64), mins[:, 1].astype(np.int64)
+    x_max, y_max = maxs[:, 0].astype(np.int64), maxs[:, 1].astype(np.int64)
+    widths = (maxs[:, 0] - mins[:, 0]).astype(np.int64)
+    heights = (maxs[:, 1] - mins[:, 1]).astype(np.int64)
+
+    # Reading order (top to bottom, left to right), then rows left to right
+    order = np.lexsort((x_min, y_min))
+    row_ids = group_rows(mins[:, 0], (mins[:, 1] + maxs[:, 1]) / 2, heights)
+    row_order = np.lexsort((x_min, row_ids))
+
+    if bboxes is None:
+        bboxes = boxes.round().astype(np.int64).tolist()
+    columns = zip(x_min.tolist(), x_max.tolist(), y_min.tolist(), y_max.tolist(),
+                  widths.tolist(), heights.tolist())
+    blocks = [
+        {
+            "text": texts[j],
+            "confidence": round(float(confidences[j]), 3),
+            "bbox": bboxes[j],
+            "position": {
+                "x_min": x0,
+                "x_max": x1,
+                "y_min": y0,
+                "y_max": y1,
+                "width": w,
+                "height": h
+            }
+        }
+        for j, (x0, x1, y0, y1, w, h) in enumerate(columns)
+    ]
+
+    extracted_data = [blocks[j] for j in order.tolist()]
+    rows: List[List[Dict]] = []
+    current_row_id = None
+    for j, row_id in zip(row_order.tolist(), row_ids[row_order].tolist()):
+        if row_id != current_row_id:
+            rows.append([])
+            current_row_id = row_id
+        rows[-1].append(blocks[j])
+
+    return {
+        "text_blocks": extracted_data,
+        "full_text": " ".join(texts),
+        "rows": rows,
+        "total_blocks": len(extracted_data),
+        "avg_confidence": round(float(confidences.mean()), 3)
+    }
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+OCR cache
+Content-addressed cache keys and a bounded SQLite cache store shared by
+the OCR and PDF pipelines
+"""
+
+import os
+import json
+import hashlib
+import time
+import sqlite3
+import threading
+from typing import Dict, Any, Optional
+
+# Fast non-cryptographic digest if available, BLAKE2b otherwise
+try:
+    import xxhash
+    HAS_XXHASH = True
+except ImportError:
+    HAS_XXHASH = False
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Bump when the cached result layout changes
+CACHE_FORMAT_VERSION = 3
+
+# Default cache size budget
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# Default number of file signatures kept in the digest table
+DEFAULT_MAX_DIGESTS = 100_000
+
+
+def file_digest(file_path: str) -> str:
+    """Hash a file's contents in fixed-size chunks without loading it whole"""
+    if HAS_XXHASH:
+        hasher, name = xxhash.xxh3_128(), "xxh3"
+    else:
+        hasher, name = hashlib.blake2b(digest_size=20), "b2"
+
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return f"{name}-{hasher.hexdigest()}"
+
+
+def make_cache_key(content_digest: str, settings: Dict[str, Any]) -> str:
+    """Combine a content digest with the engine/preprocessing settings"""
+    fingerprint = json.dumps(settings, sort_keys=True, default=str)
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(content_digest.encode('utf-8'))
+    hasher.update(fingerprint.encode('utf-8'))
+    return hasher.hexdigest()
+
+
+class CacheStore:
+    """Single-file SQLite cache shared by SimpleOCR and EnhancedPDFProcessor
+
+    - Entries are namespaced blobs; every write is a single transaction.
+    - Least recently used entries are evicted once the total size exceeds
+      max_bytes (down to 90%), and entries older than max_age_seconds expire.
+      The total is kept as a running count; it is re-read from the table
+      only when it crosses max_bytes, since other processes sharing the
+      file change it too.
+    - A stat-based digest table maps (size, mtime, inode) to content digests
+      so unchanged files are never re-read. It is capped at max_digests
+      rows; past that the least recently looked up paths are forgotten
+      (down to 90%), the same way entries are evicted.
+    - hit/miss/write/eviction and byte counters are kept per process.
+    """
+
+    def __init__(self, db_path: str, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age_seconds: Optional[float] = None, max_digests: int = DEFAULT_MAX_DIGESTS):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.max_digests = max_digests
+        self._lock = threading.RLock()
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "writes": 0,
+            "evictions": 0,
+            "bytes_read": 0,
+            "bytes_written": 0
+        }
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            );
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+            CREATE TABLE IF NOT EXISTS file_digests (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                used REAL NOT NULL DEFAULT 0
+            );
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(file_digests)")}
+        if "used" not in columns:
+            try:
+                self._conn.execute("ALTER TABLE file_digests ADD COLUMN used REAL NOT NULL DEFAULT 0")
+            except sqlite3.OperationalError:
+                pass  # Another process added it first
+        self._conn.execute("CREATE INDEX IF NOT EXISTS file_digests_used ON file_digests (used)")
+        self._size = self._stored_bytes()
+        self._digests = self._stored_digests()
+
+    def get(self, key: str, namespace: str = "ocr") -> Optional[bytes]:
+        """Return a cached blob (and mark it recently used), or None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created, size FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+
+            if row and self.max_age_seconds and now - row[1] > self.max_age_seconds:
+                self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                self._size -= row[2]
+                self.counters["evictions"] += 1
+                row = None
+
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE entries SET accessed = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key)
+            )
+            self.counters["hits"] += 1
+            self.counters["bytes_read"] += len(row[0])
+            return row[0]
+
+    def put(self, key: str, value: bytes, namespace: str = "ocr"):
+        """Store a blob atomically, evicting old entries if over budget"""
+        now = time.time()
+        with self._lock:
+            with self._transaction():
+                replaced = self._entry_size(namespace, key)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, size, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (namespace, key, sqlite3.Binary(value), len(value), now, now)
+                )
+            self._size += len(value) - replaced
+            self.counters["writes"] += 1
+            self.counters["bytes_written"] += len(value)
+            self._evict()
+
+    def delete(self, key: str, namespace: str = "ocr"):
+        with self._lock:
+            with self._transaction():
+                size = self._entry_size(namespace, key)
+                self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+            self._size -= size
+
+    def _entry_size(self, namespace: str, key: str) -> int:
+        row = self._conn.execute(
+            "SELECT size FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _evict(self):
+        """Drop least recently used entries until under 90% of max_bytes"""
+        if not self.max_bytes or self._size <= self.max_bytes:
+            return
+        # Over budget by our count: resync with what every process stored
+        total = self._size = self._stored_bytes()
+        if total <= self.max_bytes:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        with self._transaction():
+            while total > target:
+                rows = self._conn.execute(
+                    "SELECT namespace, key, size FROM entries ORDER BY accessed LIMIT 256"
+                ).fetchall()
+                if not rows:
+                    break
+                for namespace, key, size in rows:
+                    if total <= target:
+                        break
+                    self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                    total -= size
+                    self.counters["evictions"] += 1
+        self._size = total
+
+    def _stored_digests(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM file_digests").fetchone()[0]
+
+    def _prune_digests(self):
+        """Forget least recently looked up paths until under 90% of max_digests"""
+        if not self.max_digests or self._digests <= self.max_digests:
+            return
+        # Resync first: other processes sharing the file add and prune rows too
+        count = self._digests = self._stored_digests()
+        if count <= self.max_digests:
+            return
+        excess = count - max(1, int(self.max_digests * 0.9))
+        self._conn.execute(
+            "DELETE FROM file_digests WHERE path IN (SELECT path FROM file_digests ORDER BY used LIMIT ?)",
+            (excess,)
+        )
+        self._digests = count - excess
+
+    def _transaction(self):
+        return _Transaction(self._conn)
+
+    def file_digest(self, file_path: str) -> str:
+        """Content digest of a file, hashing only if its stat signature changed"""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, ino, digest FROM file_digests WHERE path = ?", (path,)
+            ).fetchone()
+            if row and tuple(row[:3]) == signature:
+                self._conn.execute("UPDATE file_digests SET used = ? WHERE path = ?", (now, path))
+                return row[3]
+
+        digest = file_digest(path)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO file_digests (path, size, mtime_ns, ino, digest, used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, *signature, digest, now)
+            )
+            if row is None:
+                self._digests += 1
+                self._prune_digests()
+        return digest
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus current entry count, size and digest table rows"""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            digests = self._stored_digests()
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_ratio": round(self.counters["hits"] / lookups, 3) if lookups else 0,
+            "entries": entries,
+            "total_bytes": total,
+            "max_bytes": self.max_bytes,
+            "file_digests": digests
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK on an autocommit connection"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
@@ -9,8 +9,13 @@ import json
 import argparse
 import os
 from simple_ocr import SimpleOCR
+from preprocess import PROFILES, DEFAULT_PROFILE
+from ocr_engines import ENGINES
+from profiling import DocumentProfiler
 import asyncio
 import numpy as np
+from itertools import islice
+from typing import Iterator
 
 # Custom JSON encoder to handle numpy types
 class NumpyEncoder(json.JSONEncoder):
@@ -23,10 +28,11 @@ class NumpyEncoder(json.JSONEncoder):
             return obj.tolist()
         return super(NumpyEncoder, self).default(obj)
 
-async def process_single_file(file_path: str) -> dict:
+async def process_single_file(file_path: str, ocr: SimpleOCR = None, ocr_options: dict = None) -> dict:
     """Process a single file and return JSON result"""
     try:
-        ocr = SimpleOCR()
+        if ocr is None:
+            ocr = SimpleOCR(**(ocr_options or {}))
         result = await ocr.extract_from_document(file_path)
         return result
     except Exception as e:
@@ -36,26 +42,27 @@ async def process_single_file(file_path: str) -> dict:
             "file_path": file_path
         }
 
-async def process_batch(directory_path: str, limit: int = 10) -> dict:
+BATCH_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.pdf', '.bmp', '.tiff']
+
+def list_batch_files(directory_path: str, limit: int = 10) -> Iterator[str]:
+    """Lazily list supported files in a directory (limit <= 0 means no limit)"""
+    files = (
+        entry.path for entry in os.scandir(directory_path)
+        if entry.is_file() and any(entry.name.lower().endswith(ext) for ext in BATCH_EXTENSIONS)
+    )
+    return islice(files, limit) if limit > 0 else files
+
+async def process_batch(directory_path: str, limit: int = 10, ocr: SimpleOCR = None,
+                        max_workers: int = None, timeout: float = None, ocr_options: dict = None) -> dict:
     """Process multiple files in a directory"""
     try:
-        ocr = SimpleOCR()
-        
-        # Get image files
-        image_extensions = ['.jpg', '.jpeg', '.png', '.pdf', '.bmp', '.tiff']
-        files = []
+        if ocr is None:
+            ocr = SimpleOCR(**(ocr_options or {}))
         
-        for file in os.listdir(directory_path):
-            file_path = os.path.join(directory_path, file)
-            if os.path.isfile(file_path) and any(file.lower().endswith(ext) for ext in image_extensions):
-                files.append(file_path)
+        files = list(list_batch_files(directory_path, limit))
         
-        files = files[:limit]  # Limit number of files
-        
-        results = []
-        for file_path in files:
-            result = await ocr.extract_from_document(file_path)
-            results.append(result)
+        # Files are processed concurrently; image recognition is batched across files
+        results = await ocr.process_files(files, max_workers=max_workers, timeout=timeout)
         
         successful = [r for r in results if r.get("success", False)]
         failed = [r for r in results if not r.get("success", False)]
@@ -75,15 +82,79 @@ async def process_batch(directory_path: str, limit: int = 10) -> dict:
             "directory_path": directory_path
         }
 
+async def stream_batch(directory_path: str, out, limit: int = 10, ocr: SimpleOCR = None,
+                       max_workers: int = None, timeout: float = None, ocr_options: dict = None) -> dict:
+    """Process a directory, writing one NDJSON result line per file as it finishes
+    
+    Only counters are kept in memory; the returned summary is written last.
+    """
+    summary = {"summary": True, "success": True, "total_files": 0, "successful": 0, "failed": 0}
+    try:
+        if ocr is None:
+            ocr = SimpleOCR(**(ocr_options or {}))
+        
+        files = list_batch_files(directory_path, limit)
+        async for result in ocr.iter_files(files, max_workers=max_workers, timeout=timeout):
+            out.write(json.dumps(result, cls=NumpyEncoder) + "\n")
+            out.flush()
+            
+            summary["total_files"] += 1
+            if result.get("success", False):
+                summary["successful"] += 1
+            else:
+                summary["failed"] += 1
+    except Exception as e:
+        summary.update({"success": False, "error": str(e), "directory_path": directory_path})
+    
+    out.write(json.dumps(summary) + "\n")
+    out.flush()
+    return summary
+
 def main():
     parser = argparse.ArgumentParser(description='OCR Command Line Interface')
     parser.add_argument('--single', type=str, help='Process a single file')
     parser.add_argument('--batch', type=str, help='Process all images in a directory')
-    parser.add_argument('--limit', type=int, default=10, help='Limit number of files in batch processing')
+    parser.add_argument('--limit', type=int, default=10, help='Limit number of files in batch processing (0 = no limit)')
+    parser.add_argument('--workers', type=int, help='Files processed concurrently in batch mode')
+    parser.add_argument('--timeout', type=float, help='Per-file timeout in seconds for batch mode')
+    parser.add_argument('--stream', action='store_true', help='Write one NDJSON result per file as it finishes (batch mode)')
+    parser.add_argument('--serve', action='store_true', help='Run as a persistent worker reading NDJSON requests')
+    parser.add_argument('--socket', type=str, help='Serve on a Unix socket instead of stdin/stdout (with --serve)')
+    parser.add_argument('--port', type=int, help='Serve on 127.0.0.1:<port> instead of stdin/stdout (with --serve)')
+    parser.add_argument('--migrate-cache', nargs='?', const='', metavar='DIR',
+                        help='Move legacy .pkl cache files (default: the cache directory) into the cache store')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help='Preprocessing profile: fast, balanced (denoise only noisy pages) or quality')
+    parser.add_argument('--engine', choices=ENGINES, default='easyocr',
+                        help='OCR engine: easyocr, tesseract, or cascade (Tesseract first, EasyOCR for low-confidence text)')
+    parser.add_argument('--tile-size', type=int, metavar='PX',
+                        help='Read pages larger than PX as overlapping tiles at full resolution instead of downscaling')
+    parser.add_argument('--instrument', action='store_true',
+                        help='Attach per-stage wall/CPU time and bytes to each result ("instrumentation")')
+    parser.add_argument('--metrics-port', type=int,
+                        help='Serve Prometheus metrics on 127.0.0.1:<port>/metrics (with --serve)')
+    parser.add_argument('--profile-dir', type=str, metavar='DIR',
+                        help='Profile documents (cProfile, collapsed stacks, tracemalloc) into DIR')
+    parser.add_argument('--profile-every', type=int, default=1, metavar='N',
+                        help='With --profile-dir, profile 1 in N documents')
     
     args = parser.parse_args()
+    ocr_options = {"preprocess_profile": args.profile, "tile_size": args.tile_size, "engine": args.engine,
+                   "instrument": args.instrument}
+    if args.profile_dir:
+        ocr_options["profiler"] = DocumentProfiler(args.profile_dir, every=args.profile_every)
+    
+    if args.serve:
+        from ocr_worker import serve
+        asyncio.run(serve(socket_path=args.socket, port=args.port, ocr_options=ocr_options,
+                          metrics_port=args.metrics_port))
+        return
     
-    if args.single:
+    if args.migrate_cache is not None:
+        ocr = SimpleOCR(**ocr_options)
+        stats = ocr.migrate_legacy_cache(args.migrate_cache or None)
+        result = {"success": True, "migration": stats}
+    elif args.single:
         if not os.path.exists(args.single):
             result = {
                 "success": False,
@@ -91,7 +162,7 @@ def main():
                 "file_path": args.single
             }
         else:
-            result = asyncio.run(process_single_file(args.single))
+            result = asyncio.run(process_single_file(args.single, ocr_options=ocr_options))
             
     elif args.batch:
         if not os.path.exists(args.batch):
@@ -100,8 +171,16 @@ def main():
                 "error": f"Directory not found: {args.batch}",
                 "directory_path": args.batch
             }
+        elif args.stream:
+            # stdout carries NDJSON only; library progress output goes to stderr
+            out = sys.stdout
+            sys.stdout = sys.stderr
+            summary = asyncio.run(stream_batch(args.batch, out, args.limit, max_workers=args.workers,
+                                               timeout=args.timeout, ocr_options=ocr_options))
+            sys.exit(0 if summary["success"] else 1)
         else:
-            result = asyncio.run(process_batch(args.batch, args.limit))
+            result = asyncio.run(process_batch(args.batch, args.limit, max_workers=args.workers,
+                                               timeout=args.timeout, ocr_options=ocr_options))
     else:
         result = {
             "success": False,
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+OCR engines behind one interface
+Every engine returns EasyOCR-style detections (four-corner box, text,
+confidence in 0..1), which layout.build_page_structure turns into the
+usual text_blocks / rows. CascadeEngine runs a cheap engine first and only
+sends low-confidence lines (or whole pages) to an expensive one.
+"""
+
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Tesseract is optional: only the "tesseract" and "cascade" engines need it
+try:
+    import pytesseract
+    HAS_TESSERACT = True
+except ImportError:
+    HAS_TESSERACT = False
+
+Detection = Tuple[List[List[float]], str, float]
+
+ENGINES = ("easyocr", "tesseract", "cascade")
+
+# Lines the cheap engine reads below this confidence are re-read by the expensive one
+CASCADE_THRESHOLD = 0.8
+
+# Above this share of low-confidence lines the whole page is re-read instead
+PAGE_ESCALATION_RATIO = 0.5
+
+# Pixels added around a line before it is re-read
+REGION_PADDING = 4
+
+TESSERACT_CONFIG = "--oem 3 --psm 3"
+
+
+def _quad(x0: float, y0: float, x1: float, y1: float) -> List[List[float]]:
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def tesseract_detections(data: Dict[str, List]) -> List[Detection]:
+    """Line-level detections from a pytesseract image_to_data dict
+
+    Words are joined per (block, paragraph, line) so blocks have the same
+    granularity as EasyOCR's; a line's confidence is the mean of its
+    words' confidences, scaled to 0..1.
+    """
+    lines: Dict[Tuple[int, int, int], List] = {}
+    for i, word in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if conf < 0 or not word.strip():
+            continue
+        x0, y0 = int(data["left"][i]), int(data["top"][i])
+        x1, y1 = x0 + int(data["width"][i]), y0 + int(data["height"][i])
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        line = lines.get(key)
+        if line is None:
+            lines[key] = [[word], [conf], x0, y0, x1, y1]
+        else:
+            line[0].append(word)
+            line[1].append(conf)
+            line[2:] = [min(line[2], x0), min(line[3], y0), max(line[4], x1), max(line[5], y1)]
+
+    return [
+        (_quad(x0, y0, x1, y1), " ".join(words), sum(confs) / len(confs) / 100)
+        for words, confs, x0, y0, x1, y1 in lines.values()
+    ]
+
+
+class OCREngine(ABC):
+    """Base engine: recognize a page array into detections"""
+
+    name = "engine"
+
+    @abstractmethod
+    def recognize(self, image: np.ndarray) -> List[Detection]:
+        """Detections for the whole image"""
+
+    def recognize_regions(self, image: np.ndarray, boxes: Sequence[Sequence[int]]) -> List[Detection]:
+        """Read only the given (x_min, x_max, y_min, y_max) regions; defaults to cropping"""
+        detections = []
+        for x_min, x_max, y_min, y_max in boxes:
+            for bbox, text, conf in self.recognize(image[y_min:y_max, x_min:x_max]):
+                shifted = [[x + x_min, y + y_min] for x, y in bbox]
+                detections.append((shifted, text, conf))
+        return detections
+
+    def recognize_with_route(self, image: np.ndarray) -> Tuple[List[Detection], Dict[str, Any]]:
+        """Detections plus which engine(s) produced them"""
+        return self.recognize(image), {"engine": self.name}
+
+
+class TesseractEngine(OCREngine):
+    """Tesseract through pytesseract: one image_to_data call per page"""
+
+    name = "tesseract"
+
+    def __init__(self, config: str = TESSERACT_CONFIG):
+        if not HAS_TESSERACT:
+            raise RuntimeError("pytesseract is not installed")
+        self.config = config
+
+    @property
+    def version(self) -> str:
+        return str(pytesseract.get_tesseract_version())
+
+    def recognize(self, image: np.ndarray) -> List[Detection]:
+        data = pytesseract.image_to_data(image, config=self.config, output_type=pytesseract.Output.DICT)
+        return tesseract_detections(data)
+
+
+class EasyOCREngine(OCREngine):
+    """An EasyOCR reader; region reads skip the detector entirely
+
+    get_reader returns the reader, so it is only built (and torch loaded)
+    once a page actually needs EasyOCR.
+    """
+
+    name = "easyocr"
+
+    def __init__(self, get_reader: Callable[[], Any], lock: Optional[threading.Lock] = None,
+                 batch_size: int = 16):
+        self.get_reader = get_reader
+        self.lock = lock or threading.Lock()
+        self.batch_size = batch_size
+
+    @property
+    def reader(self):
+        return self.get_reader()
+
+    def recognize(self, image: np.ndarray) -> List[Detection]:
+        with self.lock:
+            return self.reader.readtext(image, batch_size=self.batch_size)
+
+    def recognize_regions(self, image: np.ndarray, boxes: Sequence[Sequence[int]]) -> List[Detection]:
+        if not boxes:
+            return []
+        with self.lock:
+            return self.reader.recognize(image, horizontal_list=[list(box) for box in boxes], free_list=[],
+                                         batch_size=self.batch_size)
+
+
+class CascadeEngine(OCREngine):
+    """Cheap engine first, expensive engine only where the cheap one is unsure
+
+    A page whose lines are mostly below the threshold (or that yields no
+    text at all) is re-read whole by the fallback. Otherwise only the
+    low-confidence lines are re-read, and each keeps whichever reading
+    is more confident.
+    """
+
+    name = "cascade"
+
+    def __init__(self, primary: OCREngine, fallback: OCREngine, threshold: float = CASCADE_THRESHOLD,
+                 page_ratio: float = PAGE_ESCALATION_RATIO):
+        self.primary = primary
+        self.fallback = fallback
+        self.threshold = threshold
+        self.page_ratio = page_ratio
+
+    def recognize(self, image: np.ndarray) -> List[Detection]:
+        return self.recognize_with_route(image)[0]
+
+    def recognize_with_route(self, image: np.ndarray) -> Tuple[List[Detection], Dict[str, Any]]:
+        detections = self.primary.recognize(image)
+        low = [i for i, detection in enumerate(detections) if detection[2] < self.threshold]
+
+        if not detections or len(low) > self.page_ratio * len(detections):
+            return self.fallback.recognize(image), {"engine": self.fallback.name, "escalated": "page"}
+        if not low:
+            return detections, {"engine": self.primary.name, "escalated": None}
+
+        height, width = image.shape[:2]
+        boxes = np.asarray([detections[i][0] for i in low], dtype=np.float64).reshape(len(low), 4, 2)
+        x_min = np.clip(boxes[:, :, 0].min(axis=1) - REGION_PADDING, 0, width).astype(int)
+        x_max = np.clip(boxes[:, :, 0].max(axis=1) + REGION_PADDING, 0, width).astype(int)
+        y_min = np.clip(boxes[:, :, 1].min(axis=1) - REGION_PADDING, 0, height).astype(int)
+        y_max = np.clip(boxes[:, :, 1].max(axis=1) + REGION_PADDING, 0, height).astype(int)
+        regions = list(zip(x_min.tolist(), x_max.tolist(), y_min.tolist(), y_max.tolist()))
+
+        # Region reads may come back reordered: match them by box centre
+        replaced = 0
+        detections = list(detections)
+        for bbox, text, conf in self.fallback.recognize_regions(image, regions):
+            cx, cy = np.asarray(bbox, dtype=np.float64).reshape(4, 2).mean(axis=0)
+            inside = np.flatnonzero((x_min <= cx) & (cx <= x_max) & (y_min <= cy) & (cy <= y_max))
+            if not len(inside):
+                continue
+            index = low[int(inside[0])]
+            if conf > detections[index][2] and text.strip():
+                detections[index] = (detections[index][0], text, conf)
+                replaced += 1
+
+        return detections, {"engine": self.name, "escalated": "regions", "regions": len(low), "replaced": replaced}
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Persistent OCR worker
+Loads SimpleOCR (and the EasyOCR models) once and serves newline-delimited
+JSON requests over stdin/stdout or a local socket.
+
+Request:  {"id": 1, "op": "single", "path": "/path/to/file.pdf"}
+Response: {"id": 1, "ok": true, "result": {...}}
+
+Supported ops: health, single, batch, analyze, metrics, shutdown
+
+With --instrument, results carry per-stage timings and the "metrics" op
+(or GET /metrics on --metrics-port) returns them aggregated in the
+Prometheus text format.
+"""
+
+import sys
+import os
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+from simple_ocr import SimpleOCR
+from preprocess import PROFILES, DEFAULT_PROFILE
+from ocr_engines import ENGINES
+from ocr_cli import NumpyEncoder, process_single_file, process_batch
+from instrumentation import METRICS
+from profiling import DocumentProfiler
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class OCRWorker:
+    """Long-lived OCR worker that reuses one SimpleOCR instance across requests"""
+
+    def __init__(self, cache_dir: str = "./ocr_cache", ocr_options: Optional[Dict[str, Any]] = None):
+        self.cache_dir = cache_dir
+        self.ocr_options = ocr_options or {}
+        self.ocr: Optional[SimpleOCR] = None
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+        self.load_error: Optional[str] = None
+        self.requests_served = 0
+        self.requests_failed = 0
+        self.in_flight = 0
+        self.shutdown_event = asyncio.Event()
+
+        # EasyOCR readers are not shared between threads, so all OCR work is
+        # serialized on one thread while health probes stay responsive.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ocr")
+
+    def _build(self) -> SimpleOCR:
+        ocr = SimpleOCR(cache_dir=self.cache_dir, **self.ocr_options)
+        # The EasyOCR reader is lazy; build it now so the first request
+        # does not pay for the model load and "ready" means ready
+        if ocr.engine in ("easyocr", "cascade"):
+            ocr.reader
+        return ocr
+
+    async def load(self):
+        """Build the OCR engine once, off the event loop"""
+        loop = asyncio.get_running_loop()
+        try:
+            self.ocr = await loop.run_in_executor(self._executor, self._build)
+            self.ready_at = time.time()
+            print(f"✅ OCR worker ready in {self.ready_at - self.started_at:.1f}s", file=sys.stderr)
+        except Exception as e:
+            self.load_error = str(e)
+            print(f"❌ OCR worker failed to load engine: {e}", file=sys.stderr)
+
+    def health(self) -> Dict[str, Any]:
+        """Readiness/liveness probe payload"""
+        if self.load_error:
+            status = "error"
+        elif self.ocr is None:
+            status = "loading"
+        else:
+            status = "ready"
+
+        health = {
+            "status": status,
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "requests_served": self.requests_served,
+            "requests_failed": self.requests_failed,
+            "in_flight": self.in_flight
+        }
+        if self.ready_at:
+            health["load_seconds"] = round(self.ready_at - self.started_at, 3)
+        if self.ocr is not None:
+            health["cache"] = self.ocr.cache_store.stats()
+        if self.load_error:
+            health["error"] = self.load_error
+        return health
+
+    def metrics(self) -> str:
+        """Worker counters plus the per-stage OCR metrics, in Prometheus text format"""
+        lines = [
+            "# HELP ocr_worker_requests_total OCR requests handled by the worker, by status.",
+            "# TYPE ocr_worker_requests_total counter",
+            f'ocr_worker_requests_total{{status="success"}} {self.requests_served}',
+            f'ocr_worker_requests_total{{status="error"}} {self.requests_failed}',
+            "# HELP ocr_worker_in_flight OCR requests currently running or queued.",
+            "# TYPE ocr_worker_in_flight gauge",
+            f"ocr_worker_in_flight {self.in_flight}",
+            "# HELP ocr_worker_uptime_seconds Seconds since the worker started.",
+            "# TYPE ocr_worker_uptime_seconds gauge",
+            f"ocr_worker_uptime_seconds {time.time() - self.started_at:.3f}",
+        ]
+        return "\n".join(lines) + "\n" + METRICS.render()
+
+    def _run_ocr_job(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a blocking OCR request on the worker thread"""
+        op = request.get("op")
+        path = request.get("path")
+
+        if not path or not os.path.exists(path):
+            return {
+                "success": False,
+                "error": f"File not found: {path}",
+                "file_path": path
+            }
+
+        if op == "single":
+            return asyncio.run(process_single_file(path, ocr=self.ocr))
+        if op == "batch":
+            return asyncio.run(process_batch(path, request.get("limit", 10), ocr=self.ocr))
+        if op == "analyze":
+            if not self.ocr.pdf_processor:
+                return {"success": False, "error": "Enhanced PDF processor not available", "file_path": path}
+            return {
+                "success": True,
+                "file_path": path,
+                "pdf_analysis": self.ocr.pdf_processor.analyze_pdf_content(path)
+            }
+        raise ValueError(f"Unknown op: {op}")
+
+    async def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Dispatch one request and build its response envelope"""
+        request_id = request.get("id")
+        op = request.get("op")
+
+        if op == "health":
+            return {"id": request_id, "ok": True, "result": self.health()}
+        if op == "metrics":
+            return {"id": request_id, "ok": True,
+                    "result": {"content_type": PROMETHEUS_CONTENT_TYPE, "text": self.metrics()}}
+        if op == "shutdown":
+            self.shutdown_event.set()
+            return {"id": request_id, "ok": True, "result": {"status": "shutting_down"}}
+
+        if self.ocr is None:
+            error = self.load_error or "OCR engine is still loading"
+            return {"id": request_id, "ok": False, "error": error}
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, self._run_ocr_job, request)
+            self.requests_served += 1
+            return {"id": request_id, "ok": True, "result": result}
+        except Exception as e:
+            self.requests_failed += 1
+            return {"id": request_id, "ok": False, "error": str(e)}
+        finally:
+            self.in_flight -= 1
+
+    async def serve_stream(self, reader: asyncio.StreamReader, write_line):
+        """Read NDJSON requests from a stream until EOF or shutdown"""
+        tasks = set()
+
+        async def respond(request):
+            write_line(await self.handle(request))
+
+        shutdown = asyncio.ensure_future(self.shutdown_event.wait())
+        while not self.shutdown_event.is_set():
+            readline = asyncio.ensure_future(reader.readline())
+            await asyncio.wait({readline, shutdown}, return_when=asyncio.FIRST_COMPLETED)
+            if not readline.done():
+                readline.cancel()
+                break
+            line = readline.result()
+            if not line:
+                break
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                write_line({"id": None, "ok": False, "error": f"Invalid JSON request: {e}"})
+                continue
+
+            # Each request runs as its own task so health probes are answered
+            # while a long OCR job is still running.
+            task = asyncio.create_task(respond(request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        shutdown.cancel()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    return (json.dumps(message, cls=NumpyEncoder) + "\n").encode("utf-8")
+
+
+async def _serve_stdio(worker: OCRWorker, protocol_out):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=2 ** 24)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    def write_line(message):
+        protocol_out.write(_encode(message))
+        protocol_out.flush()
+
+    async def announce():
+        await worker.load()
+        write_line({"event": "ready" if worker.ocr else "error", **worker.health()})
+
+    # Health probes are answered (status "loading") while the models load
+    load_task = asyncio.create_task(announce())
+    await worker.serve_stream(reader, write_line)
+    load_task.cancel()
+
+
+async def _serve_socket(worker: OCRWorker, socket_path: Optional[str], port: Optional[int]):
+    async def on_connect(reader, writer):
+        def write_line(message):
+            writer.write(_encode(message))
+
+        try:
+            await worker.serve_stream(reader, write_line)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = await asyncio.start_unix_server(on_connect, path=socket_path, limit=2 ** 24)
+        print(f"🔌 OCR worker listening on {socket_path}", file=sys.stderr)
+    else:
+        server = await asyncio.start_server(on_connect, host="127.0.0.1", port=port, limit=2 ** 24)
+        print(f"🔌 OCR worker listening on 127.0.0.1:{port}", file=sys.stderr)
+
+    async with server:
+        await worker.load()
+        await worker.shutdown_event.wait()
+
+    if socket_path and os.path.exists(socket_path):
+        os.remove(socket_path)
+
+
+async def _serve_metrics(worker: OCRWorker, port: int):
+    """Minimal HTTP endpoint for Prometheus scrapes: GET /metrics on 127.0.0.1:<port>"""
+    async def on_connect(reader, writer):
+        try:
+            request_line = await reader.readline()
+            # Skip the request headers
+            while (await reader.readline()).strip():
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, content_type, body = "200 OK", PROMETHEUS_CONTENT_TYPE, worker.metrics().encode("utf-8")
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", b"Not Found\n"
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+            await writer.drain()
+        except (ConnectionError, UnicodeDecodeError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(on_connect, host="127.0.0.1", port=port)
+    print(f"📈 Metrics on http://127.0.0.1:{port}/metrics", file=sys.stderr)
+    return server
+
+
+async def serve(socket_path: Optional[str] = None, port: Optional[int] = None, cache_dir: str = "./ocr_cache",
+                ocr_options: Optional[Dict[str, Any]] = None, metrics_port: Optional[int] = None):
+    """Run the worker on stdin/stdout, a Unix socket or a localhost TCP port"""
+    # stdout carries the protocol; stray prints from the OCR libraries go to stderr
+    protocol_out = sys.stdout.buffer
+    sys.stdout = sys.stderr
+
+    worker = OCRWorker(cache_dir=cache_dir, ocr_options=ocr_options)
+    metrics_server = await _serve_metrics(worker, metrics_port) if metrics_port else None
+    try:
+        if socket_path or port:
+            await _serve_socket(worker, socket_path, port)
+        else:
+            await _serve_stdio(worker, protocol_out)
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        worker.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Persistent OCR worker (NDJSON over stdin or a local socket)')
+    parser.add_argument('--socket', type=str, help='Unix socket path to listen on')
+    parser.add_argument('--port', type=int, help='Localhost TCP port to listen on')
+    parser.add_argument('--cache-dir', type=str, default='./ocr_cache', help='OCR cache directory')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default=DEFAULT_PROFILE, help='Preprocessing profile')
+    parser.add_argument('--engine', choices=ENGINES, default='easyocr', help='OCR engine')
+    parser.add_argument('--tile-size', type=int, metavar='PX', help='Tile pages larger than PX instead of downscaling')
+    parser.add_argument('--instrument', action='store_true', help='Record per-stage timings in results and metrics')
+    parser.add_argument('--metrics-port', type=int, help='Serve Prometheus metrics on 127.0.0.1:<port>/metrics')
+    parser.add_argument('--profile-dir', type=str, metavar='DIR', help='Profile documents into DIR')
+    parser.add_argument('--profile-every', type=int, default=1, metavar='N', help='Profile 1 in N documents')
+
+    args = parser.parse_args()
+    profiler = DocumentProfiler(args.profile_dir, every=args.profile_every) if args.profile_dir else None
+    asyncio.run(serve(socket_path=args.socket, port=args.port, cache_dir=args.cache_dir,
+                      ocr_options={"preprocess_profile": args.profile, "tile_size": args.tile_size,
+                                   "engine": args.engine, "instrument": args.instrument,
+                                   "profiler": profiler},
+                      metrics_port=args.metrics_port))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Pipelined page executor for multi-page documents
+Overlaps rendering, preprocessing and recognition across pages
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional
+
+_DONE = object()
+
+
+def page_nbytes(page: Any) -> int:
+    """Approximate decoded size of a page (PIL image or NumPy array)"""
+    if hasattr(page, "nbytes"):
+        return int(page.nbytes)
+    if hasattr(page, "getbands"):
+        return page.width * page.height * len(page.getbands())
+    return 0
+
+
+class _ByteBudget:
+    """Blocks the producer while in-flight pages exceed a byte budget"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, size: int, stop: threading.Event):
+        with self._cond:
+            # A page larger than the whole budget still goes through on its own
+            while self.used and self.used + size > self.limit and not stop.is_set():
+                self._cond.wait(0.1)
+            self.used += size
+
+    def release(self, size: int):
+        with self._cond:
+            self.used -= size
+            self._cond.notify_all()
+
+
+class PagePipeline:
+    """Three-stage page executor: render -> preprocess (pool) -> recognize
+
+    Pages are pulled lazily from the input iterable on a feeder thread, so
+    rendering page N+1 overlaps preprocessing of page N in the worker pool
+    while the caller's thread runs recognition. Results are returned in
+    input order regardless of which worker finishes first.
+
+    When recognize_batch_fn is given, preprocessed pages are recognized in
+    micro-batches of batch_size pages instead of one at a time.
+
+    memory_budget caps the decoded bytes of pages that have been rendered
+    but not yet preprocessed; the feeder stops pulling pages until earlier
+    ones are released, so arbitrarily long documents run in flat memory.
+    """
+
+    def __init__(self, preprocess_fn: Callable, recognize_fn: Callable,
+                 workers: Optional[int] = None, use_processes: bool = True,
+                 recognize_batch_fn: Optional[Callable] = None, batch_size: int = 1,
+                 memory_budget: Optional[int] = None, size_fn: Callable[[Any], int] = page_nbytes):
+        self.preprocess_fn = preprocess_fn
+        self.recognize_fn = recognize_fn
+        self.recognize_batch_fn = recognize_batch_fn
+        self.batch_size = max(1, batch_size)
+        self.memory_budget = memory_budget
+        self.size_fn = size_fn
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.use_processes = use_processes
+        self._pool = None
+        # Concurrent documents (batch workers) must not each start a pool
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        """Create the worker pool on first use and reuse it across documents"""
+        with self._pool_lock:
+            if self._pool is None:
+                if self.use_processes:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="preprocess")
+            return self._pool
+
+    def _recognize(self, prepared: List[Any]) -> List[Any]:
+        """Recognize a micro-batch of preprocessed pages"""
+        if self.recognize_batch_fn is not None and len(prepared) > 1:
+            return self.recognize_batch_fn(prepared)
+        return [self.recognize_fn(page) for page in prepared]
+
+    def run(self, pages: Iterable[Any]) -> List[Any]:
+        """Run every page through the pipeline and return results in page order"""
+        if self.workers == 1 or (hasattr(pages, "__len__") and len(pages) <= 1):
+            results = []
+            prepared = []
+            for page in pages:
+                prepared.append(self.preprocess_fn(page))
+                if len(prepared) >= self.batch_size:
+                    results.extend(self._recognize(prepared))
+                    prepared = []
+            if prepared:
+                results.extend(self._recognize(prepared))
+            return results
+
+        pool = self._get_pool()
+        # Bounded window of in-flight pages keeps memory flat on long documents
+        in_flight = queue.Queue(maxsize=max(self.workers * 2, self.batch_size))
+        stop = threading.Event()
+        budget = _ByteBudget(self.memory_budget) if self.memory_budget else None
+
+        def feed():
+            try:
+                for page in pages:
+                    size = self.size_fn(page) if budget else 0
+                    if budget:
+                        budget.acquire(size, stop)
+                    future = pool.submit(self.preprocess_fn, page)
+                    del page
+                    while not stop.is_set():
+                        try:
+                            in_flight.put((future, size), timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+                    if stop.is_set():
+                        future.cancel()
+                        return
+            except Exception as e:
+                in_flight.put(e)
+            finally:
+                in_flight.put(_DONE)
+
+        feeder = threading.Thread(target=feed, name="page-render", daemon=True)
+        feeder.start()
+
+        results = []
+        prepared = []
+        try:
+            while True:
+                item = in_flight.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                future, size = item
+                prepared.append(future.result())
+                # The rendered page is no longer needed once preprocessed
+                del item, future
+                if budget:
+                    budget.release(size)
+                if len(prepared) >= self.batch_size:
+                    results.extend(self._recognize(prepared))
+                    prepared = []
+            if prepared:
+                results.extend(self._recognize(prepared))
+        finally:
+            stop.set()
+            # Unblock the feeder if it is waiting on a full window
+            while feeder.is_alive():
+                try:
+                    item = in_flight.get(timeout=0.1)
+                    if isinstance(item, tuple):
+                        item[0].cancel()
+                except queue.Empty:
+                    pass
+
+        return results
+
+    def close(self):
+        """Shut down the worker pool"""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
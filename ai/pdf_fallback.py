@@ -5,37 +5,70 @@ Uses PyMuPDF to convert PDF to images
 """
 
 import fitz  # PyMuPDF
+import numpy as np
 from PIL import Image
-import io
 import os
-from typing import List
+import sys
+from typing import List, Optional
 
-def convert_pdf_to_images_fallback(pdf_path: str, dpi: int = 300, max_pages: int = 20) -> List[Image.Image]:
-    """Convert PDF to images using PyMuPDF when poppler is not available"""
+class PixmapArray(np.ndarray):
+    """Array viewing a Pixmap's samples; holds the Pixmap so the buffer stays valid
+
+    Views (slices, reshapes, np.asarray) keep this array, and with it the
+    Pixmap, alive through their base.
+    """
+
+    def __array_finalize__(self, obj):
+        self.pixmap = getattr(obj, "pixmap", None)
+
+def render_page_array(page, dpi: int = 300, grayscale: bool = False) -> np.ndarray:
+    """Render a page straight into a NumPy array (H x W x 3, or H x W if grayscale)
+    
+    The array views the pixmap's sample buffer (Pixmap.samples_mv): no PNG
+    encode/decode and no extra copy. The buffer belongs to the Pixmap, so
+    the array keeps a reference to it. The array is read-only; copy it
+    before modifying. PyMuPDF without samples_mv falls back to one copy.
+    """
+    mat = fitz.Matrix(dpi/72.0, dpi/72.0)  # Create transformation matrix for DPI
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    pix = page.get_pixmap(matrix=mat, colorspace=colorspace, alpha=False)
+    
+    if hasattr(pix, "samples_mv"):
+        samples = np.frombuffer(pix.samples_mv, dtype=np.uint8).view(PixmapArray)
+        samples.pixmap = pix
+    else:
+        samples = np.frombuffer(pix.samples, dtype=np.uint8)
+    samples.flags.writeable = False
+    if pix.stride != pix.width * pix.n:
+        # Rows are padded: view the padded rows and slice the padding off
+        samples = samples.reshape(pix.height, pix.stride)[:, :pix.width * pix.n]
+    shape = (pix.height, pix.width) if pix.n == 1 else (pix.height, pix.width, pix.n)
+    return samples.reshape(shape)
+
+def convert_pdf_to_images_fallback(pdf_path: str, dpi: int = 300, max_pages: Optional[int] = None,
+                                   grayscale: bool = False, first_page: int = 1) -> List[Image.Image]:
+    """Convert PDF to images using PyMuPDF when poppler is not available
+    
+    Pages first_page..max_pages (1-based, inclusive); max_pages=None means
+    through the last page.
+    """
     images = []
     
     try:
         doc = fitz.open(pdf_path)
+        last_page = len(doc) if max_pages is None else min(len(doc), max_pages)
         
-        for page_num in range(min(len(doc), max_pages)):
-            page = doc[page_num]
-            
-            # Render page to image
-            mat = fitz.Matrix(dpi/72.0, dpi/72.0)  # Create transformation matrix for DPI
-            pix = page.get_pixmap(matrix=mat, alpha=False)
-            
-            # Convert to PIL Image
-            img_data = pix.tobytes("png")
-            img = Image.open(io.BytesIO(img_data))
-            images.append(img)
+        for page_num in range(first_page - 1, last_page):
+            # Render page straight into an image backed by the pixmap samples
+            images.append(Image.fromarray(render_page_array(doc[page_num], dpi, grayscale)))
             
-            print(f"✅ Converted page {page_num + 1}/{min(len(doc), max_pages)}", end='\r')
+            print(f"✅ Converted page {page_num + 1}/{last_page}", end='\r', file=sys.stderr)
         
         doc.close()
-        print(f"\n✅ Successfully converted {len(images)} pages using PyMuPDF")
+        print(f"\n✅ Successfully converted {len(images)} pages using PyMuPDF", file=sys.stderr)
         
     except Exception as e:
-        print(f"❌ PyMuPDF conversion failed: {e}")
+        print(f"❌ PyMuPDF conversion failed: {e}", file=sys.stderr)
         
     return images
 
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+PDF document session
+Opens a PDF once and memoizes per-page text and image lists so the analysis,
+extraction and rendering stages share a single parse
+"""
+
+import io
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+try:
+    import fitz  # PyMuPDF
+    from pdf_fallback import render_page_array
+    HAS_PYMUPDF = True
+except ImportError:
+    HAS_PYMUPDF = False
+
+# An image covering at least this share of the page counts as a full-page scan
+FULL_PAGE_COVERAGE = 0.95
+
+
+class PDFSession:
+    """One open PyMuPDF document shared across processing stages
+
+    Page numbers are 1-based. The document is opened lazily on first use;
+    without PyMuPDF (or if the file cannot be opened) `available` is False
+    and callers fall back to their own extraction paths. Access is
+    serialized because PyMuPDF documents are not thread-safe and renders
+    may be pulled from a pipeline thread.
+    """
+
+    def __init__(self, pdf_path: str):
+        self.pdf_path = pdf_path
+        self._doc = None
+        self._open_error: Optional[str] = None
+        self._lock = threading.RLock()
+        self._text: Dict[int, str] = {}
+        self._images: Dict[int, List[Tuple]] = {}
+        self._image_info: Dict[int, List[Dict[str, Any]]] = {}
+        self._words: Dict[int, List[Tuple]] = {}
+
+    @property
+    def doc(self):
+        """The open fitz document, or None if PyMuPDF cannot open the file"""
+        if self._doc is None and self._open_error is None:
+            if not HAS_PYMUPDF:
+                self._open_error = "PyMuPDF not available"
+            else:
+                try:
+                    self._doc = fitz.open(self.pdf_path)
+                except Exception as e:
+                    self._open_error = str(e)
+        return self._doc
+
+    @property
+    def available(self) -> bool:
+        return self.doc is not None
+
+    @property
+    def open_error(self) -> Optional[str]:
+        return self._open_error
+
+    @property
+    def page_count(self) -> int:
+        return len(self.doc) if self.available else 0
+
+    def page(self, page_num: int):
+        return self.doc[page_num - 1]
+
+    def text(self, page_num: int) -> str:
+        """Plain text of a page (extracted once)"""
+        with self._lock:
+            if page_num not in self._text:
+                self._text[page_num] = self.page(page_num).get_text()
+            return self._text[page_num]
+
+    def words(self, page_num: int) -> List[Tuple]:
+        """get_text("words") for a page: (x0, y0, x1, y1, word, block, line, word_no)"""
+        with self._lock:
+            if page_num not in self._words:
+                self._words[page_num] = self.page(page_num).get_text("words")
+            return self._words[page_num]
+
+    def images(self, page_num: int) -> List[Tuple]:
+        """get_images(full=True) for a page"""
+        with self._lock:
+            if page_num not in self._images:
+                self._images[page_num] = self.page(page_num).get_images(full=True)
+            return self._images[page_num]
+
+    def image_info(self, page_num: int) -> List[Dict[str, Any]]:
+        """Placed images with their bounding boxes, transforms and xrefs"""
+        with self._lock:
+            if page_num not in self._image_info:
+                self._image_info[page_num] = self.page(page_num).get_image_info(xrefs=True)
+            return self._image_info[page_num]
+
+    def embedded_page_image(self, page_num: int) -> Optional[Image.Image]:
+        """The page's scan image at native resolution, if the page is nothing else
+
+        Only for pages with a single upright, opaque image covering the whole
+        page and no text or vector drawings; anything else returns None and
+        should be rendered instead.
+        """
+        try:
+            with self._lock:
+                page = self.page(page_num)
+                if page.rotation:
+                    return None
+
+                infos = self.image_info(page_num)
+                if len(infos) != 1 or not infos[0].get("xref"):
+                    return None
+                info = infos[0]
+
+                a, b, c, d, _, _ = info["transform"]
+                if abs(b) > 1e-3 or abs(c) > 1e-3 or a <= 0 or d <= 0:
+                    return None
+
+                page_area = abs(page.rect)
+                bbox = fitz.Rect(info["bbox"])
+                if abs(bbox & page.rect) < FULL_PAGE_COVERAGE * page_area or abs(bbox) > page_area / FULL_PAGE_COVERAGE:
+                    return None
+                if self.text(page_num).strip() or page.get_drawings():
+                    return None
+
+                extracted = self.doc.extract_image(info["xref"])
+                if not extracted or extracted.get("smask"):
+                    return None
+
+            image = Image.open(io.BytesIO(extracted["image"]))
+            image.load()
+            return image
+        except Exception:
+            return None
+
+    def render_array(self, page_num: int, dpi: int, grayscale: bool = False) -> np.ndarray:
+        """Rasterize a page into a read-only array backed by the pixmap samples
+
+        Renders are not kept: each page is rendered once and recognized, and
+        holding full-page buffers afterwards would only pin memory.
+        """
+        with self._lock:
+            return render_page_array(self.page(page_num), dpi, grayscale)
+
+    def render(self, page_num: int, dpi: int, grayscale: bool = False) -> Image.Image:
+        """Rasterize a page to an RGB (or L) image sharing the rendered buffer"""
+        return Image.fromarray(self.render_array(page_num, dpi, grayscale))
+
+    def raw_stream(self, xref: int) -> bytes:
+        with self._lock:
+            return self.doc.xref_stream_raw(xref) or b""
+
+    def close(self):
+        with self._lock:
+            if self._doc is not None:
+                self._doc.close()
+                self._doc = None
+
+    def __enter__(self) -> "PDFSession":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+@contextmanager
+def pdf_session(pdf_path: str, session: Optional[PDFSession] = None) -> Iterator[PDFSession]:
+    """Use the caller's session if given, otherwise open (and close) a new one"""
+    if session is not None:
+        yield session
+        return
+    with PDFSession(pdf_path) as own:
+        yield own
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Opt-in per-document profiling
+Captures a cProfile profile, collapsed stacks (for flamegraph.pl,
+speedscope or inferno) and the top tracemalloc allocations for 1 in N
+documents, and writes them to a profile directory. The result of a
+sampled document lists the files under "profiling".
+
+cProfile only sees the thread that processes the document; the stack
+sampler and tracemalloc see the whole process (including page render
+threads), so profile with one file in flight for clean per-document
+numbers. Preprocessing in worker processes shows up as waiting. Only one
+cProfile can be active per process (Python 3.12+ raises otherwise), so a
+document sampled while another is being profiled gets the stack samples
+and allocations without a .prof file.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional
+
+# Stack samples per second taken for the collapsed-stack profile
+SAMPLE_HZ = 200
+
+# Allocation sites / functions listed in the reports
+TOP_ALLOCATIONS = 25
+TOP_FUNCTIONS = 10
+
+# Frames kept per traced allocation
+TRACEMALLOC_FRAMES = 1
+
+# Held by the document whose cProfile is enabled
+_cprofile_lock = threading.Lock()
+
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            _tracemalloc_owned = True
+        _tracemalloc_users += 1
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+
+def _start_cprofile() -> Optional[cProfile.Profile]:
+    """An enabled profiler, or None if another one is active in this process"""
+    if not _cprofile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiling tool (debugger, coverage) holds the profiler slot
+        _cprofile_lock.release()
+        return None
+    return profiler
+
+
+def _stop_cprofile(profiler: Optional[cProfile.Profile]):
+    if profiler is not None:
+        profiler.disable()
+        _cprofile_lock.release()
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_owned
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        # Tracing someone else started is left running
+        if _tracemalloc_users == 0 and _tracemalloc_owned:
+            tracemalloc.stop()
+            _tracemalloc_owned = False
+
+
+class StackSampler:
+    """Background thread counting the Python stacks of every thread"""
+
+    def __init__(self, hz: int = SAMPLE_HZ):
+        self.interval = 1.0 / hz
+        self.counts: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    @staticmethod
+    def _frame_name(code) -> str:
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_name(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}").replace(";", ","))
+                key = ";".join(reversed(stack))
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: str):
+        """Collapsed-stack format: one "root;...;leaf count" line per stack"""
+        with open(path, "w") as f:
+            for stack, count in sorted(self.counts.items()):
+                f.write(f"{stack} {count}\n")
+
+
+class DocumentProfiler:
+    """Profiles every Nth document into output_dir
+
+    profile(label) is a context manager yielding a dict that is filled
+    with the artifact paths and summary when the block ends (None when
+    the document is not sampled). Calls nested inside another document on
+    the same thread, e.g. process_pdf_hybrid called from
+    extract_from_document, are part of that document: they yield None and
+    are not counted.
+    """
+
+    def __init__(self, output_dir: str = "./ocr_profiles", every: int = 1, memory: bool = True,
+                 sample_hz: int = SAMPLE_HZ):
+        if every < 1:
+            raise ValueError("every must be at least 1")
+        self.output_dir = output_dir
+        self.every = every
+        self.memory = memory
+        self.sample_hz = sample_hz
+        self.documents = 0
+        self.profiled = 0
+        self._lock = threading.Lock()
+        self._active = threading.local()
+
+    def _sample(self) -> Optional[int]:
+        """Sequence number of the next profile, or None if this document is skipped"""
+        with self._lock:
+            self.documents += 1
+            if (self.documents - 1) % self.every:
+                return None
+            self.profiled += 1
+            return self.profiled
+
+    def _base_path(self, label: str, sequence: int) -> str:
+        stem = re.sub(r"[^A-Za-z0-9._-]+", "_", os.path.splitext(os.path.basename(label))[0])[:80] or "document"
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = f"{stem}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{sequence:04d}"
+        return os.path.join(self.output_dir, name)
+
+    @contextmanager
+    def profile(self, label: str):
+        # Nested entry points (sampled or not) belong to the outer document
+        if getattr(self._active, "running", False):
+            yield None
+            return
+        sequence = self._sample()
+        if sequence is None:
+            self._active.running = True
+            try:
+                yield None
+            finally:
+                self._active.running = False
+            return
+
+        capture: Dict[str, Any] = {"label": label}
+        sampler = StackSampler(self.sample_hz)
+        self._active.running = True
+        if self.memory:
+            _start_tracemalloc()
+        sampler.start()
+        start = time.perf_counter()
+        profiler = _start_cprofile()
+        if profiler is None:
+            capture["cprofile_skipped"] = "another profile is active"
+        try:
+            yield capture
+        finally:
+            _stop_cprofile(profiler)
+            capture["wall_s"] = round(time.perf_counter() - start, 3)
+            sampler.stop()
+            self._active.running = False
+            snapshot = None
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                snapshot = tracemalloc.take_snapshot()
+                _stop_tracemalloc()
+                capture["traced_bytes"] = current
+                capture["peak_traced_bytes"] = peak
+            try:
+                self._write(capture, self._base_path(label, sequence), profiler, sampler, snapshot)
+            except OSError as e:
+                capture["error"] = f"Could not write profile: {e}"
+                print(f"⚠️  {capture['error']}", file=sys.stderr)
+
+    def _write(self, capture: Dict[str, Any], base: str, profiler: Optional[cProfile.Profile],
+               sampler: StackSampler, snapshot: Optional[tracemalloc.Snapshot]):
+        capture["collapsed"] = base + ".collapsed"
+        sampler.write(capture["collapsed"])
+
+        if profiler is not None:
+            capture["cprofile"] = base + ".prof"
+            profiler.dump_stats(capture["cprofile"])
+            stats = pstats.Stats(profiler)
+            top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+            capture["top_functions"] = [
+                {
+                    "function": f"{name} ({os.path.basename(filename)}:{line})",
+                    "calls": calls,
+                    "tottime_s": round(tottime, 4),
+                    "cumtime_s": round(cumtime, 4)
+                }
+                for (filename, line, name), (_, calls, tottime, cumtime, _) in top
+            ]
+
+        if snapshot is not None:
+            capture["tracemalloc"] = base + ".alloc.json"
+            with open(capture["tracemalloc"], "w") as f:
+                json.dump({
+                    "label": capture["label"],
+                    "traced_bytes": capture["traced_bytes"],
+                    "peak_traced_bytes": capture["peak_traced_bytes"],
+                    "top_allocations": top_allocations(snapshot)
+                }, f, indent=2)
+
+        print(f"🔬 Profile written to {base}.*", file=sys.stderr)
+
+
+def top_allocations(snapshot: tracemalloc.Snapshot, limit: int = TOP_ALLOCATIONS) -> List[Dict[str, Any]]:
+    """Largest live allocation sites in a snapshot, by line"""
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__)
+    ])
+    return [
+        {
+            "file": stat.traceback[0].filename,
+            "line": stat.traceback[0].lineno,
+            "size_bytes": stat.size,
+            "count": stat.count
+        }
+        for stat in snapshot.statistics("lineno")[:limit]
+    ]
+
+
+def profiled(profiler: Optional[DocumentProfiler], label: str):
+    """profiler.profile(label), or a no-op yielding None when profiling is off"""
+    return profiler.profile(label) if profiler is not None else nullcontext()
+
+
+def attach_profile(result: Any, capture: Optional[Dict[str, Any]]) -> Any:
+    """Add a finished capture to a result dict under "profiling" """
+    if capture is not None and isinstance(result, dict):
+        result["profiling"] = capture
+    return result
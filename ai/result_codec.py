@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Compact, pickle-free encoding for OCR results
+Text blocks are stored column-wise (int32 boxes, float32 confidences) in
+separate segments so full_text can be read without decoding any blocks.
+Boxes round-trip exactly: a result with float bbox coordinates stores
+them as float64, and integer bboxes come back as integers.
+"""
+
+import json
+import struct
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# msgpack is smaller and faster; JSON keeps the format readable without it
+try:
+    import msgpack
+    HAS_MSGPACK = True
+except ImportError:
+    HAS_MSGPACK = False
+
+MAGIC = b"ATLR"
+FORMAT_VERSION = 2
+
+# MAGIC | version (u8) | codec (u8) | header length (u32) | header | segments
+_PREFIX = struct.Struct("<4sBBI")
+_CODEC_JSON = 0
+_CODEC_MSGPACK = 1
+
+_BLOCK_KEYS = {"text", "confidence", "bbox", "position"}
+
+
+def _plain(obj):
+    """Convert numpy values left in a result into plain Python types"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Cannot encode {type(obj).__name__}")
+
+
+def _dumps(obj, codec: int) -> bytes:
+    if codec == _CODEC_MSGPACK:
+        return msgpack.packb(obj, default=_plain, use_bin_type=True)
+    return json.dumps(obj, default=_plain, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(data: bytes, codec: int):
+    if codec == _CODEC_MSGPACK:
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+
+def _is_block_list(value) -> bool:
+    return isinstance(value, list) and bool(value) and all(
+        isinstance(item, dict) and "text" in item and "position" in item for item in value
+    )
+
+
+class _BlockTable:
+    """Collects unique text blocks and packs them into typed columns"""
+
+    def __init__(self):
+        self.index: Dict[int, int] = {}
+        self.blocks: List[Dict] = []
+
+    def ref(self, block: Dict) -> int:
+        # Page, combined and row lists share the same dicts; store each once
+        key = id(block)
+        if key not in self.index:
+            self.index[key] = len(self.blocks)
+            self.blocks.append(block)
+        return self.index[key]
+
+    def pack(self, codec: int) -> Dict[str, bytes]:
+        count = len(self.blocks)
+        quads = []
+        for block in self.blocks:
+            bbox = block.get("bbox")
+            quad = np.asarray(bbox) if bbox is not None else None
+            quads.append(quad if quad is not None and quad.shape == (4, 2) and quad.dtype.kind in "iuf" else None)
+        # Float coordinates (e.g. EasyOCR free-form boxes) are kept as float64;
+        # bbox_float marks which blocks had them so integer boxes stay integers
+        float_boxes = np.array([quad is not None and quad.dtype.kind == "f" for quad in quads], dtype=np.uint8)
+        bboxes = np.zeros((count, 4, 2), dtype="<f8" if float_boxes.any() else "<i4")
+        positions = np.zeros((count, 6), dtype="<i4")
+        confidences = np.zeros(count, dtype="<f4")
+        texts = []
+        extras = {}
+
+        for i, block in enumerate(self.blocks):
+            texts.append(block.get("text", ""))
+            confidences[i] = block.get("confidence", 0)
+            if quads[i] is not None:
+                bboxes[i] = quads[i]
+            pos = block.get("position", {})
+            positions[i] = (pos.get("x_min", 0), pos.get("y_min", 0), pos.get("x_max", 0), pos.get("y_max", 0),
+                            pos.get("width", 0), pos.get("height", 0))
+            extra = {k: v for k, v in block.items() if k not in _BLOCK_KEYS}
+            if quads[i] is None and "bbox" in block:
+                # Missing or irregular boxes are kept as they are
+                extra["bbox"] = block["bbox"]
+            if extra:
+                extras[str(i)] = extra
+
+        segments = {
+            "texts": _dumps(texts, codec),
+            "confidence": confidences.tobytes(),
+            "bbox": bboxes.tobytes(),
+            "position": positions.tobytes(),
+            "extras": _dumps(extras, codec)
+        }
+        if float_boxes.any():
+            segments["bbox_float"] = float_boxes.tobytes()
+        return segments
+
+
+def _strip_blocks(obj, table: _BlockTable):
+    """Replace text_blocks/rows lists with index references into the table"""
+    if isinstance(obj, dict):
+        out = {}
+        for key, value in obj.items():
+            if key == "text_blocks" and _is_block_list(value):
+                out[key] = {"$blocks": [table.ref(b) for b in value]}
+            elif key == "rows" and isinstance(value, list) and value and all(_is_block_list(r) for r in value):
+                out[key] = {"$rows": [[table.ref(b) for b in row] for row in value]}
+            else:
+                out[key] = _strip_blocks(value, table)
+        return out
+    if isinstance(obj, list):
+        return [_strip_blocks(item, table) for item in obj]
+    return obj
+
+
+def encode_result(result: Dict[str, Any]) -> bytes:
+    """Encode a result dict into the segmented cache format"""
+    codec = _CODEC_MSGPACK if HAS_MSGPACK else _CODEC_JSON
+    table = _BlockTable()
+    meta = _strip_blocks(result, table)
+
+    full_text = ""
+    if isinstance(result.get("combined"), dict):
+        full_text = result["combined"].get("full_text", "") or ""
+    elif isinstance(result.get("full_text"), str):
+        full_text = result["full_text"]
+
+    segments = {"meta": _dumps(meta, codec), "full_text": full_text.encode("utf-8")}
+    segments.update(table.pack(codec))
+
+    layout = {}
+    offset = 0
+    for name, data in segments.items():
+        layout[name] = [offset, len(data)]
+        offset += len(data)
+
+    bbox_dtype = "<f8" if "bbox_float" in segments else "<i4"
+    header = _dumps({"segments": layout, "blocks": len(table.blocks), "bbox_dtype": bbox_dtype}, codec)
+    return b"".join([_PREFIX.pack(MAGIC, FORMAT_VERSION, codec, len(header)), header, *segments.values()])
+
+
+class LazyResult:
+    """Read-only view over an encoded result that decodes segments on demand"""
+
+    def __init__(self, data: bytes):
+        magic, version, codec, header_len = _PREFIX.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not an encoded OCR result")
+        self._data = memoryview(data)
+        self._codec = codec
+        self._base = _PREFIX.size + header_len
+        header = _loads(bytes(self._data[_PREFIX.size:self._base]), codec)
+        self._segments = header["segments"]
+        self.block_count = header["blocks"]
+        self._bbox_dtype = header["bbox_dtype"]
+        self._blocks: Optional[List[Dict]] = None
+
+    def _segment(self, name: str) -> memoryview:
+        offset, length = self._segments[name]
+        start = self._base + offset
+        return self._data[start:start + length]
+
+    @property
+    def full_text(self) -> str:
+        """Combined text, without decoding metadata or text blocks"""
+        return str(self._segment("full_text"), "utf-8")
+
+    @property
+    def meta(self) -> Dict[str, Any]:
+        """Result dict with text blocks still as index references"""
+        return _loads(bytes(self._segment("meta")), self._codec)
+
+    def blocks(self) -> List[Dict]:
+        """Decode every text block (cached after the first call)"""
+        if self._blocks is None:
+            count = self.block_count
+            texts = _loads(bytes(self._segment("texts")), self._codec)
+            extras = _loads(bytes(self._segment("extras")), self._codec)
+            confidences = np.frombuffer(self._segment("confidence"), dtype="<f4", count=count)
+            bboxes = np.frombuffer(self._segment("bbox"), dtype=self._bbox_dtype, count=count * 8).reshape(count, 4, 2)
+            positions = np.frombuffer(self._segment("position"), dtype="<i4", count=count * 6).reshape(count, 6)
+            if "bbox_float" in self._segments:
+                float_boxes = np.frombuffer(self._segment("bbox_float"), dtype=np.uint8, count=count)
+                # Integer boxes stored in the float64 column come back as ints
+                int_boxes = bboxes.astype(np.int64).tolist()
+                bbox_lists = [bboxes[i].tolist() if float_boxes[i] else int_boxes[i] for i in range(count)]
+            else:
+                bbox_lists = bboxes.tolist()
+
+            blocks = []
+            for i in range(count):
+                x_min, y_min, x_max, y_max, width, height = positions[i].tolist()
+                block = {
+                    "text": texts[i],
+                    "confidence": round(float(confidences[i]), 3),
+                    "bbox": bbox_lists[i],
+                    "position": {
+                        "x_min": x_min,
+                        "x_max": x_max,
+                        "y_min": y_min,
+                        "y_max": y_max,
+                        "width": width,
+                        "height": height
+                    }
+                }
+                block.update(extras.get(str(i), {}))
+                blocks.append(block)
+            self._blocks = blocks
+        return self._blocks
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Fully decode into the original result structure"""
+        blocks = self.blocks() if self.block_count else []
+
+        def restore(obj):
+            if isinstance(obj, dict):
+                if len(obj) == 1 and "$blocks" in obj:
+                    return [blocks[i] for i in obj["$blocks"]]
+                if len(obj) == 1 and "$rows" in obj:
+                    return [[blocks[i] for i in row] for row in obj["$rows"]]
+                return {key: restore(value) for key, value in obj.items()}
+            if isinstance(obj, list):
+                return [restore(item) for item in obj]
+            return obj
+
+        return restore(self.meta)
+
+
+def decode_result(data: bytes) -> Dict[str, Any]:
+    """Fully decode an encoded result"""
+    return LazyResult(data).to_dict()
+
+
+def is_encoded_result(data: bytes) -> bool:
+    return data[:4] == MAGIC
@@ -1,14 +1,9 @@
-import easyocr
 import numpy as np
-from PIL import Image, ImageEnhance
+from PIL import Image
 import sys
 
-# Enable HEIF support for iPhone images
-try:
-    from pillow_heif import register_heif_opener
-    register_heif_opener()
-except ImportError:
-    print("Warning: pillow-heif not available. HEIF images may not work.", file=sys.stderr)
+# easyocr (and torch with it) is imported when the reader is first needed,
+# so cache hits and text-layer PDFs never load it
 
 # Pillow compatibility fix
 try:
@@ -18,16 +13,30 @@ try:
 except ImportError:
     pass
 
-import cv2
-import PyPDF2
-from pdf2image import convert_from_path
 import os
-import hashlib
 import pickle
+import hashlib
 import json
-from typing import Dict, List, Any, Optional
+import threading
+from typing import Dict, List, Any, Optional, Iterable, Iterator, AsyncIterator
 from datetime import datetime
 import asyncio
+import time
+from functools import partial
+from importlib import metadata
+
+from page_pipeline import PagePipeline, page_nbytes
+from batch_engine import BatchEngine
+from ocr_cache import CacheStore, make_cache_key, CACHE_FORMAT_VERSION, DEFAULT_MAX_BYTES
+from result_codec import encode_result, decode_result, LazyResult
+from layout import build_page_structure
+from tiling import tile_grid, merge_tiles
+from image_loader import load_image, LOADER_VERSION
+from field_extractor import extract_fields, extract_fields_batch
+from ocr_engines import ENGINES, CASCADE_THRESHOLD, TesseractEngine, EasyOCREngine, CascadeEngine
+from preprocess import preprocess_image, PREPROCESS_VERSION, PROFILES, DEFAULT_PROFILE
+from instrumentation import StageRecorder, METRICS, recording, current, measure, record, timed_iter, document_class
+from profiling import DocumentProfiler, profiled, attach_profile
 
 # Import enhanced PDF processor
 try:
@@ -37,172 +46,554 @@ except ImportError:
     HAS_ENHANCED_PDF = False
     print("Warning: Enhanced PDF processor not available.", file=sys.stderr)
 
+IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.heic', '.heif']
+
+# Text detections below this confidence are dropped
+MIN_CONFIDENCE = 0.5
+
+# Decoded bytes of rendered pages allowed in flight in the page pipeline
+PAGE_MEMORY_BUDGET = 512 * 1024 * 1024
+
+# Pages rasterized per poppler call in the basic PDF path
+PDF_RENDER_CHUNK = 4
+
+# Pages are padded up to a multiple of this size so similar pages share a batch
+BATCH_SIZE_STEP = 128
+
+# Overlap between neighbouring tiles in tiled mode; must exceed the tallest
+# expected text line so every line fits whole inside at least one tile
+TILE_OVERLAP = 256
+
+# Upper bound on the page side kept for tiled OCR (bounds memory on huge scans)
+TILED_MAX_SIDE = 12000
+
 class SimpleOCR:
-    def __init__(self, cache_dir: str = "./ocr_cache"):
-        """Initialize simple OCR processor"""
+    def __init__(self, cache_dir: str = "./ocr_cache", page_workers: Optional[int] = None,
+                 batch_size: int = 4, recognizer_batch_size: int = 16,
+                 cache_max_bytes: int = DEFAULT_MAX_BYTES, cache_max_age: Optional[float] = None,
+                 max_pdf_pages: Optional[int] = None, page_memory_budget: Optional[int] = PAGE_MEMORY_BUDGET,
+                 preprocess_profile: str = DEFAULT_PROFILE, tile_size: Optional[int] = None,
+                 tile_overlap: int = TILE_OVERLAP, engine: str = "easyocr",
+                 cascade_threshold: float = CASCADE_THRESHOLD, gpu: bool = True,
+                 instrument: bool = False, profiler: Optional[DocumentProfiler] = None):
+        """Initialize simple OCR processor
+        
+        page_workers: preprocessing processes for multi-page documents
+        (defaults to the CPU count, 1 disables the page pipeline)
+        batch_size: pages per detector/recognizer call (1 disables batching)
+        recognizer_batch_size: text crops per recognizer forward pass
+        cache_max_bytes / cache_max_age: cache size budget and TTL in seconds
+        max_pdf_pages: optional cap on pages read per PDF (None = every page)
+        page_memory_budget: bytes of rendered pages allowed in flight at once
+        preprocess_profile: "fast", "balanced" (denoise/CLAHE only when a page
+        needs it) or "quality" (always)
+        tile_size: enable tiled OCR: pages larger than this are kept at full
+        resolution and read as overlapping tile_size tiles instead of being
+        downscaled (None = downscale to the profile's max side)
+        tile_overlap: pixels shared by neighbouring tiles
+        engine: "easyocr", "tesseract" or "cascade" (Tesseract first, EasyOCR
+        only for lines/pages below cascade_threshold confidence)
+        gpu: let EasyOCR use CUDA/MPS when available (False forces CPU)
+        instrument: attach per-stage wall/CPU time and bytes to each result
+        ("instrumentation") and aggregate them into instrumentation.METRICS
+        profiler: profile 1 in N documents (cProfile, collapsed stacks,
+        tracemalloc); sampled results list the files under "profiling"
+        """
+        if preprocess_profile not in PROFILES:
+            raise ValueError(f"Unknown preprocessing profile: {preprocess_profile}")
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown OCR engine: {engine}")
+        self.engine = engine
+        self.instrument = instrument
+        self.metrics = METRICS
+        self.profiler = profiler
+        self.preprocess_profile = preprocess_profile
         self.cache_dir = cache_dir
+        self.batch_size = max(1, batch_size)
+        self.recognizer_batch_size = max(1, recognizer_batch_size)
+        self.max_pdf_pages = max_pdf_pages
+        if tile_size is not None and tile_size <= 2 * tile_overlap:
+            raise ValueError("tile_size must be more than twice tile_overlap")
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        # Image files are decoded at no more than this side (preprocessing does the exact resize)
+        self.decode_max_side = TILED_MAX_SIDE if tile_size else PROFILES[preprocess_profile]["max_side"]
         os.makedirs(cache_dir, exist_ok=True)
         
-        # Initialize OCR engine
-        print("Initializing OCR engine...", file=sys.stderr)
-        self.reader = easyocr.Reader(['en'], gpu=True)  # GPU acceleration enabled
-        print("OCR engine ready!", file=sys.stderr)
+        # The EasyOCR reader is built on first use (see the reader property)
+        self.gpu = gpu
+        self._reader = None
+        self._reader_init_lock = threading.Lock()
+        
+        # Batch workers share one reader; decode/render/preprocess run
+        # concurrently but model calls are serialized
+        self._reader_lock = threading.Lock()
+        
+        # Tesseract-based engines; None means EasyOCR with batching and tiling
+        tesseract = TesseractEngine() if engine != "easyocr" else None
+        self.router = tesseract
+        if engine == "cascade":
+            self.router = CascadeEngine(
+                tesseract,
+                EasyOCREngine(lambda: self.reader, self._reader_lock, self.recognizer_batch_size),
+                threshold=cascade_threshold
+            )
+        
+        # Render -> preprocess -> recognize pipeline for multi-page documents
+        self.page_pipeline = PagePipeline(
+            preprocess_fn=partial(preprocess_image, profile=preprocess_profile,
+                                  max_side=TILED_MAX_SIDE if tile_size else None),
+            recognize_fn=self._recognize_page,
+            recognize_batch_fn=self._recognize_batch,
+            batch_size=self.batch_size,
+            workers=page_workers,
+            memory_budget=page_memory_budget
+        )
+        
+        # One bounded cache file shared with the PDF processor; keys are
+        # content digests (with a stat fast path) plus engine settings
+        self.cache_store = CacheStore(
+            os.path.join(cache_dir, "cache.db"),
+            max_bytes=cache_max_bytes,
+            max_age_seconds=cache_max_age
+        )
+        # Settings that change how a single page is read; the PDF processor
+        # keys its per-page cache on these alone
+        self.page_cache_settings = {
+            "format": CACHE_FORMAT_VERSION,
+            "engine": engine,
+            "engine_version": self._package_version("easyocr"),
+            "tesseract_version": tesseract.version if tesseract else None,
+            "cascade_threshold": cascade_threshold if engine == "cascade" else None,
+            "languages": ['en'],
+            "preprocess": f"{PREPROCESS_VERSION}:{preprocess_profile}",
+            "min_confidence": MIN_CONFIDENCE,
+            "tiling": [tile_size, tile_overlap] if tile_size else None
+        }
+        # Whole-document results also depend on image decoding and on which
+        # pages are read, so e.g. a new page limit only recomputes new pages
+        self.cache_settings = {
+            **self.page_cache_settings,
+            "decode": LOADER_VERSION,
+            "enhanced_pdf": HAS_ENHANCED_PDF,
+            "max_pdf_pages": max_pdf_pages
+        }
         
         # Initialize enhanced PDF processor if available
         if HAS_ENHANCED_PDF:
-            self.pdf_processor = EnhancedPDFProcessor(cache_dir=os.path.join(cache_dir, "pdf"))
+            self.pdf_processor = EnhancedPDFProcessor(
+                cache_dir=cache_dir, cache_store=self.cache_store, max_pages=max_pdf_pages,
+                profiler=profiler
+            )
             print("📚 Enhanced PDF processor available!", file=sys.stderr)
         else:
             self.pdf_processor = None
     
+    @property
+    def reader(self):
+        """The EasyOCR reader, built (importing easyocr and torch) on first use"""
+        if self._reader is None:
+            with self._reader_init_lock:
+                if self._reader is None:
+                    import easyocr
+                    print("Initializing OCR engine...", file=sys.stderr)
+                    self._reader = easyocr.Reader(['en'], gpu=self.gpu)  # GPU acceleration by default
+                    print("OCR engine ready!", file=sys.stderr)
+        return self._reader
+    
+    @staticmethod
+    def _package_version(name: str) -> str:
+        """Installed package version, read from metadata without importing it"""
+        try:
+            return metadata.version(name)
+        except metadata.PackageNotFoundError:
+            return "unknown"
+    
     def _get_cache_key(self, file_path: str) -> str:
-        """Generate cache key based on file content and modification time"""
-        stat = os.stat(file_path)
-        with open(file_path, 'rb') as f:
-            content_hash = hashlib.md5(f.read()).hexdigest()
-        return f"{content_hash}_{int(stat.st_mtime)}"
+        """Generate cache key from file content and OCR settings
+        
+        Unchanged files (same size/mtime/inode) skip hashing entirely, and a
+        touched-but-identical file still maps to the same key.
+        """
+        return make_cache_key(self.cache_store.file_digest(file_path), self.cache_settings)
     
-    def _get_cached_result(self, file_path: str) -> Optional[Dict]:
+    def _get_cached_result(self, cache_key: str) -> Optional[Dict]:
         """Get cached OCR result if exists"""
-        cache_key = self._get_cache_key(file_path)
-        cache_file = os.path.join(self.cache_dir, f"{cache_key}.pkl")
-        
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, 'rb') as f:
-                    return pickle.load(f)
-            except:
-                pass
+        try:
+            data = self.cache_store.get(cache_key)
+            if data is not None:
+                return decode_result(data)
+        except Exception as e:
+            print(f"⚠️  Failed to read cached result: {e}", file=sys.stderr)
         return None
     
-    def _cache_result(self, file_path: str, result: Dict):
+    def _cache_result(self, cache_key: str, result: Dict):
         """Cache OCR result"""
-        cache_key = self._get_cache_key(file_path)
-        cache_file = os.path.join(self.cache_dir, f"{cache_key}.pkl")
-        
         try:
-            with open(cache_file, 'wb') as f:
-                pickle.dump(result, f)
+            self.cache_store.put(cache_key, encode_result(result))
         except Exception as e:
-            print(f"Failed to cache result: {e}")
+            print(f"Failed to cache result: {e}", file=sys.stderr)
     
-    def _convert_pdf_to_images(self, pdf_path: str) -> List[Image.Image]:
-        """Convert PDF pages to images"""
+    def get_cached_text(self, file_path: str) -> Optional[str]:
+        """Return the cached full text for a file without decoding its text blocks"""
         try:
-            images = convert_from_path(pdf_path, dpi=200, first_page=1, last_page=10)  # Limit to first 10 pages
-            return images
+            data = self.cache_store.get(self._get_cache_key(file_path))
+            return LazyResult(data).full_text if data is not None else None
         except Exception as e:
-            print(f"Error converting PDF: {e}")
-            return []
+            print(f"⚠️  Failed to read cached text: {e}", file=sys.stderr)
+            return None
     
-    def _preprocess_image(self, image: Image.Image) -> Image.Image:
-        """Optimize image for OCR"""
-        # Convert to RGB if needed
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+    def migrate_legacy_cache(self, legacy_dir: Optional[str] = None, remove: bool = True) -> Dict[str, int]:
+        """Move old <md5>_<mtime>.pkl cache files into the cache store
         
-        # Resize if too large (for speed)
-        if max(image.size) > 2500:
-            image.thumbnail((2500, 2500), Image.Resampling.LANCZOS)
+        Each entry is only carried over if the file it was made from still
+        exists and its MD5 matches the one in the file name; anything else is
+        stale and just removed. Only run this on cache directories this
+        tool wrote, since loading a pickle can execute arbitrary code.
+        """
+        legacy_dir = legacy_dir or self.cache_dir
+        stats = {"migrated": 0, "stale": 0, "failed": 0}
         
-        # Convert to numpy for OpenCV processing
-        img_np = np.array(image)
+        for entry in os.scandir(legacy_dir):
+            if not entry.is_file() or not entry.name.endswith('.pkl'):
+                continue
+            content_hash = entry.name[:-4].split('_')[0]
+            
+            try:
+                with open(entry.path, 'rb') as f:
+                    result = pickle.load(f)
+                
+                source = result.get("file_path") if isinstance(result, dict) else None
+                if source and os.path.isfile(source) and self._md5(source) == content_hash:
+                    self._cache_result(self._get_cache_key(source), result)
+                    stats["migrated"] += 1
+                else:
+                    stats["stale"] += 1
+            except Exception as e:
+                print(f"⚠️  Could not migrate {entry.name}: {e}", file=sys.stderr)
+                stats["failed"] += 1
+                continue
+            
+            if remove:
+                os.remove(entry.path)
         
-        # Simple enhancement for better OCR
-        # Convert to grayscale
-        gray = cv2.cvtColor(img_np, cv2.COLOR_RGB2GRAY)
+        return stats
+    
+    @staticmethod
+    def _md5(file_path: str) -> str:
+        hasher = hashlib.md5()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+    
+    def _iter_pdf_pages(self, pdf_path: str, dpi: int = 200) -> Iterator[Image.Image]:
+        """Yield PDF pages as images, rendering a few pages at a time"""
+        if self.pdf_processor is not None:
+            yield from self.pdf_processor.iter_pdf_pages(pdf_path, dpi=dpi, max_pages=self.max_pdf_pages)
+            return
+        
+        from pdf2image import convert_from_path
+        
+        first_page = 1
+        while self.max_pdf_pages is None or first_page <= self.max_pdf_pages:
+            last_page = first_page + PDF_RENDER_CHUNK - 1
+            if self.max_pdf_pages is not None:
+                last_page = min(last_page, self.max_pdf_pages)
+            try:
+                images = convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page)
+            except Exception as e:
+                if first_page == 1:
+                    print(f"Error converting PDF: {e}", file=sys.stderr)
+                return
+            if not images:
+                return
+            yield from images
+            del images
+            first_page = last_page + 1
+    
+    def _preprocess_image(self, image: Image.Image) -> Image.Image:
+        """Optimize image for OCR"""
+        return preprocess_image(image, self.preprocess_profile,
+                                max_side=TILED_MAX_SIDE if self.tile_size else None)
+    
+    @staticmethod
+    def _attach_timings(structure: Dict, image: Any, recognize_ms: float,
+                        detect_ms: Optional[float] = None) -> Dict:
+        """Record the page's preprocessing report and detection/recognition time
         
-        # Denoise
-        denoised = cv2.fastNlMeansDenoising(gray)
+        The preprocessing stage ran in the page pipeline (possibly in another
+        process), so it is added to the active stage recorder from its report.
+        """
+        report = dict(getattr(image, "info", {}).get("preprocess") or {})
+        timings = report.get("timings_ms", {})
+        record("preprocess", sum(timings.values()), report.get("cpu_ms", 0.0), page_nbytes(image))
+        if detect_ms is not None:
+            timings = {**timings, "detect": round(detect_ms, 2)}
+        report["timings_ms"] = {**timings, "recognize": round(recognize_ms, 2)}
+        structure["preprocessing"] = report
+        return structure
+    
+    def ocr_pages(self, images: Iterable[Image.Image]) -> List[Dict]:
+        """Preprocess and OCR a sequence of page images, preserving page order
         
-        # Enhance contrast
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(denoised)
+        Pages are consumed lazily, so a generator that renders pages on demand
+        overlaps rendering with preprocessing and recognition.
+        """
+        return self.page_pipeline.run(images)
+    
+    def _recognize_page(self, image: Image.Image) -> Dict:
+        """Recognize one preprocessed page with the configured engine"""
+        if self.router is None:
+            return self._extract_text_with_structure(image)
         
-        # Convert back to PIL Image
-        return Image.fromarray(enhanced)
+        image_np = np.asarray(image)
+        start = time.perf_counter()
+        # Tesseract finds and reads lines in one call
+        with measure("recognition", image_np.nbytes):
+            detections, route = self.router.recognize_with_route(image_np)
+        recognize_ms = (time.perf_counter() - start) * 1000
+        structure = self._attach_timings(self._build_page_structure(detections), image, recognize_ms)
+        structure["engine"] = route
+        return structure
+    
+    def _recognize_batch(self, images: List[Image.Image]) -> List[Dict]:
+        if self.router is None:
+            return self._extract_text_batch(images)
+        return [self._recognize_page(image) for image in images]
     
     def _extract_text_with_structure(self, image: Image.Image) -> Dict:
         """Extract text with positional and structural information"""
-        image_np = np.array(image)
-        ocr_results = self.reader.readtext(image_np)
+        image_np = np.asarray(image)
+        if self._needs_tiling(image_np):
+            return self._extract_text_tiled(image, image_np)
         
-        extracted_data = []
-        all_text = []
+        # readtext() split into its detect and recognize halves, so the two
+        # stages are timed separately
+        with self._reader_lock:
+            reader = self.reader
+            start = time.perf_counter()
+            with measure("detection", image_np.nbytes):
+                horizontal_list, free_list = reader.detect(image_np)
+            detect_ms = (time.perf_counter() - start) * 1000
+            
+            start = time.perf_counter()
+            with measure("recognition", image_np.nbytes):
+                ocr_results = reader.recognize(image_np, horizontal_list=horizontal_list[0], free_list=free_list[0],
+                                               batch_size=self.recognizer_batch_size)
+            recognize_ms = (time.perf_counter() - start) * 1000
+        return self._attach_timings(self._build_page_structure(ocr_results), image, recognize_ms, detect_ms)
+    
+    def _needs_tiling(self, array: np.ndarray) -> bool:
+        return self.tile_size is not None and max(array.shape[:2]) > self.tile_size
+    
+    def _extract_text_tiled(self, image: Image.Image, image_np: np.ndarray) -> Dict:
+        """Read a large page as overlapping tiles at full resolution
         
-        for (bbox, text, confidence) in ocr_results:
-            if confidence > 0.5:  # Filter low confidence
-                # Calculate position metrics
-                x_coords = [point[0] for point in bbox]
-                y_coords = [point[1] for point in bbox]
-                
-                text_item = {
-                    "text": text.strip(),
-                    "confidence": round(confidence, 3),
-                    "bbox": bbox,
-                    "position": {
-                        "x_min": int(min(x_coords)),
-                        "x_max": int(max(x_coords)),
-                        "y_min": int(min(y_coords)),
-                        "y_max": int(max(y_coords)),
-                        "width": int(max(x_coords) - min(x_coords)),
-                        "height": int(max(y_coords) - min(y_coords))
-                    }
-                }
-                
-                extracted_data.append(text_item)
-                all_text.append(text.strip())
+        Tiles all have the same shape, so they go through the detector and
+        recognizer together in micro-batches of batch_size tiles; detections
+        are then shifted back to page coordinates and deduplicated along
+        the seams before the usual page structure is built.
         
-        # Sort by reading order (top to bottom, left to right)
-        extracted_data.sort(key=lambda x: (x["position"]["y_min"], x["position"]["x_min"]))
+        Micro-batches run one after another: every tile uses the shared
+        EasyOCR reader, which is not thread-safe, and each batched call
+        already spreads over torch's threads (or the GPU). The lock is
+        released between micro-batches so other pages can interleave.
+        """
+        height, width = image_np.shape[:2]
+        size, overlap = self.tile_size, self.tile_overlap
+        origins = tile_grid(width, height, size, overlap)
         
-        # Create simple structure analysis
-        rows = self._group_into_rows(extracted_data)
+        start = time.perf_counter()
+        tile_results = []
+        for first in range(0, len(origins), self.batch_size):
+            tiles = [
+                np.ascontiguousarray(image_np[top:top + size, left:left + size])
+                for left, top in origins[first:first + self.batch_size]
+            ]
+            with self._reader_lock, measure("recognition", sum(tile.nbytes for tile in tiles)):
+                if len(tiles) == 1:
+                    tile_results.append(self.reader.readtext(tiles[0], batch_size=self.recognizer_batch_size))
+                else:
+                    tile_results.extend(self.reader.readtext_batched(tiles, batch_size=self.recognizer_batch_size))
+        with measure("postprocess"):
+            merged = merge_tiles(tile_results, origins, size, width, height)
+        recognize_ms = (time.perf_counter() - start) * 1000
         
-        return {
-            "text_blocks": extracted_data,
-            "full_text": " ".join(all_text),
-            "rows": rows,
-            "total_blocks": len(extracted_data),
-            "avg_confidence": round(sum(item["confidence"] for item in extracted_data) / len(extracted_data), 3) if extracted_data else 0
-        }
+        structure = self._attach_timings(self._build_page_structure(merged), image, recognize_ms)
+        structure["tiles"] = len(origins)
+        return structure
     
-    def _group_into_rows(self, extracted_data: List[Dict]) -> List[List[Dict]]:
-        """Group text blocks into rows based on Y positions"""
-        if not extracted_data:
-            return []
+    def _extract_text_batch(self, images: List[Image.Image]) -> List[Dict]:
+        """Extract text from many page images with batched detection/recognition
         
-        rows = []
-        current_row = [extracted_data[0]]
-        current_y = extracted_data[0]["position"]["y_min"]
+        Pages are grouped by padded size, padded on the right/bottom (so box
+        coordinates stay valid) and run through the reader in micro-batches
+        of batch_size pages. Results are returned in input order.
+        """
+        arrays = [np.asarray(image) for image in images]
+        results: List[Optional[Dict]] = [None] * len(arrays)
         
-        for item in extracted_data[1:]:
-            item_y = item["position"]["y_min"]
-            
-            # If Y position is close (within 30 pixels), it's same row
-            if abs(item_y - current_y) <= 30:
-                current_row.append(item)
-            else:
-                # Sort current row by X position (left to right)
-                current_row.sort(key=lambda x: x["position"]["x_min"])
-                rows.append(current_row)
+        groups: Dict[tuple, List[int]] = {}
+        for index, array in enumerate(arrays):
+            # Oversized pages are tiled on their own
+            if self._needs_tiling(array):
+                results[index] = self._extract_text_tiled(images[index], array)
+                continue
+            height, width = array.shape[:2]
+            key = (
+                -(-height // BATCH_SIZE_STEP) * BATCH_SIZE_STEP,
+                -(-width // BATCH_SIZE_STEP) * BATCH_SIZE_STEP,
+                array.ndim
+            )
+            groups.setdefault(key, []).append(index)
+        
+        for (canvas_height, canvas_width, _), indices in groups.items():
+            for start in range(0, len(indices), self.batch_size):
+                chunk = indices[start:start + self.batch_size]
                 
-                # Start new row
-                current_row = [item]
-                current_y = item_y
+                if len(chunk) == 1:
+                    results[chunk[0]] = self._extract_text_with_structure(images[chunk[0]])
+                    continue
+                
+                padded = [self._pad_to_canvas(arrays[i], canvas_height, canvas_width) for i in chunk]
+                start = time.perf_counter()
+                with self._reader_lock, measure("recognition", sum(array.nbytes for array in padded)):
+                    batch_results = self.reader.readtext_batched(padded, batch_size=self.recognizer_batch_size)
+                # Batch time is split evenly across the pages in it
+                recognize_ms = (time.perf_counter() - start) * 1000 / len(chunk)
+                
+                for i, ocr_results in zip(chunk, batch_results):
+                    results[i] = self._attach_timings(self._build_page_structure(ocr_results), images[i], recognize_ms)
+        
+        return results
+    
+    @staticmethod
+    def _pad_to_canvas(array: np.ndarray, height: int, width: int) -> np.ndarray:
+        """Pad an image with white on the right/bottom up to the canvas size"""
+        pad = [(0, height - array.shape[0]), (0, width - array.shape[1])]
+        pad += [(0, 0)] * (array.ndim - 2)
+        return np.pad(array, pad, mode='constant', constant_values=255)
+    
+    def _build_page_structure(self, ocr_results: List) -> Dict:
+        """Turn raw reader output into text blocks, rows and page statistics"""
+        with measure("postprocess") as sized:
+            if not ocr_results:
+                return build_page_structure([], [], [])
+            
+            confidences = np.fromiter((r[2] for r in ocr_results), dtype=np.float64, count=len(ocr_results))
+            keep = np.flatnonzero(confidences > MIN_CONFIDENCE).tolist()  # Filter low confidence
+            structure = build_page_structure(
+                [ocr_results[i][0] for i in keep],
+                [ocr_results[i][1].strip() for i in keep],
+                confidences[keep],
+                bboxes=[ocr_results[i][0] for i in keep]
+            )
+            sized["bytes"] = len(structure["full_text"].encode("utf-8"))
+            return structure
+    
+    def _load_image(self, file_path: str) -> Image.Image:
+        """Open an image file upright, decoded near the size OCR will use
+        
+        Pages are OCR'd in grayscale, so JPEGs only decode their luma.
+        HEIF files with the wrong extension are handled by the loader.
+        """
+        with measure("decode") as sized:
+            image = load_image(file_path, max_side=self.decode_max_side, grayscale=True)
+            # Decode now rather than wherever the pixels are first touched
+            image.load()
+            sized["bytes"] = page_nbytes(image)
+        return image
+    
+    def _build_document_result(self, file_path: str, pages_data: List[Dict],
+                               structured: bool = True) -> Dict[str, Any]:
+        """Combine OCR'd pages into the standard document result
+        
+        structured=False leaves out structured_data, for callers that
+        extract fields for many documents at once.
+        """
+        all_text = []
+        all_text_blocks = []
+        all_rows = []
         
-        # Add the last row
-        if current_row:
-            current_row.sort(key=lambda x: x["position"]["x_min"])
-            rows.append(current_row)
+        for i, page in enumerate(pages_data):
+            page["page_number"] = i + 1
+            all_text.append(page["full_text"])
+            all_text_blocks.extend(page["text_blocks"])
+            all_rows.extend(page["rows"])
         
-        return rows
+        # Per-stage totals across pages, to see where preprocessing time goes
+        timings: Dict[str, float] = {}
+        for page in pages_data:
+            for stage, ms in page.get("preprocessing", {}).get("timings_ms", {}).items():
+                timings[stage] = round(timings.get(stage, 0) + ms, 2)
+        
+        # Which engine produced each page (cascade: escalations to EasyOCR)
+        engines: Dict[str, int] = {}
+        for page in pages_data:
+            name = page.get("engine", {}).get("engine", self.engine)
+            engines[name] = engines.get(name, 0) + 1
+        
+        result = {
+            "success": True,
+            "file_path": file_path,
+            "file_name": os.path.basename(file_path),
+            "file_type": os.path.splitext(file_path)[1].lower(),
+            "total_pages": len(pages_data),
+            "pages": pages_data,
+            "combined": {
+                "full_text": " ".join(all_text),
+                "text_blocks": all_text_blocks,
+                "rows": all_rows,
+                "total_text_blocks": len(all_text_blocks)
+            },
+            "engines": engines,
+            "preprocessing": {
+                "profile": self.preprocess_profile,
+                "pages_denoised": sum(1 for p in pages_data if p.get("preprocessing", {}).get("denoised")),
+                "pages_clahe": sum(1 for p in pages_data if p.get("preprocessing", {}).get("clahe")),
+                "timings_ms": timings
+            },
+            "processing_time": datetime.now().isoformat()
+        }
+        if structured:
+            full_text = result["combined"]["full_text"]
+            with measure("extraction", len(full_text.encode("utf-8"))):
+                result["structured_data"] = extract_fields(full_text, all_rows)
+        return result
     
     async def extract_from_document(self, file_path: str) -> Dict[str, Any]:
         """Main method to extract text from any document"""
+        recorder = StageRecorder() if self.instrument else None
+        with profiled(self.profiler, file_path) as capture, recording(recorder):
+            result = await self._extract_document(file_path)
+        result = self._finish_instrumentation(file_path, result, recorder)
+        return attach_profile(result, capture)
+    
+    def _finish_instrumentation(self, file_path: str, result: Dict[str, Any],
+                                recorder: Optional[StageRecorder]) -> Dict[str, Any]:
+        """Attach a document's stage totals to its result and fold them into the metrics
+        
+        Called after caching, so cached results never carry stale stage data.
+        """
+        if recorder is None:
+            return result
+        stages = recorder.as_dict()
+        file_type = result.get("file_type") or os.path.splitext(file_path)[1].lower()
+        cls = document_class(file_type, result.get("processing_method"))
+        result["instrumentation"] = {"document_class": cls, "cache_hit": recorder.cache_hit, "stages": stages}
+        self.metrics.observe(cls, stages, success=result.get("success", False),
+                             pages=result.get("total_pages", 0), cache_hit=recorder.cache_hit)
+        return result
+    
+    async def _extract_document(self, file_path: str) -> Dict[str, Any]:
         try:
-            # Check cache first
-            cached_result = self._get_cached_result(file_path)
+            # Check cache first (the key is computed once per request)
+            with measure("cache_lookup", os.path.getsize(file_path)):
+                cache_key = self._get_cache_key(file_path)
+                cached_result = self._get_cached_result(cache_key)
+            if current() is not None:
+                current().cache_hit = cached_result is not None
             if cached_result:
                 print(f"✅ Using cached result for {os.path.basename(file_path)}", file=sys.stderr)
                 return cached_result
@@ -235,16 +626,20 @@ class SimpleOCR:
                                 "extraction_method": page["extraction_method"]
                             }
                             
-                            # If OCR was used, include OCR details
-                            if page["extraction_method"] == "ocr" and "ocr_details" in page:
-                                ocr_details = page["ocr_details"]
-                                page_data["text_blocks"] = ocr_details.get("text_blocks", [])
-                                page_data["rows"] = ocr_details.get("rows", [])
-                                page_data["total_blocks"] = ocr_details.get("total_text_blocks", 0)
+                            # OCR'd pages carry their OCR details, text-layer
+                            # pages a layout built from the PDF's word geometry
+                            details = page.get("ocr_details") or page.get("layout")
+                            if details:
+                                page_data["text_blocks"] = details.get("text_blocks", [])
+                                page_data["rows"] = details.get("rows", [])
+                                page_data["total_blocks"] = details.get("total_blocks", 0)
                             
                             pages_data.append(page_data)
                             all_text.append(page["text"])
                         
+                        all_text_blocks = [block for p in pages_data for block in p["text_blocks"]]
+                        all_rows = [row for p in pages_data for row in p["rows"]]
+                        
                         # Create final result
                         result = {
                             "success": True,
@@ -255,9 +650,9 @@ class SimpleOCR:
                             "pages": pages_data,
                             "combined": {
                                 "full_text": " ".join(all_text),
-                                "text_blocks": [],
-                                "rows": [],
-                                "total_text_blocks": sum(p.get("total_blocks", 0) for p in pages_data)
+                                "text_blocks": all_text_blocks,
+                                "rows": all_rows,
+                                "total_text_blocks": len(all_text_blocks)
                             },
                             "processing_time": datetime.now().isoformat(),
                             "pdf_analysis": pdf_result.get("pdf_analysis", {}),
@@ -266,35 +661,25 @@ class SimpleOCR:
                         }
                         
                         # Cache and return the result
-                        self._cache_result(file_path, result)
+                        self._cache_result(cache_key, result)
                         print(f"✅ Processed PDF with {result['processing_method']} method", file=sys.stderr)
                         return result
                     else:
                         # Fallback to basic PDF processing
                         print("⚠️  Enhanced PDF processing failed, using basic method", file=sys.stderr)
-                        images = self._convert_pdf_to_images(file_path)
+                        images = timed_iter(self._iter_pdf_pages(file_path), "decode", page_nbytes)
                 else:
                     # Use basic PDF processing
-                    images = self._convert_pdf_to_images(file_path)
-            elif file_ext in ['.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.heic', '.heif']:
+                    images = timed_iter(self._iter_pdf_pages(file_path), "decode", page_nbytes)
+            elif file_ext in IMAGE_EXTENSIONS:
                 try:
-                    images = [Image.open(file_path)]
+                    images = [self._load_image(file_path)]
                 except Exception as e:
-                    # Try to detect if it's actually a HEIF file with wrong extension
-                    try:
-                        with open(file_path, 'rb') as f:
-                            header = f.read(12)
-                        if b'ftyp' in header and (b'heic' in header or b'mif1' in header):
-                            # It's a HEIF file, try to open it
-                            images = [Image.open(file_path)]
-                        else:
-                            raise e
-                    except Exception:
-                        return {
-                            "success": False,
-                            "error": f"Cannot open image file: {str(e)}",
-                            "file_path": file_path
-                        }
+                    return {
+                        "success": False,
+                        "error": f"Cannot open image file: {str(e)}",
+                        "file_path": file_path
+                    }
             else:
                 return {
                     "success": False,
@@ -302,58 +687,24 @@ class SimpleOCR:
                     "file_path": file_path
                 }
             
-            if not images:
+            # Process all pages/images; PDF pages are rendered lazily and
+            # released once recognized (preprocessing runs in parallel, order is preserved)
+            print(f"  📄 Processing pages...", file=sys.stderr)
+            pages_data = self.ocr_pages(images)
+            
+            if not pages_data:
                 return {
                     "success": False,
                     "error": "Could not load images from file",
                     "file_path": file_path
                 }
             
-            # Process all pages/images
-            pages_data = []
-            all_text = []
-            
-            for i, image in enumerate(images):
-                print(f"  📄 Processing page {i+1}/{len(images)}...", file=sys.stderr)
-                
-                # Preprocess image
-                processed_image = self._preprocess_image(image)
-                
-                # Extract text with structure
-                page_data = self._extract_text_with_structure(processed_image)
-                page_data["page_number"] = i + 1
-                
-                pages_data.append(page_data)
-                all_text.append(page_data["full_text"])
-            
-            # Combine results
-            all_text_blocks = []
-            all_rows = []
-            
-            for page in pages_data:
-                all_text_blocks.extend(page["text_blocks"])
-                all_rows.extend(page["rows"])
-            
-            result = {
-                "success": True,
-                "file_path": file_path,
-                "file_name": os.path.basename(file_path),
-                "file_type": file_ext,
-                "total_pages": len(images),
-                "pages": pages_data,
-                "combined": {
-                    "full_text": " ".join(all_text),
-                    "text_blocks": all_text_blocks,
-                    "rows": all_rows,
-                    "total_text_blocks": len(all_text_blocks)
-                },
-                "processing_time": datetime.now().isoformat()
-            }
+            result = self._build_document_result(file_path, pages_data)
             
             # Cache the result
-            self._cache_result(file_path, result)
+            self._cache_result(cache_key, result)
             
-            print(f"✅ Extracted {len(all_text_blocks)} text blocks from {len(images)} pages", file=sys.stderr)
+            print(f"✅ Extracted {result['combined']['total_text_blocks']} text blocks from {len(pages_data)} pages", file=sys.stderr)
             return result
             
         except Exception as e:
@@ -364,7 +715,143 @@ class SimpleOCR:
                 "file_path": file_path
             }
     
-    async def batch_process(self, directory_path: str, file_patterns: List[str] = None) -> Dict[str, Any]:
+    def _work_units(self, file_paths: Iterable[str], batched: bool) -> Iterator[List[str]]:
+        """Split files into work units: small groups of images, or one file each"""
+        images = []
+        for file_path in file_paths:
+            is_image = os.path.splitext(file_path)[1].lower() in IMAGE_EXTENSIONS
+            if batched and self.batch_size > 1 and is_image:
+                images.append(file_path)
+                if len(images) >= self.batch_size:
+                    yield images
+                    images = []
+            else:
+                yield [file_path]
+        if images:
+            yield images
+    
+    def _process_unit(self, file_paths: List[str]) -> List[Dict[str, Any]]:
+        """Process one work unit on a batch worker thread"""
+        if len(file_paths) > 1:
+            # A sampled batch is profiled as a whole; every file in it gets the same capture
+            with profiled(self.profiler, f"batch-{os.path.basename(file_paths[0])}") as capture:
+                results = self._extract_images_batched(file_paths)
+            results = [attach_profile(result, capture) for result in results]
+        else:
+            results = [None]
+        
+        # Single files, and anything the batched path could not handle
+        unit_results = []
+        for file_path, result in zip(file_paths, results):
+            if result is None:
+                result = asyncio.run(self.extract_from_document(file_path))
+            # Cache hits may come from an identical file stored under another path
+            result["file_path"] = file_path
+            unit_results.append(result)
+        return unit_results
+    
+    async def iter_files(self, file_paths: Iterable[str], max_workers: Optional[int] = None,
+                         timeout: Optional[float] = None, batched: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """Process files concurrently, yielding each result as soon as it is ready
+        
+        max_workers bounds the number of documents in flight, timeout is the
+        per-file limit in seconds. Images are recognized in small cross-file
+        batches when batched is set.
+        """
+        engine = BatchEngine(self._process_unit, max_workers=max_workers, timeout=timeout)
+        async for result in engine.stream(self._work_units(file_paths, batched)):
+            yield result
+    
+    async def process_files(self, file_paths: List[str], batched: bool = True,
+                            max_workers: Optional[int] = None, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Process a list of files concurrently and return results in input order"""
+        results: Dict[str, Dict[str, Any]] = {}
+        async for result in self.iter_files(file_paths, max_workers=max_workers, timeout=timeout, batched=batched):
+            results[result.get("file_path")] = result
+        return [results[file_path] for file_path in file_paths]
+    
+    def _extract_images_batched(self, file_paths: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """OCR single-page image files together so recognition runs in batches
+        
+        Returns one result per file; None marks files that should be retried
+        individually because the batch failed.
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(file_paths)
+        cache_keys: List[Optional[str]] = [None] * len(file_paths)
+        ocr_indices = []
+        
+        # Per-file stages (cache lookup, decode) go to each file's recorder;
+        # the shared batch stages are split evenly across the OCR'd files
+        recorders = [StageRecorder() if self.instrument else None for _ in file_paths]
+        batch = StageRecorder() if self.instrument else None
+        
+        for i, file_path in enumerate(file_paths):
+            with recording(recorders[i]):
+                try:
+                    with measure("cache_lookup", os.path.getsize(file_path)):
+                        cache_keys[i] = self._get_cache_key(file_path)
+                        cached_result = self._get_cached_result(cache_keys[i])
+                except OSError:
+                    continue  # reported when the file is opened below
+            if recorders[i] is not None:
+                recorders[i].cache_hit = cached_result is not None
+            if cached_result:
+                results[i] = cached_result
+        
+        def load_pages():
+            # Images are opened lazily so only the pipeline window is in memory
+            for i, file_path in enumerate(file_paths):
+                if results[i] is not None:
+                    continue
+                try:
+                    with recording(recorders[i]):
+                        image = self._load_image(file_path)
+                except Exception as e:
+                    results[i] = {
+                        "success": False,
+                        "error": f"Cannot open image file: {str(e)}",
+                        "file_path": file_path
+                    }
+                    continue
+                ocr_indices.append(i)
+                yield image
+        
+        try:
+            with recording(batch):
+                pages_data = self.ocr_pages(load_pages())
+        except Exception as e:
+            print(f"⚠️  Batched OCR failed ({e}), processing files individually", file=sys.stderr)
+            return [
+                self._finish_instrumentation(file_paths[i], r, recorders[i]) if r is not None and r.get("success") else None
+                for i, r in enumerate(results)
+            ]
+        
+        print(f"✅ Batch-recognized {len(pages_data)} images", file=sys.stderr)
+        with recording(batch):
+            built = [
+                self._build_document_result(file_paths[i], [page_data], structured=False)
+                for i, page_data in zip(ocr_indices, pages_data)
+            ]
+            # One field-extraction scan for the whole batch
+            texts = [result["combined"]["full_text"] for result in built]
+            with measure("extraction", sum(len(text.encode("utf-8")) for text in texts)):
+                fields = extract_fields_batch(texts, [result["combined"]["rows"] for result in built])
+        for i, result, structured_data in zip(ocr_indices, built, fields):
+            result["structured_data"] = structured_data
+            if cache_keys[i]:
+                self._cache_result(cache_keys[i], result)
+            results[i] = result
+            if batch is not None:
+                recorders[i].merge(batch, share=1 / len(built))
+        
+        return [
+            self._finish_instrumentation(file_paths[i], result, recorders[i]) if result is not None else None
+            for i, result in enumerate(results)
+        ]
+    
+    async def batch_process(self, directory_path: str, file_patterns: List[str] = None,
+                            batched: bool = True, max_workers: Optional[int] = None,
+                            timeout: Optional[float] = None) -> Dict[str, Any]:
         """Process multiple files in a directory"""
         if file_patterns is None:
             file_patterns = ['*.jpg', '*.jpeg', '*.png', '*.pdf']
@@ -378,10 +865,7 @@ class SimpleOCR:
         
         print(f"🚀 Processing {len(all_files)} files...", file=sys.stderr)
         
-        results = []
-        for file_path in all_files:
-            result = await self.extract_from_document(file_path)
-            results.append(result)
+        results = await self.process_files(all_files, batched=batched, max_workers=max_workers, timeout=timeout)
         
         successful = [r for r in results if r["success"]]
         failed = [r for r in results if not r["success"]]
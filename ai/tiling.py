@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tiled OCR helpers
+Splits very large pages into overlapping tiles and merges the per-tile
+detections back into page coordinates without duplicates along the seams
+"""
+
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Detections overlapping a larger one by more than this share of their own
+# area are treated as the same text seen from two tiles
+DUPLICATE_OVERLAP = 0.5
+
+
+def tile_starts(length: int, size: int, overlap: int) -> List[int]:
+    """Start offsets along one axis so tiles of `size` cover `length`"""
+    if length <= size:
+        return [0]
+    step = max(1, size - overlap)
+    starts = list(range(0, length - size, step))
+    starts.append(length - size)
+    return starts
+
+
+def tile_grid(width: int, height: int, size: int, overlap: int) -> List[Tuple[int, int]]:
+    """(left, top) origins of the tiles covering a page, row by row"""
+    return [
+        (left, top)
+        for top in tile_starts(height, size, overlap)
+        for left in tile_starts(width, size, overlap)
+    ]
+
+
+def _core_bounds(starts: Sequence[int], size: int, length: int) -> Dict[int, Tuple[float, float]]:
+    """The part of each tile that owns detections, keyed by tile start
+
+    Neighbouring tiles split their shared strip down the middle, so the
+    cores partition the axis even where the last step is shorter.
+    """
+    starts = sorted(set(starts))
+    seams = [(a + size + b) / 2 for a, b in zip(starts, starts[1:])]
+    lows = [0.0] + seams
+    highs = seams + [float(length)]
+    return {start: (low, high) for start, low, high in zip(starts, lows, highs)}
+
+
+def merge_tiles(tile_results: Sequence[Sequence[Tuple[Any, str, float]]],
+                origins: Sequence[Tuple[int, int]], size: int,
+                width: int, height: int) -> List[Tuple[List[List[float]], str, float]]:
+    """Merge per-tile reader output into page-level (bbox, text, confidence)
+
+    Each detection is shifted into page coordinates and kept only by the
+    tile whose core contains its centre. Text cut by a seam can still show
+    up from both tiles (once whole, once clipped), so detections mostly
+    covered by a larger one are dropped afterwards. Only boxes touching a
+    band where tiles overlap can have such a copy, so just those are
+    compared, band by band.
+    """
+    x_cores = _core_bounds([left for left, _ in origins], size, width)
+    y_cores = _core_bounds([top for _, top in origins], size, height)
+
+    boxes, texts, confidences = [], [], []
+    for results, (left, top) in zip(tile_results, origins):
+        if not results:
+            continue
+        x_low, x_high = x_cores[left]
+        y_low, y_high = y_cores[top]
+
+        tile_boxes = np.asarray([r[0] for r in results], dtype=np.float64).reshape(-1, 4, 2)
+        tile_boxes += (left, top)
+        centres = tile_boxes.mean(axis=1)
+        owned = (
+            (centres[:, 0] >= x_low) & (centres[:, 0] < x_high) &
+            (centres[:, 1] >= y_low) & (centres[:, 1] < y_high)
+        )
+        for i in np.flatnonzero(owned).tolist():
+            boxes.append(tile_boxes[i])
+            texts.append(results[i][1])
+            confidences.append(results[i][2])
+
+    if not boxes:
+        return []
+
+    stacked = np.stack(boxes)
+    mins = stacked.min(axis=1)
+    maxs = stacked.max(axis=1)
+    keep = np.ones(len(boxes), dtype=bool)
+    for axis, starts in ((0, [left for left, _ in origins]), (1, [top for _, top in origins])):
+        for low, high in _overlap_bands(starts, size):
+            band = np.flatnonzero((mins[:, axis] < high) & (maxs[:, axis] > low))
+            if len(band) > 1:
+                kept = set(_suppress_duplicates(stacked[band]))
+                keep[[i for n, i in enumerate(band.tolist()) if n not in kept]] = False
+    return [(boxes[i].tolist(), texts[i], confidences[i]) for i in np.flatnonzero(keep).tolist()]
+
+
+def _overlap_bands(starts: Sequence[int], size: int) -> List[Tuple[int, int]]:
+    """(low, high) strips along one axis covered by two neighbouring tiles"""
+    starts = sorted(set(starts))
+    return [(b, a + size) for a, b in zip(starts, starts[1:]) if b < a + size]
+
+
+def _suppress_duplicates(boxes: np.ndarray) -> List[int]:
+    """Indices of boxes to keep, largest first, in their original order"""
+    mins = boxes.min(axis=1)
+    maxs = boxes.max(axis=1)
+    areas = np.prod(np.clip(maxs - mins, 0, None), axis=1)
+
+    kept: List[int] = []
+    for i in np.argsort(-areas, kind="stable").tolist():
+        if kept:
+            k = np.asarray(kept)
+            overlap = np.clip(np.minimum(maxs[i], maxs[k]) - np.maximum(mins[i], mins[k]), 0, None)
+            intersection = overlap[:, 0] * overlap[:, 1]
+            if (intersection > DUPLICATE_OVERLAP * np.minimum(areas[i], areas[k])).any():
+                continue
+        kept.append(i)
+    return sorted(kept)
@@ -15,14 +15,157 @@ const PYTHON_ENV = '/usr/local/bin/python3'; // Use system Python with installed
 const OCR_SCRIPT = path.join(__dirname, 'ocr_cli.py');
 const PURCHASE_FOLDER = '/Users/macbookpro/Documents/Odoo MCP/purchase';
 
+// Persistent OCR worker (keeps the OCR models loaded between tool calls)
+const OCR_WORKER_SCRIPT = process.env.OCR_WORKER_SCRIPT || path.join(__dirname, '..', 'ai', 'ocr_cli.py');
+const USE_OCR_WORKER = process.env.OCR_PERSISTENT_WORKER !== 'false';
+const OCR_WORKER_OPERATIONS = ['single', 'batch', 'analyze'];
+
+// Worker requests not answered within this time are rejected (and fall back to a one-shot process)
+const OCR_WORKER_TIMEOUT_MS = parseInt(process.env.OCR_WORKER_TIMEOUT_MS || '300000', 10);
+const OCR_WORKER_HEALTH_TIMEOUT_MS = 10000;
+
+// Image preprocessing profile: fast, balanced (denoise only noisy pages) or quality
+const OCR_PROFILE_ARGS = process.env.OCR_PREPROCESS_PROFILE ? ['--profile', process.env.OCR_PREPROCESS_PROFILE] : [];
+
+// Tiled OCR for very large scans in the persistent worker (pixels per tile, unset = downscale)
+const OCR_TILE_ARGS = process.env.OCR_TILE_SIZE ? ['--tile-size', process.env.OCR_TILE_SIZE] : [];
+
+// Persistent worker engine: easyocr, tesseract, or cascade (Tesseract first, EasyOCR on low confidence)
+const OCR_ENGINE_ARGS = process.env.OCR_ENGINE ? ['--engine', process.env.OCR_ENGINE] : [];
+
+// Per-stage timings in worker results, and a Prometheus /metrics endpoint for the worker
+const OCR_METRICS_ARGS = [
+    ...(process.env.OCR_INSTRUMENT === 'true' ? ['--instrument'] : []),
+    ...(process.env.OCR_METRICS_PORT ? ['--metrics-port', process.env.OCR_METRICS_PORT] : [])
+];
+
+// Long-lived Python OCR process speaking newline-delimited JSON over stdio
+class OCRWorker {
+    constructor(script) {
+        this.script = script;
+        this.process = null;
+        this.ready = null;
+        this.pending = new Map();
+        this.nextId = 1;
+        this.buffer = '';
+    }
+
+    start() {
+        if (this.process) {
+            return this.ready;
+        }
+
+        this.ready = new Promise((resolve, reject) => {
+            this.resolveReady = resolve;
+            this.rejectReady = reject;
+        });
+
+        this.process = spawn(PYTHON_ENV, [this.script, '--serve', ...OCR_PROFILE_ARGS, ...OCR_TILE_ARGS, ...OCR_ENGINE_ARGS, ...OCR_METRICS_ARGS], {
+            cwd: path.dirname(this.script),
+            stdio: ['pipe', 'pipe', 'pipe']
+        });
+
+        this.process.stdin.on('error', (error) => this.onExit(new Error(`OCR worker pipe closed: ${error.message}`)));
+        this.process.stdout.on('data', (data) => this.onData(data));
+        this.process.stderr.on('data', (data) => process.stderr.write(data));
+        this.process.on('exit', (code) => this.onExit(new Error(`OCR worker exited with code ${code}`)));
+        this.process.on('error', (error) => this.onExit(new Error(`Failed to start OCR worker: ${error.message}`)));
+
+        return this.ready;
+    }
+
+    onData(data) {
+        this.buffer += data.toString();
+
+        let newline;
+        while ((newline = this.buffer.indexOf('\n')) >= 0) {
+            const line = this.buffer.slice(0, newline).trim();
+            this.buffer = this.buffer.slice(newline + 1);
+            if (!line) continue;
+
+            let message;
+            try {
+                message = JSON.parse(line);
+            } catch (parseError) {
+                continue;
+            }
+
+            if (message.event === 'ready') {
+                this.resolveReady(message);
+            } else if (message.event === 'error') {
+                this.rejectReady(new Error(message.error || 'OCR worker failed to load'));
+            } else if (this.pending.has(message.id)) {
+                const { resolve, reject } = this.pending.get(message.id);
+                this.pending.delete(message.id);
+                message.ok ? resolve(message.result) : reject(new Error(message.error));
+            }
+        }
+    }
+
+    onExit(error) {
+        this.rejectReady(error);
+        for (const { reject } of this.pending.values()) {
+            reject(error);
+        }
+        this.pending.clear();
+        this.process = null;
+        this.buffer = '';
+    }
+
+    async request(op, params = {}) {
+        await this.start();
+        return this.send(op, params);
+    }
+
+    send(op, params = {}, timeoutMs = OCR_WORKER_TIMEOUT_MS) {
+        const id = this.nextId++;
+        return new Promise((resolve, reject) => {
+            // A late reply for a timed-out request finds no pending entry and is dropped
+            const timer = setTimeout(() => {
+                if (this.pending.delete(id)) {
+                    reject(new Error(`OCR worker request '${op}' timed out after ${timeoutMs}ms`));
+                }
+            }, timeoutMs);
+            this.pending.set(id, {
+                resolve: (result) => { clearTimeout(timer); resolve(result); },
+                reject: (error) => { clearTimeout(timer); reject(error); }
+            });
+            this.process.stdin.write(JSON.stringify({ id, op, ...params }) + '\n');
+        });
+    }
+
+    async health() {
+        if (!this.process) {
+            return { status: 'stopped' };
+        }
+        // Answered even while the models are still loading
+        return this.send('health', {}, OCR_WORKER_HEALTH_TIMEOUT_MS);
+    }
+}
+
+const ocrWorker = new OCRWorker(OCR_WORKER_SCRIPT);
+
+// Run an OCR operation on the persistent worker, falling back to a one-shot process
+async function runOCR(filePath, operation = 'single', options = {}) {
+    if (USE_OCR_WORKER && OCR_WORKER_OPERATIONS.includes(operation)) {
+        try {
+            return await ocrWorker.request(operation, { path: filePath, ...options });
+        } catch (error) {
+            console.error(`OCR worker unavailable, using one-shot process: ${error.message}`);
+        }
+    }
+    return runOCRScript(filePath, operation, 'purchase_order', options);
+}
+
 // Helper function to run Python OCR script
-function runOCRScript(filePath, operation = 'image', documentType = 'purchase_order') {
+function runOCRScript(filePath, operation = 'image', documentType = 'purchase_order', options = {}) {
     return new Promise((resolve, reject) => {
-        const args = operation === 'batch' ? 
-            [OCR_SCRIPT, 'batch', filePath, '--document-type', documentType] : 
+        const args = (operation === 'batch' ? 
+            [OCR_SCRIPT, 'batch', filePath, '--document-type', documentType,
+                ...(options.limit ? ['--limit', String(options.limit)] : [])] : 
             operation === 'pdf' ?
             [OCR_SCRIPT, 'pdf', filePath, '--document-type', documentType] :
-            [OCR_SCRIPT, 'image', filePath, '--document-type', documentType];
+            [OCR_SCRIPT, 'image', filePath, '--document-type', documentType]).concat(OCR_PROFILE_ARGS);
             
         const pythonProcess = spawn(PYTHON_ENV, args, {
             cwd: __dirname,
@@ -59,12 +202,52 @@ function runOCRScript(filePath, operation = 'image', documentType = 'purchase_or
     });
 }
 
+// Document confidence: mean of the per-page confidences (null when no page reports one)
+function documentConfidence(ocrResult) {
+    const confidences = (ocrResult.pages || [])
+        .map(page => page.avg_confidence)
+        .filter(confidence => typeof confidence === 'number');
+    if (confidences.length === 0) {
+        return null;
+    }
+    return Number((confidences.reduce((a, b) => a + b, 0) / confidences.length).toFixed(3));
+}
+
 // Helper function to extract purchase order structured data
 function extractPurchaseOrderData(ocrResult) {
     if (!ocrResult.success) {
         return { success: false, error: ocrResult.error };
     }
 
+    // Results from the Python worker already carry fields from the shared extractor
+    const fields = ocrResult.structured_data;
+    if (fields && 'po_number' in fields) {
+        const contact = fields.contact_info || {};
+        return {
+            success: true,
+            extracted_data: {
+                document_type: fields.document_type,
+                po_number: fields.po_number,
+                vendor_name: fields.vendor_name,
+                date: fields.date,
+                total_amount: fields.total_amount,
+                items: fields.line_items || [],
+                vendor_details: {
+                    address: null,
+                    phone: contact.phone || null,
+                    email: contact.email || null
+                },
+                buyer_details: {
+                    company: null,
+                    address: null
+                }
+            },
+            confidence_score: documentConfidence(ocrResult),
+            total_text_blocks: ocrResult.combined.total_text_blocks
+        };
+    }
+
+    // Older cached results without structured_data: extract here
     const fullText = ocrResult.combined.full_text.toLowerCase();
     const textBlocks = ocrResult.combined.text_blocks;
     
@@ -185,7 +368,7 @@ function extractPurchaseOrderData(ocrResult) {
     return {
         success: true,
         extracted_data: extractedData,
-        confidence_score: ocrResult.combined.avg_confidence,
+        confidence_score: documentConfidence(ocrResult),
         total_text_blocks: ocrResult.combined.total_text_blocks
     };
 }
@@ -334,7 +517,7 @@ server.setRequestHandler(CallToolRequestSchema, async (request) => {
                     throw new Error(`File not found: ${args.file_path}`);
                 }
 
-                const ocrResult = await runOCRScript(args.file_path, 'single');
+                const ocrResult = await runOCR(args.file_path, 'single');
                 
                 let response = {
                     content: [{
@@ -346,7 +529,7 @@ server.setRequestHandler(CallToolRequestSchema, async (request) => {
                 if (ocrResult.success) {
                     let output = `✅ Successfully processed ${ocrResult.file_name}\n`;
                     output += `📊 Extracted ${ocrResult.combined.total_text_blocks} text blocks\n`;
-                    output += `🎯 Average confidence: ${ocrResult.combined.avg_confidence}\n\n`;
+                    output += `🎯 Average confidence: ${documentConfidence(ocrResult) ?? 'N/A'}\n\n`;
                     
                     if (args.extract_structured_data) {
                         const structuredData = extractPurchaseOrderData(ocrResult);
@@ -374,7 +557,7 @@ server.setRequestHandler(CallToolRequestSchema, async (request) => {
                     throw new Error(`File not found: ${args.file_path}`);
                 }
 
-                const poOcrResult = await runOCRScript(args.file_path, 'single');
+                const poOcrResult = await runOCR(args.file_path, 'single');
                 const structuredData = extractPurchaseOrderData(poOcrResult);
 
                 if (structuredData.success) {
@@ -405,7 +588,7 @@ server.setRequestHandler(CallToolRequestSchema, async (request) => {
                         output += '\n';
                     }
                     
-                    output += `🎯 OCR Confidence: ${structuredData.confidence_score}\n`;
+                    output += `🎯 OCR Confidence: ${structuredData.confidence_score ?? 'N/A'}\n`;
                     output += `📊 Text Blocks Processed: ${structuredData.total_text_blocks}`;
 
                     return {
@@ -447,7 +630,7 @@ server.setRequestHandler(CallToolRequestSchema, async (request) => {
                 const results = [];
 
                 // Use batch processing for efficiency
-                const batchResult = await runOCRScript(folderPath, 'batch', args.limit || 10);
+                const batchResult = await runOCR(folderPath, 'batch', { limit: args.limit || 10 });
                 
                 if (batchResult.success) {
                     for (const ocrResult of batchResult.results) {
@@ -560,6 +743,19 @@ server.setRequestHandler(CallToolRequestSchema, async (request) => {
                     statusOutput += `📷 Images Available: ${imageCount}\n`;
                 }
                 
+                if (USE_OCR_WORKER) {
+                    try {
+                        const workerHealth = await ocrWorker.health();
+                        statusOutput += `⚙️  OCR Worker: ${workerHealth.status}`;
+                        if (workerHealth.requests_served !== undefined) {
+                            statusOutput += ` (${workerHealth.requests_served} requests served, up ${workerHealth.uptime_seconds}s)`;
+                        }
+                        statusOutput += `\n`;
+                    } catch (error) {
+                        statusOutput += `⚙️  OCR Worker: ❌ ${error.message}\n`;
+                    }
+                }
+                
                 statusOutput += `\n🔧 System Ready: ${pythonExists && scriptExists ? '✅ Yes' : '❌ No'}`;
 
                 return {
@@ -574,7 +770,7 @@ server.setRequestHandler(CallToolRequestSchema, async (request) => {
                     throw new Error(`PDF file not found: ${args.file_path}`);
                 }
 
-                const pdfOcrResult = await runOCRScript(args.file_path, 'single');
+                const pdfOcrResult = await runOCR(args.file_path, 'single');
                 
                 if (pdfOcrResult.success) {
                     let output = `📄 Advanced PDF Processing: ${path.basename(args.file_path)}\n\n`;
@@ -655,7 +851,7 @@ server.setRequestHandler(CallToolRequestSchema, async (request) => {
                 }
 
                 // Quick analysis without full processing
-                const analysisResult = await runOCRScript(args.file_path, 'analyze');
+                const analysisResult = await runOCR(args.file_path, 'analyze');
                 
                 if (analysisResult.pdf_analysis) {
                     const analysis = analysisResult.pdf_analysis;
@@ -8,9 +8,13 @@ import sys
 import json
 import argparse
 import os
+import time
+import threading
+import itertools
 from pathlib import Path
 import traceback
-from typing import Dict, List, Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Iterator
 
 # Import OCR libraries
 try:
@@ -24,6 +28,115 @@ except ImportError as e:
     print("Please install: pip install pytesseract Pillow opencv-python pdf2image numpy", file=sys.stderr)
     sys.exit(1)
 
+# Preprocessing profiles are shared with the EasyOCR pipeline in ai/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ai'))
+from preprocess import preprocess_gray, PROFILES, DEFAULT_PROFILE
+from ocr_engines import tesseract_detections
+from layout import build_page_structure
+from field_extractor import extract_fields, extract_fields_batch
+from profiling import DocumentProfiler, profiled, attach_profile
+from batch_engine import BatchEngine
+
+# Supported input formats
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp'}
+PDF_EXTENSIONS = {'.pdf'}
+
+# Tesseract settings: uniform text block, restricted character set
+TESSERACT_CONFIG = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,!?@#$%^&*()_+-=[]{}|;:\'\"<>/~`'
+
+# Words at or below this Tesseract confidence are left out of 'boxes'
+MIN_BOX_CONFIDENCE = 30
+
+# structured_data fields reported for purchase orders, from the shared extractor's keys
+OUTPUT_FIELDS = {
+    'po_number': 'po_number',
+    'invoice_number': 'invoice_number',
+    'date': 'date',
+    'total_amount': 'total_amount',
+    'vendor': 'vendor_name'
+}
+
+# PDF pages are rendered at this resolution, a few pages per poppler call
+PDF_DPI = 300
+PDF_RENDER_CHUNK = 4
+
+
+def binarize(gray: np.ndarray, profile: str) -> tuple:
+    """Gated denoise plus Otsu threshold; returns (image, report)"""
+    # Denoise only if the profile and the measured noise call for it;
+    # no resize or CLAHE since the page is binarized next
+    denoised, report = preprocess_gray(gray, profile, resize=False, contrast=False)
+    
+    start = time.perf_counter()
+    _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    report['timings_ms']['threshold'] = round((time.perf_counter() - start) * 1000, 2)
+    return thresh, report
+
+
+def recognize(image: np.ndarray) -> Dict[str, Any]:
+    """Run Tesseract once and derive text, confidence and word boxes from image_to_data"""
+    start = time.perf_counter()
+    data = pytesseract.image_to_data(image, config=TESSERACT_CONFIG, output_type=pytesseract.Output.DICT)
+    
+    # Rebuild the text the way image_to_string lays it out: words joined
+    # per line, lines per paragraph, paragraphs separated by a blank line
+    paragraphs = []
+    lines = {}
+    confidences = []
+    boxes = []
+    for i, word in enumerate(data['text']):
+        conf = float(data['conf'][i])
+        if conf < 0 or not word.strip():
+            continue
+        if conf > 0:
+            confidences.append(conf)
+        
+        paragraph = (data['block_num'][i], data['par_num'][i])
+        if paragraph not in lines:
+            lines[paragraph] = {}
+            paragraphs.append(paragraph)
+        lines[paragraph].setdefault(data['line_num'][i], []).append(word)
+        
+        if conf > MIN_BOX_CONFIDENCE:
+            boxes.append({
+                'text': word,
+                'confidence': int(conf),
+                'x': int(data['left'][i]),
+                'y': int(data['top'][i]),
+                'width': int(data['width'][i]),
+                'height': int(data['height'][i])
+            })
+    
+    text = '\n\n'.join(
+        '\n'.join(' '.join(words) for words in lines[paragraph].values())
+        for paragraph in paragraphs
+    )
+    
+    # Line blocks and rows in the same format as the EasyOCR pipeline
+    detections = tesseract_detections(data)
+    structure = build_page_structure([d[0] for d in detections], [d[1] for d in detections],
+                                     [d[2] for d in detections])
+    return {
+        'text': text,
+        'confidence': round(sum(confidences) / len(confidences), 2) if confidences else 0,
+        'word_count': len(text.split()),
+        'boxes': boxes,
+        'text_blocks': structure['text_blocks'],
+        'rows': structure['rows'],
+        'recognize_ms': round((time.perf_counter() - start) * 1000, 2)
+    }
+
+
+def ocr_page(page: np.ndarray, profile: str, page_number: int) -> Dict[str, Any]:
+    """OCR one grayscale PDF page (module-level so it can run in a process pool)"""
+    try:
+        thresh, preprocessing = binarize(page, profile)
+        result = recognize(thresh)
+        preprocessing['timings_ms']['recognize'] = result.pop('recognize_ms')
+        return {'success': True, **result, 'preprocessing': preprocessing, 'page_number': page_number}
+    except Exception as e:
+        return {'success': False, 'error': str(e), 'text': '', 'confidence': 0, 'page_number': page_number}
+
 class NumpyEncoder(json.JSONEncoder):
     """JSON encoder that handles numpy types"""
     def default(self, obj):
@@ -38,9 +151,40 @@ class NumpyEncoder(json.JSONEncoder):
 class OCRProcessor:
     """OCR processing engine with Tesseract backend"""
     
-    def __init__(self):
+    def __init__(self, profile: str = DEFAULT_PROFILE, page_workers: Optional[int] = None,
+                 profiler: Optional[DocumentProfiler] = None):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown preprocessing profile: {profile}")
+        self.profile = profile
+        # Optional 1-in-N document profiling (cProfile, collapsed stacks, tracemalloc)
+        self.profiler = profiler
+        # Processes OCR'ing PDF pages in parallel (1 = in this process)
+        self.page_workers = max(1, page_workers or os.cpu_count() or 1)
+        # One page pool per processor, shared by every PDF (including
+        # concurrent batch files); started on first use, see close()
+        self._page_pool: Optional[ProcessPoolExecutor] = None
+        self._page_pool_lock = threading.Lock()
         self.setup_tesseract()
     
+    def _get_page_pool(self) -> ProcessPoolExecutor:
+        with self._page_pool_lock:
+            if self._page_pool is None:
+                self._page_pool = ProcessPoolExecutor(max_workers=self.page_workers)
+            return self._page_pool
+    
+    def close(self):
+        """Shut down the page pool, if one was started"""
+        with self._page_pool_lock:
+            pool, self._page_pool = self._page_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
     def setup_tesseract(self):
         """Configure Tesseract OCR engine"""
         # Check if tesseract is installed
@@ -53,7 +197,12 @@ class OCRProcessor:
     
     def preprocess_image(self, image_path: str) -> np.ndarray:
         """Preprocess image for better OCR results"""
+        return self._preprocess(image_path)[0]
+    
+    def _preprocess(self, image_path: str) -> tuple:
+        """Preprocess an image; returns (image, report with per-stage timings)"""
         try:
+            start = time.perf_counter()
             # Try multiple methods to read the image
             img = None
             
@@ -77,20 +226,18 @@ class OCRProcessor:
                 gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
             else:
                 gray = img
+            load_ms = (time.perf_counter() - start) * 1000
             
-            # Apply denoising
-            denoised = cv2.fastNlMeansDenoising(gray)
-            
-            # Apply threshold for better text recognition
-            _, thresh = cv2.threshold(denoised, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            thresh, report = binarize(gray, self.profile)
+            report['timings_ms'] = {'load': round(load_ms, 2), **report['timings_ms']}
             
-            return thresh
+            return thresh, report
             
         except Exception as e:
             print(f"Error preprocessing image {image_path}: {e}", file=sys.stderr)
             # Last resort fallback
             try:
-                return cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+                return cv2.imread(image_path, cv2.IMREAD_GRAYSCALE), {'profile': self.profile, 'timings_ms': {}}
             except:
                 raise ValueError(f"Complete failure to load image: {image_path}")
     
@@ -98,40 +245,16 @@ class OCRProcessor:
         """Extract text from image using Tesseract OCR"""
         try:
             # Preprocess image
-            processed_img = self.preprocess_image(image_path)
-            
-            # Configure Tesseract
-            config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,!?@#$%^&*()_+-=[]{}|;:\'\"<>/~`'
-            
-            # Extract text
-            text = pytesseract.image_to_string(processed_img, config=config)
+            processed_img, preprocessing = self._preprocess(image_path)
             
-            # Get detailed data with confidence scores
-            data = pytesseract.image_to_data(processed_img, output_type=pytesseract.Output.DICT)
-            
-            # Calculate confidence scores
-            confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
-            avg_confidence = sum(confidences) / len(confidences) if confidences else 0
-            
-            # Extract bounding boxes for words with high confidence
-            boxes = []
-            for i, conf in enumerate(data['conf']):
-                if int(conf) > 30:  # Only include high-confidence text
-                    boxes.append({
-                        'text': data['text'][i],
-                        'confidence': int(conf),
-                        'x': int(data['left'][i]),
-                        'y': int(data['top'][i]),
-                        'width': int(data['width'][i]),
-                        'height': int(data['height'][i])
-                    })
+            # Text, confidences and word boxes from a single Tesseract pass
+            result = recognize(processed_img)
+            preprocessing['timings_ms']['recognize'] = result.pop('recognize_ms')
             
             return {
                 'success': True,
-                'text': text.strip(),
-                'confidence': round(avg_confidence, 2),
-                'word_count': len(text.split()),
-                'boxes': boxes,
+                **result,
+                'preprocessing': preprocessing,
                 'image_path': image_path
             }
             
@@ -144,35 +267,64 @@ class OCRProcessor:
                 'image_path': image_path
             }
     
+    @staticmethod
+    def iter_pdf_pages(pdf_path: str, dpi: int = PDF_DPI) -> Iterator[np.ndarray]:
+        """Yield PDF pages as grayscale arrays, rendering a few pages at a time"""
+        first_page = 1
+        while True:
+            last_page = first_page + PDF_RENDER_CHUNK - 1
+            try:
+                pages = convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page,
+                                          fmt='ppm', grayscale=True)
+            except Exception:
+                # Past the last page poppler reports a bad range
+                if first_page == 1:
+                    raise
+                return
+            if not pages:
+                return
+            for page in pages:
+                yield np.asarray(page)
+            del pages
+            first_page = last_page + 1
+    
+    def ocr_pdf_pages(self, pdf_path: str) -> List[Dict[str, Any]]:
+        """OCR every page in memory, spreading pages over the shared page pool
+        
+        At most twice the worker count of rendered pages per document are in
+        flight, so memory stays bounded on long documents. Results are in
+        page order.
+        """
+        pages = enumerate(self.iter_pdf_pages(pdf_path), start=1)
+        if self.page_workers == 1:
+            return [ocr_page(page, self.profile, number) for number, page in pages]
+        
+        pool = self._get_page_pool()
+        results = []
+        pending = []
+        try:
+            for number, page in pages:
+                pending.append(pool.submit(ocr_page, page, self.profile, number))
+                if len(pending) >= 2 * self.page_workers:
+                    results.append(pending.pop(0).result())
+            results.extend(future.result() for future in pending)
+        finally:
+            # The pool outlives this document: drop pages nobody will collect
+            for future in pending:
+                future.cancel()
+        return results
+    
     def process_pdf(self, pdf_path: str) -> Dict[str, Any]:
-        """Process PDF by converting pages to images and running OCR"""
+        """Process PDF by rendering pages in memory and running OCR on them in parallel"""
         try:
-            # Convert PDF to images
-            pages = convert_from_path(pdf_path, dpi=300)
+            results = self.ocr_pdf_pages(pdf_path)
             
-            results = []
             combined_text = []
             total_confidence = 0
-            
-            for i, page in enumerate(pages):
-                # Save page as temporary image
-                temp_image_path = f"/tmp/pdf_page_{i}.png"
-                page.save(temp_image_path, 'PNG')
-                
-                # Process page with OCR
-                page_result = self.extract_text_from_image(temp_image_path)
-                page_result['page_number'] = i + 1
-                results.append(page_result)
-                
+            for page_result in results:
                 if page_result['success']:
                     combined_text.append(page_result['text'])
                     total_confidence += page_result['confidence']
-                
-                # Clean up temp file
-                try:
-                    os.remove(temp_image_path)
-                except:
-                    pass
             
             avg_confidence = total_confidence / len(results) if results else 0
             
@@ -196,53 +348,69 @@ class OCRProcessor:
     
     def extract_structured_data(self, text: str, document_type: str = 'purchase_order') -> Dict[str, Any]:
         """Extract structured data from OCR text"""
-        import re
-        
+        return self._structured(extract_fields(text), document_type)
+    
+    @staticmethod
+    def _structured(fields: Dict[str, Any], document_type: str) -> Dict[str, Any]:
+        """Shape shared extractor output as this CLI's structured_data"""
         structured_data = {
             'document_type': document_type,
             'extracted_fields': {}
         }
         
         if document_type == 'purchase_order':
-            # Extract common purchase order fields
-            patterns = {
-                'po_number': [
-                    r'P\.?O\.?\s*#?\s*:?\s*(\w+[\w\-\s]*\w+)',
-                    r'Purchase Order\s*#?\s*:?\s*(\w+[\w\-\s]*\w+)',
-                    r'Order\s*#?\s*:?\s*(\w+[\w\-\s]*\w+)'
-                ],
-                'invoice_number': [
-                    r'Invoice\s*#?\s*:?\s*(\w+[\w\-\s]*\w+)',
-                    r'Inv\.?\s*#?\s*:?\s*(\w+[\w\-\s]*\w+)'
-                ],
-                'date': [
-                    r'Date\s*:?\s*(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})',
-                    r'(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})',
-                    r'(\d{4}[\/\-]\d{1,2}[\/\-]\d{1,2})'
-                ],
-                'total_amount': [
-                    r'Total\s*:?\s*\$?\s*(\d+[,\d]*\.?\d*)',
-                    r'Amount\s*:?\s*\$?\s*(\d+[,\d]*\.?\d*)',
-                    r'\$\s*(\d+[,\d]*\.?\d*)'
-                ],
-                'vendor': [
-                    r'Vendor\s*:?\s*([A-Za-z\s&\.,]+?)(?:\n|$)',
-                    r'From\s*:?\s*([A-Za-z\s&\.,]+?)(?:\n|$)',
-                    r'Supplier\s*:?\s*([A-Za-z\s&\.,]+?)(?:\n|$)'
-                ]
-            }
-            
-            for field, field_patterns in patterns.items():
-                for pattern in field_patterns:
-                    match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
-                    if match:
-                        structured_data['extracted_fields'][field] = match.group(1).strip()
-                        break
+            for field, key in OUTPUT_FIELDS.items():
+                if fields.get(key):
+                    structured_data['extracted_fields'][field] = fields[key]
         
         return structured_data
     
-    def batch_process_images(self, directory: str, document_type: str = 'purchase_order') -> Dict[str, Any]:
-        """Process all images in a directory"""
+    def process_file(self, file_path: str, document_type: str = 'purchase_order',
+                     structured: bool = True) -> Dict[str, Any]:
+        """Process one image or PDF and attach structured data (unless structured=False)"""
+        with profiled(self.profiler, file_path) as capture:
+            if Path(file_path).suffix.lower() in PDF_EXTENSIONS:
+                result = self.process_pdf(file_path)
+            else:
+                result = self.extract_text_from_image(file_path)
+            
+            if structured and result['success'] and result['text']:
+                # Extract structured data
+                structured = self.extract_structured_data(result['text'], document_type)
+                result['structured_data'] = structured
+        return attach_profile(result, capture)
+    
+    def iter_batch_images(self, directory: str, document_type: str = 'purchase_order',
+                          max_workers: Optional[int] = None, timeout: Optional[float] = None,
+                          structured: bool = True, limit: int = 0) -> Iterator[Dict[str, Any]]:
+        """Process a directory concurrently, yielding each result as soon as it finishes
+        
+        Scheduling (bounded workers, per-file timeout) is BatchEngine's; files
+        are listed lazily, one per unit. limit > 0 processes at most that
+        many files.
+        """
+        files = (
+            str(file_path) for file_path in Path(directory).iterdir()
+            if file_path.is_file() and file_path.suffix.lower() in IMAGE_EXTENSIONS | PDF_EXTENSIONS
+        )
+        if limit > 0:
+            files = itertools.islice(files, limit)
+        
+        def process_unit(unit: List[str]) -> List[Dict[str, Any]]:
+            return [self.process_file(file_path, document_type, structured) for file_path in unit]
+        
+        engine = BatchEngine(process_unit, max_workers=max_workers, timeout=timeout)
+        for result in engine.iter_results([file_path] for file_path in files):
+            if not result['success']:
+                # Failed files carry this CLI's empty text fields
+                result.setdefault('text', '')
+                result.setdefault('confidence', 0)
+            yield result
+    
+    def batch_process_images(self, directory: str, document_type: str = 'purchase_order',
+                             max_workers: Optional[int] = None, timeout: Optional[float] = None,
+                             limit: int = 0) -> Dict[str, Any]:
+        """Process all images in a directory (limit > 0: at most that many files)"""
         try:
             dir_path = Path(directory)
             if not dir_path.exists():
@@ -252,33 +420,13 @@ class OCRProcessor:
                     'results': []
                 }
             
-            # Supported image formats
-            image_extensions = {'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp'}
-            pdf_extensions = {'.pdf'}
-            
-            results = []
-            
-            # Process all supported files
-            for file_path in dir_path.iterdir():
-                if file_path.is_file():
-                    if file_path.suffix.lower() in image_extensions:
-                        # Process image
-                        result = self.extract_text_from_image(str(file_path))
-                        if result['success'] and result['text']:
-                            # Extract structured data
-                            structured = self.extract_structured_data(result['text'], document_type)
-                            result['structured_data'] = structured
-                        results.append(result)
-                        
-                    elif file_path.suffix.lower() in pdf_extensions:
-                        # Process PDF
-                        result = self.process_pdf(str(file_path))
-                        if result['success'] and result['text']:
-                            # Extract structured data
-                            structured = self.extract_structured_data(result['text'], document_type)
-                            result['structured_data'] = structured
-                        results.append(result)
+            results = list(self.iter_batch_images(directory, document_type, max_workers, timeout,
+                                                  structured=False, limit=limit))
             
+            # Structured data for the whole batch in one extraction pass
+            extracted = [r for r in results if r['success'] and r['text']]
+            for result, fields in zip(extracted, extract_fields_batch([r['text'] for r in extracted])):
+                result['structured_data'] = self._structured(fields, document_type)
             successful_results = [r for r in results if r['success']]
             
             return {
@@ -305,26 +453,60 @@ def main():
     parser.add_argument('path', help='Path to image, PDF, or directory')
     parser.add_argument('--document-type', default='purchase_order', help='Document type for structured extraction')
     parser.add_argument('--output', help='Output file for results (JSON format)')
+    parser.add_argument('--workers', type=int, help='Files processed concurrently in batch mode')
+    parser.add_argument('--timeout', type=float, help='Per-file timeout in seconds for batch mode')
+    parser.add_argument('--limit', type=int, default=0, help='Batch mode: process at most this many files (0 = no limit)')
+    parser.add_argument('--stream', action='store_true', help='Batch mode: print one NDJSON result per file as it finishes')
+    parser.add_argument('--profile', choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help='Preprocessing profile: fast, balanced (denoise only noisy pages) or quality')
+    parser.add_argument('--page-workers', type=int,
+                        help='Processes OCR\'ing PDF pages in parallel (default: CPU count, 1 = no pool)')
+    parser.add_argument('--profile-dir', metavar='DIR',
+                        help='Profile documents (cProfile, collapsed stacks, tracemalloc) into DIR')
+    parser.add_argument('--profile-every', type=int, default=1, metavar='N',
+                        help='With --profile-dir, profile 1 in N documents')
     
     args = parser.parse_args()
     
+    processor = None
     try:
-        processor = OCRProcessor()
+        profiler = DocumentProfiler(args.profile_dir, every=args.profile_every) if args.profile_dir else None
+        processor = OCRProcessor(profile=args.profile, page_workers=args.page_workers, profiler=profiler)
         
-        if args.command == 'image':
-            result = processor.extract_text_from_image(args.path)
-            if result['success'] and result['text']:
-                structured = processor.extract_structured_data(result['text'], args.document_type)
-                result['structured_data'] = structured
-                
-        elif args.command == 'pdf':
-            result = processor.process_pdf(args.path)
-            if result['success'] and result['text']:
-                structured = processor.extract_structured_data(result['text'], args.document_type)
-                result['structured_data'] = structured
+        if args.command in ('image', 'pdf'):
+            result = processor.process_file(args.path, args.document_type)
                 
+        elif args.command == 'batch' and args.stream:
+            if not Path(args.path).exists():
+                raise FileNotFoundError(f'Directory does not exist: {args.path}')
+            
+            out = open(args.output, 'w') if args.output else sys.stdout
+            successful = failed = 0
+            try:
+                for file_result in processor.iter_batch_images(args.path, args.document_type,
+                                                               args.workers, args.timeout, limit=args.limit):
+                    out.write(json.dumps(file_result, cls=NumpyEncoder) + '\n')
+                    out.flush()
+                    if file_result['success']:
+                        successful += 1
+                    else:
+                        failed += 1
+                out.write(json.dumps({
+                    'summary': True,
+                    'success': True,
+                    'total_files': successful + failed,
+                    'successful_files': successful,
+                    'failed_files': failed,
+                    'directory': args.path
+                }) + '\n')
+            finally:
+                if args.output:
+                    out.close()
+            return
+            
         elif args.command == 'batch':
-            result = processor.batch_process_images(args.path, args.document_type)
+            result = processor.batch_process_images(args.path, args.document_type,
+                                                    args.workers, args.timeout, args.limit)
         
         # Output results
         json_output = json.dumps(result, indent=2, cls=NumpyEncoder)
@@ -344,6 +526,9 @@ def main():
         }
         print(json.dumps(error_result, indent=2), file=sys.stderr)
         sys.exit(1)
+    finally:
+        if processor is not None:
+            processor.close()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
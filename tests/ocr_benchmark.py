@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+"""
+Offline OCR benchmark
+Generates a deterministic synthetic document corpus (text-layer, scanned and
+mixed PDFs, rotated/noisy phone photos, HEIC files) and measures the OCR
+entry points end to end on CPU. Results are written as JSON so runs on
+different commits can be compared.
+
+Usage:
+  python tests/ocr_benchmark.py [--output bench.json] [--seed 1234]
+                                [--copies 2] [--pages 3] [--scenarios NAME ...]
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import fitz  # PyMuPDF, needed for text-layer and mixed PDFs
+    HAS_PYMUPDF = True
+except ImportError:
+    HAS_PYMUPDF = False
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+AI_DIR = os.path.join(REPO_DIR, 'ai')
+TESSERACT_CLI = os.path.join(REPO_DIR, 'servers', 'ocr_cli.py')
+
+BENCHMARK_VERSION = 1
+SCENARIOS = ['extract_from_document', 'process_pdf_hybrid', 'batch_process', 'tesseract']
+
+# Rendered scan pages (about 200 DPI letter) and phone photos (12 MP)
+PAGE_SIZE = (1700, 2200)
+PHOTO_SIZE = (3024, 4032)
+EXIF_ORIENTATION = 0x0112
+
+VENDORS = ['Acme Industrial Supplies', 'Northwind Traders', 'Globex Components', 'Initech Office Goods']
+ITEMS = ['Steel bolts M8', 'Copper wire 2.5mm', 'Safety gloves', 'LED panel 40W', 'Cable ties 200mm',
+         'Printer paper A4', 'Hydraulic hose', 'Bearing 6204', 'Toner cartridge', 'Drill bit set']
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+
+def _font(size: int):
+    for name in ('DejaVuSans.ttf', 'Arial.ttf', '/System/Library/Fonts/Supplemental/Arial.ttf'):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+def page_lines(rng: np.random.Generator, doc: int, page: int) -> List[str]:
+    """Purchase-order style text for one page, fully determined by rng"""
+    lines = [
+        VENDORS[int(rng.integers(len(VENDORS)))],
+        'PURCHASE ORDER' if doc % 2 == 0 else 'TAX INVOICE',
+        f'PO No: PO-{int(rng.integers(1000, 9999))}    Date: {int(rng.integers(1, 28)):02d}/0{page + 1}/2025',
+        '',
+    ]
+    total = 0.0
+    for _ in range(int(rng.integers(8, 14))):
+        quantity = int(rng.integers(1, 50))
+        price = round(float(rng.uniform(1, 500)), 2)
+        total += quantity * price
+        lines.append(f'{ITEMS[int(rng.integers(len(ITEMS)))]:<24} {quantity:>4}  {price:>9.2f}  {quantity * price:>10.2f}')
+    lines += ['', f'Total: ${total:,.2f}', 'Contact: purchasing@example.com']
+    return lines
+
+
+def render_page(lines: List[str]) -> Image.Image:
+    """Black text on a white page"""
+    image = Image.new('L', PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(image)
+    font = _font(34)
+    y = 150
+    for line in lines:
+        draw.text((150, y), line, fill=0, font=font)
+        y += 56
+    return image
+
+
+def scan_effects(image: Image.Image, rng: np.random.Generator, noise: float) -> Image.Image:
+    """Slight skew plus sensor noise, like a flatbed scan"""
+    image = image.rotate(float(rng.uniform(-1.5, 1.5)), resample=Image.BICUBIC, fillcolor=255)
+    pixels = np.asarray(image, dtype=np.float32) + rng.normal(0, noise, (image.height, image.width))
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def phone_photo(page: Image.Image, rng: np.random.Generator) -> Image.Image:
+    """A page photographed on a desk: tinted, noisy, off-centre, 12 MP"""
+    photo = Image.new('RGB', PHOTO_SIZE, tuple(int(v) for v in rng.integers(60, 110, 3)))
+    scale = 0.8 * min(PHOTO_SIZE[0] / PAGE_SIZE[0], PHOTO_SIZE[1] / PAGE_SIZE[1])
+    paper = page.resize((int(PAGE_SIZE[0] * scale), int(PAGE_SIZE[1] * scale)), Image.BICUBIC)
+    paper = paper.rotate(float(rng.uniform(-4, 4)), resample=Image.BICUBIC, expand=True, fillcolor=0)
+    left = (PHOTO_SIZE[0] - paper.width) // 2 + int(rng.integers(-80, 80))
+    top = (PHOTO_SIZE[1] - paper.height) // 2 + int(rng.integers(-80, 80))
+    photo.paste(paper.convert('RGB'), (left, top), paper.point(lambda v: 255 if v else 0))
+
+    pixels = np.asarray(photo, dtype=np.float32) * np.array([1.0, 0.97, 0.9])
+    pixels += rng.normal(0, 8, pixels.shape)
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+
+def _png_bytes(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def build_corpus(corpus_dir: str, seed: int, copies: int, pages: int) -> Dict[str, Any]:
+    """Write the synthetic corpus; returns a manifest of files by kind"""
+    rng = np.random.default_rng(seed)
+    pdf_dir = os.path.join(corpus_dir, 'pdf')
+    photo_dir = os.path.join(corpus_dir, 'photos')
+    os.makedirs(pdf_dir, exist_ok=True)
+    os.makedirs(photo_dir, exist_ok=True)
+
+    files: List[Dict[str, Any]] = []
+    skipped: List[str] = []
+
+    for doc in range(copies):
+        texts = [page_lines(rng, doc, page) for page in range(pages)]
+        scans = [scan_effects(render_page(lines), rng, noise=6) for lines in texts]
+
+        path = os.path.join(pdf_dir, f'scanned_{doc}.pdf')
+        scans[0].save(path, 'PDF', resolution=200.0, save_all=True, append_images=scans[1:])
+        files.append({'path': path, 'kind': 'scanned_pdf', 'pages': pages})
+
+        if HAS_PYMUPDF:
+            path = os.path.join(pdf_dir, f'text_{doc}.pdf')
+            pdf = fitz.open()
+            for lines in texts:
+                page = pdf.new_page(width=612, height=792)
+                for row, line in enumerate(lines):
+                    page.insert_text((54, 72 + row * 16), line, fontsize=10, fontname='cour')
+            pdf.save(path, garbage=4, deflate=True)
+            pdf.close()
+            files.append({'path': path, 'kind': 'text_pdf', 'pages': pages})
+
+            # Text-layer pages alternating with scanned pages
+            path = os.path.join(pdf_dir, f'mixed_{doc}.pdf')
+            pdf = fitz.open()
+            for index, (lines, scan) in enumerate(zip(texts, scans)):
+                page = pdf.new_page(width=612, height=792)
+                if index % 2:
+                    page.insert_image(page.rect, stream=_png_bytes(scan))
+                else:
+                    for row, line in enumerate(lines):
+                        page.insert_text((54, 72 + row * 16), line, fontsize=10, fontname='cour')
+            pdf.save(path, garbage=4, deflate=True)
+            pdf.close()
+            files.append({'path': path, 'kind': 'mixed_pdf', 'pages': pages})
+        elif doc == 0:
+            skipped += ['text_pdf', 'mixed_pdf']
+
+        # Stored rotated with EXIF orientation 6, so it is only upright if the loader honours EXIF
+        photo = phone_photo(render_page(texts[0]), rng)
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6
+        path = os.path.join(photo_dir, f'photo_{doc}.jpg')
+        photo.transpose(Image.ROTATE_90).save(path, 'JPEG', quality=88, exif=exif.tobytes())
+        files.append({'path': path, 'kind': 'rotated_photo', 'pages': 1})
+
+        try:
+            from pillow_heif import register_heif_opener
+            register_heif_opener()
+            path = os.path.join(photo_dir, f'photo_{doc}.heic')
+            phone_photo(render_page(texts[-1]), rng).save(path, format='HEIF', quality=80)
+            files.append({'path': path, 'kind': 'heic', 'pages': 1})
+        except ImportError:
+            if doc == 0:
+                skipped.append('heic')
+
+    kinds: Dict[str, int] = {}
+    for entry in files:
+        kinds[entry['kind']] = kinds.get(entry['kind'], 0) + 1
+    return {'seed': seed, 'files': files, 'kinds': kinds, 'skipped': skipped}
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return round(ordered[rank], 2)
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+class StageTimer:
+    """Collects per-stage latencies (ms) from results and from the harness"""
+
+    def __init__(self):
+        self.stages: Dict[str, List[float]] = {}
+
+    def add(self, stage: str, ms: float):
+        self.stages.setdefault(stage, []).append(ms)
+
+    def add_report(self, report: Optional[Dict[str, Any]]):
+        for stage, ms in (report or {}).get('timings_ms', {}).items():
+            self.add(stage, ms)
+
+    def add_pages(self, pages: List[Dict[str, Any]]):
+        for page in pages or []:
+            if isinstance(page, dict):
+                self.add_report(page.get('preprocessing'))
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            stage: {'count': len(values), 'p50_ms': percentile(values, 50), 'p95_ms': percentile(values, 95)}
+            for stage, values in sorted(self.stages.items())
+        }
+
+
+def _scenario_result(timer: StageTimer, documents: int, pages: int, wall_s: float, errors: int,
+                     cache: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    return {
+        'documents': documents,
+        'pages': pages,
+        'errors': errors,
+        'wall_s': round(wall_s, 3),
+        'pages_per_s': round(pages / wall_s, 3) if wall_s else None,
+        'stages': timer.summary(),
+        'peak_rss_mb': peak_rss_mb(),
+        'cache': cache
+    }
+
+
+def _simple_ocr(cache_dir: str):
+    sys.path.insert(0, AI_DIR)
+    from simple_ocr import SimpleOCR
+    return SimpleOCR(cache_dir=cache_dir, gpu=False)
+
+
+def run_extract_from_document(manifest: Dict[str, Any], work_dir: str) -> Dict[str, Any]:
+    """Every corpus file cold, then again warm to exercise the cache"""
+    ocr = _simple_ocr(os.path.join(work_dir, 'cache'))
+    timer = StageTimer()
+    paths = [entry['path'] for entry in manifest['files']]
+
+    async def run_all(record: bool):
+        pages = errors = 0
+        for path in paths:
+            start = time.perf_counter()
+            result = await ocr.extract_from_document(path)
+            if not record:
+                continue
+            timer.add('document', (time.perf_counter() - start) * 1000)
+            if result.get('success'):
+                pages += result.get('total_pages', 1)
+                timer.add_pages(result.get('pages'))
+            else:
+                errors += 1
+        return pages, errors
+
+    start = time.perf_counter()
+    pages, errors = asyncio.run(run_all(record=True))
+    cold_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    asyncio.run(run_all(record=False))
+    warm_s = time.perf_counter() - start
+
+    result = _scenario_result(timer, len(paths), pages, cold_s, errors, cache=ocr.cache_store.stats())
+    result['warm_wall_s'] = round(warm_s, 3)
+    return result
+
+
+def run_process_pdf_hybrid(manifest: Dict[str, Any], work_dir: str) -> Dict[str, Any]:
+    """EnhancedPDFProcessor.process_pdf_hybrid on every PDF, SimpleOCR as the OCR engine"""
+    ocr = _simple_ocr(os.path.join(work_dir, 'cache'))
+    from enhanced_pdf_processor import EnhancedPDFProcessor
+    processor = ocr.pdf_processor or EnhancedPDFProcessor(os.path.join(work_dir, 'pdf_cache'))
+
+    timer = StageTimer()
+    paths = [entry['path'] for entry in manifest['files'] if entry['path'].endswith('.pdf')]
+    pages = errors = 0
+    start = time.perf_counter()
+    for path in paths:
+        doc_start = time.perf_counter()
+        result = processor.process_pdf_hybrid(path, ocr_processor=ocr)
+        timer.add('document', (time.perf_counter() - doc_start) * 1000)
+        if result.get('success'):
+            pages += len(result.get('pages', []))
+            timer.add_pages(result.get('pages'))
+        else:
+            errors += 1
+    wall_s = time.perf_counter() - start
+    return _scenario_result(timer, len(paths), pages, wall_s, errors, cache=processor.cache_store.stats())
+
+
+def run_batch_process(manifest: Dict[str, Any], work_dir: str) -> Dict[str, Any]:
+    """SimpleOCR.batch_process over the photo directory (batched recognition)"""
+    ocr = _simple_ocr(os.path.join(work_dir, 'cache'))
+    photo_dir = os.path.join(manifest['corpus_dir'], 'photos')
+
+    timer = StageTimer()
+    start = time.perf_counter()
+    batch = asyncio.run(ocr.batch_process(photo_dir, ['*.jpg', '*.jpeg', '*.png', '*.heic']))
+    wall_s = time.perf_counter() - start
+
+    pages = 0
+    for result in batch['results']:
+        if result.get('success'):
+            pages += result.get('total_pages', 1)
+            timer.add_pages(result.get('pages'))
+    return _scenario_result(timer, batch['total_files'], pages, wall_s, batch['failed'],
+                            cache=ocr.cache_store.stats())
+
+
+def run_tesseract(manifest: Dict[str, Any], work_dir: str) -> Dict[str, Any]:
+    """The Tesseract CLI engine (servers/ocr_cli.py) on every file it supports"""
+    spec = importlib.util.spec_from_file_location('tesseract_cli', TESSERACT_CLI)
+    cli = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(cli)
+    processor = cli.OCRProcessor()
+    supported = cli.IMAGE_EXTENSIONS | cli.PDF_EXTENSIONS
+
+    timer = StageTimer()
+    paths = [entry['path'] for entry in manifest['files']
+             if os.path.splitext(entry['path'])[1].lower() in supported]
+    pages = errors = 0
+    start = time.perf_counter()
+    for path in paths:
+        doc_start = time.perf_counter()
+        result = processor.process_file(path)
+        timer.add('document', (time.perf_counter() - doc_start) * 1000)
+        if result.get('success'):
+            pages += result.get('pages', 1)
+            timer.add_report(result.get('preprocessing'))
+            timer.add_pages(result.get('page_results'))
+        else:
+            errors += 1
+    wall_s = time.perf_counter() - start
+    processor.close()
+    return _scenario_result(timer, len(paths), pages, wall_s, errors)
+
+
+RUNNERS = {
+    'extract_from_document': run_extract_from_document,
+    'process_pdf_hybrid': run_process_pdf_hybrid,
+    'batch_process': run_batch_process,
+    'tesseract': run_tesseract,
+}
+
+
+def run_isolated(name: str, manifest_path: str) -> Dict[str, Any]:
+    """Run one scenario in a fresh CPU-only interpreter (own caches, own peak RSS)"""
+    env = dict(os.environ, CUDA_VISIBLE_DEVICES='')
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-scenario', name,
+                           '--manifest', manifest_path],
+                          env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'error': (proc.stderr or proc.stdout).strip().splitlines()[-1:] or ['failed']}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline OCR benchmark on a synthetic corpus')
+    parser.add_argument('--output', help='Write the JSON report here (default: stdout)')
+    parser.add_argument('--seed', type=int, default=1234, help='Corpus seed')
+    parser.add_argument('--copies', type=int, default=2, help='Documents generated per kind')
+    parser.add_argument('--pages', type=int, default=3, help='Pages per generated PDF')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument('--keep-corpus', metavar='DIR', help='Generate the corpus in DIR and keep it')
+    parser.add_argument('--run-scenario', choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument('--manifest', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        with open(args.manifest) as f:
+            manifest = json.load(f)
+        work_dir = tempfile.mkdtemp(prefix='ocr-bench-')
+        try:
+            result = RUNNERS[args.run_scenario](manifest, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        print(json.dumps(result))
+        return
+
+    corpus_dir = args.keep_corpus or tempfile.mkdtemp(prefix='ocr-corpus-')
+    try:
+        print(f"🧪 Generating corpus (seed {args.seed}) in {corpus_dir}", file=sys.stderr)
+        manifest = build_corpus(corpus_dir, args.seed, args.copies, args.pages)
+        manifest['corpus_dir'] = corpus_dir
+        manifest_path = os.path.join(corpus_dir, 'manifest.json')
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        scenarios = {}
+        for name in args.scenarios:
+            print(f"⏱️  Running {name}...", file=sys.stderr)
+            scenarios[name] = run_isolated(name, manifest_path)
+    finally:
+        if not args.keep_corpus:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    report = {
+        'benchmark': 'ocr',
+        'version': BENCHMARK_VERSION,
+        'git_commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'device': 'cpu',
+        'corpus': {key: manifest[key] for key in ('seed', 'kinds', 'skipped')},
+        'config': {'copies': args.copies, 'pages': args.pages},
+        'scenarios': scenarios
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+        print(f"Results saved to: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
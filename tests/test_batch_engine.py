@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Scheduling tests for ai/batch_engine.py
+Runs under pytest or directly: python tests/test_batch_engine.py
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ai'))
+
+from batch_engine import BatchEngine
+
+
+class Recorder:
+    """process_fn that sleeps per file and tracks how many units run at once"""
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.running = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, unit):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            time.sleep(sum(self.delays.get(path, 0.01) for path in unit))
+            return [{"success": True, "file_path": path} for path in unit]
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def run(engine, units):
+    async def collect():
+        return [result async for result in engine.stream(units)]
+    return asyncio.run(collect())
+
+
+def test_every_file_reported_and_bounded():
+    process = Recorder({})
+    units = [[f"f{i}"] for i in range(10)] + [["a", "b"]]
+    results = run(BatchEngine(process, max_workers=3), units)
+    assert sorted(r["file_path"] for r in results) == sorted(["a", "b"] + [f"f{i}" for i in range(10)])
+    assert all(r["success"] for r in results)
+    assert process.peak <= 3
+
+
+def test_timed_out_unit_keeps_its_slot():
+    # "slow" times out, but its thread holds the only slot until it returns,
+    # so "fast" starts afterwards and gets its full timeout
+    process = Recorder({"slow": 0.6, "fast": 0.1})
+    results = run(BatchEngine(process, max_workers=1, timeout=0.3), [["slow"], ["fast"]])
+    by_path = {r["file_path"]: r for r in results}
+    assert not by_path["slow"]["success"] and "Timed out" in by_path["slow"]["error"]
+    assert by_path["fast"]["success"]
+    assert process.peak == 1
+
+
+def test_errors_become_failed_results():
+    def process(unit):
+        raise ValueError("broken file")
+    results = run(BatchEngine(process, max_workers=2), [["x"], ["y"]])
+    assert [r["success"] for r in results] == [False, False]
+    assert all(r["error"] == "broken file" for r in results)
+
+
+def test_abandoned_threads_do_not_block_the_stream():
+    process = Recorder({"stuck": 2.0})
+    start = time.monotonic()
+    results = run(BatchEngine(process, max_workers=2, timeout=0.2), [["stuck"], ["ok"]])
+    assert time.monotonic() - start < 1.5
+    assert {r["file_path"]: r["success"] for r in results} == {"stuck": False, "ok": True}
+
+
+def test_iter_results_for_synchronous_callers():
+    process = Recorder({"slow": 0.6})
+    engine = BatchEngine(process, max_workers=2, timeout=0.3)
+    results = list(engine.iter_results([["slow"], ["a"], ["b"]]))
+    assert {r["file_path"]: r["success"] for r in results} == {"slow": False, "a": True, "b": True}
+    assert process.peak <= 2
+
+
+def test_iter_results_stopped_early():
+    units = ([f"f{i}"] for i in range(100))
+    results = BatchEngine(Recorder({}), max_workers=2).iter_results(units)
+    assert next(results)["success"]
+    results.close()
+    # Units are pulled lazily: closing the stream leaves the rest unread
+    assert len(list(units)) > 90
+
+
+if __name__ == '__main__':
+    tests = [name for name in sorted(globals()) if name.startswith('test_')]
+    for name in tests:
+        globals()[name]()
+        print(f"✅ {name}")
+    print(f"{len(tests)} batch engine tests passed")
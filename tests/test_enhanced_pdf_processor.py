@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Structured data tests for ai/enhanced_pdf_processor.py
+Runs under pytest or directly: python tests/test_enhanced_pdf_processor.py
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ai'))
+
+import fitz  # PyMuPDF
+
+from enhanced_pdf_processor import EnhancedPDFProcessor
+
+PURCHASE_ORDER = [
+    "ACME Industrial Supplies Ltd",
+    "PURCHASE ORDER",
+    "PO Number: PO-2024-0042",
+    "Item Description Qty Price",
+    "Steel bolts M8 100 12.50",
+    "Hex nuts M8 200 4.75",
+    "Washers 8mm 300 3.20",
+    "Total: 20.45"
+]
+
+
+def write_text_pdf(path, lines):
+    doc = fitz.open()
+    page = doc.new_page()
+    for i, line in enumerate(lines):
+        page.insert_text((72, 72 + 20 * i), line, fontsize=11)
+    doc.save(path)
+    doc.close()
+
+
+def test_text_layer_purchase_order_has_line_items():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "po.pdf")
+        write_text_pdf(path, PURCHASE_ORDER)
+        processor = EnhancedPDFProcessor(cache_dir=tmp)
+        try:
+            result = processor.process_pdf_hybrid(path)
+        finally:
+            processor.cache_store.close()
+
+    assert result["success"] and result["processing_method"] == "text_extraction"
+    fields = result["structured_data"]
+    assert fields["po_number"] == "PO-2024-0042"
+    items = [item["text"] for item in fields["line_items"]]
+    assert "Steel bolts M8 100 12.50" in items
+    assert "Washers 8mm 300 3.20" in items
+    # Vendor comes from the top layout rows
+    assert fields["vendor_name"] == "ACME Industrial Supplies Ltd"
+
+
+if __name__ == '__main__':
+    tests = [name for name in sorted(globals()) if name.startswith('test_')]
+    for name in tests:
+        globals()[name]()
+        print(f"✅ {name}")
+    print(f"{len(tests)} enhanced PDF processor tests passed")
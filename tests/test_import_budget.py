@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Import-time budget tests for the OCR CLI
+Checks, each in a fresh interpreter, that importing ai/ocr_cli.py and
+constructing SimpleOCR stay within a time budget, and that neither a cache
+hit nor a text-layer PDF loads torch/easyocr/OpenCV.
+Runs under pytest or directly: python tests/test_import_budget.py
+Set OCR_IMPORT_BUDGET (seconds) to change the startup budget.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+AI_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ai'))
+
+# Seconds allowed for `import ocr_cli` plus SimpleOCR() in a fresh interpreter
+DEFAULT_BUDGET = 1.5
+
+# Modules that only an actual OCR call may load
+HEAVY_MODULES = ['torch', 'easyocr', 'cv2']
+
+STARTUP = r'''
+import asyncio, json, os, sys, tempfile, time
+
+start = time.perf_counter()
+import ocr_cli
+from simple_ocr import SimpleOCR
+import_s = time.perf_counter() - start
+
+workdir = tempfile.mkdtemp()
+start = time.perf_counter()
+ocr = SimpleOCR(cache_dir=os.path.join(workdir, "cache"))
+construct_s = time.perf_counter() - start
+stats = {
+    "import_s": import_s,
+    "construct_s": construct_s,
+    "loaded_after_init": [m for m in HEAVY if m in sys.modules]
+}
+'''
+
+# A cache hit must not touch the OCR engine
+CACHE_HIT = r'''
+image_path = os.path.join(workdir, "page.png")
+with open(image_path, "wb") as f:
+    f.write(os.urandom(4096))
+ocr._cache_result(ocr._get_cache_key(image_path), {
+    "success": True, "file_path": image_path, "combined": {"full_text": "cached", "text_blocks": [], "rows": []}
+})
+result = asyncio.run(ocr.extract_from_document(image_path))
+stats["ok"] = result.get("combined", {}).get("full_text") == "cached"
+stats["loaded"] = [m for m in HEAVY if m in sys.modules]
+print(json.dumps(stats))
+'''
+
+# Nor does a PDF whose pages all have a text layer
+TEXT_PDF = r'''
+import fitz
+pdf_path = os.path.join(workdir, "text.pdf")
+doc = fitz.open()
+page = doc.new_page()
+lines = ["ACME Industrial Supplies Ltd", "PURCHASE ORDER", "PO Number: PO-1234", "Date: 2024-03-15",
+         "Item Description Qty Price", "Steel bolts M8 100 12.50", "Hex nuts M8 200 4.75",
+         "Washers 8mm 300 3.20", "Total: 20.45"]
+for i, line in enumerate(lines):
+    page.insert_text((72, 72 + 20 * i), line, fontsize=11)
+doc.save(pdf_path)
+doc.close()
+result = asyncio.run(ocr.extract_from_document(pdf_path))
+stats["ok"] = result.get("success") and "PO-1234" in result.get("combined", {}).get("full_text", "")
+stats["method"] = result.get("processing_method")
+stats["loaded"] = [m for m in HEAVY if m in sys.modules]
+print(json.dumps(stats))
+'''
+
+
+def slowest_imports(importtime_log: str, count: int = 10):
+    """Top cumulative entries from python -X importtime output"""
+    entries = []
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        entries.append((int(cumulative), name.strip()))
+    return sorted(entries, reverse=True)[:count]
+
+
+def run_probe(body: str):
+    """Run STARTUP + body in a fresh interpreter; returns (stats, importtime log)"""
+    env = dict(os.environ, PYTHONPATH=AI_DIR)
+    probe = f"HEAVY = {HEAVY_MODULES!r}\n" + STARTUP + body
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe],
+                          cwd=AI_DIR, env=env, capture_output=True, text=True)
+    errors = [line for line in proc.stderr.splitlines() if not line.startswith('import time:')]
+    assert proc.returncode == 0, "Probe failed:\n" + "\n".join(errors[-20:])
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def check_budget(stats, importtime_log: str, path: str):
+    budget = float(os.environ.get('OCR_IMPORT_BUDGET', DEFAULT_BUDGET))
+    startup = stats['import_s'] + stats['construct_s']
+    slowest = "\n".join(f"  {cumulative:>9}  {name}" for cumulative, name in slowest_imports(importtime_log))
+    assert startup <= budget, \
+        f"startup took {startup:.3f}s (budget {budget:.3f}s); slowest imports (cumulative µs):\n{slowest}"
+    assert not stats['loaded_after_init'], f"loaded at startup: {', '.join(stats['loaded_after_init'])}"
+    assert not stats['loaded'], f"loaded by a {path}: {', '.join(stats['loaded'])}"
+
+
+def test_cache_hit_stays_light():
+    stats, log = run_probe(CACHE_HIT)
+    assert stats['ok'], "cache hit did not return the cached result"
+    check_budget(stats, log, "cache hit")
+
+
+def test_text_layer_pdf_stays_light():
+    stats, log = run_probe(TEXT_PDF)
+    assert stats['ok'], "text-layer PDF was not read"
+    assert stats['method'] == 'text_extraction'
+    check_budget(stats, log, "text-layer PDF")
+
+
+if __name__ == '__main__':
+    tests = [name for name in sorted(globals()) if name.startswith('test_')]
+    for name in tests:
+        globals()[name]()
+        print(f"✅ {name}")
+    print(f"{len(tests)} import budget tests passed")
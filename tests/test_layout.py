@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Row grouping tests for ai/layout.py
+Runs under pytest or directly: python tests/test_layout.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ai'))
+
+from layout import build_page_structure
+
+
+def _quad(x, y, width, height):
+    return [[x, y], [x + width, y], [x + width, y + height], [x, y + height]]
+
+
+def _layout(lines, blocks_per_line, line_pitch, drift, width=100, height=30, gap=20):
+    boxes, texts = [], []
+    for line in range(lines):
+        for block in range(blocks_per_line):
+            boxes.append(_quad(block * (width + gap), line * line_pitch + block * drift, width, height))
+            texts.append(f"L{line}B{block}")
+    return boxes, texts
+
+
+def row_texts(structure):
+    return [[block["text"] for block in row] for row in structure["rows"]]
+
+
+def test_level_lines():
+    boxes, texts = _layout(lines=3, blocks_per_line=4, line_pitch=45, drift=0)
+    structure = build_page_structure(boxes, texts, [0.9] * len(texts))
+    assert row_texts(structure) == [[f"L{line}B{block}" for block in range(4)] for line in range(3)]
+
+
+def test_skewed_lines_stay_separate():
+    # 12px drift per block adds up to more than a line pitch across the row
+    boxes, texts = _layout(lines=3, blocks_per_line=6, line_pitch=45, drift=12)
+    structure = build_page_structure(boxes, texts, [0.9] * len(texts))
+    assert row_texts(structure) == [[f"L{line}B{block}" for block in range(6)] for line in range(3)]
+
+
+def test_skew_upwards():
+    boxes, texts = _layout(lines=3, blocks_per_line=6, line_pitch=45, drift=-12)
+    structure = build_page_structure(boxes, texts, [0.9] * len(texts))
+    assert row_texts(structure) == [[f"L{line}B{block}" for block in range(6)] for line in range(3)]
+
+
+def test_rows_ordered_top_to_bottom_and_left_to_right():
+    # Input in scrambled order
+    boxes, texts = _layout(lines=2, blocks_per_line=3, line_pitch=60, drift=5)
+    order = [4, 0, 5, 2, 1, 3]
+    structure = build_page_structure([boxes[i] for i in order], [texts[i] for i in order], [0.9] * 6)
+    assert row_texts(structure) == [["L0B0", "L0B1", "L0B2"], ["L1B0", "L1B1", "L1B2"]]
+    # full_text keeps the input order
+    assert structure["full_text"] == " ".join(texts[i] for i in order)
+
+
+def test_empty_page():
+    structure = build_page_structure([], [], [])
+    assert structure["rows"] == [] and structure["total_blocks"] == 0
+
+
+def test_large_skewed_page():
+    # 1,500 blocks: rows stay exact and layout building stays well under a frame budget
+    boxes, texts = _layout(lines=60, blocks_per_line=25, line_pitch=45, drift=3)
+    start = time.perf_counter()
+    structure = build_page_structure(boxes, texts, [0.9] * len(texts))
+    elapsed = time.perf_counter() - start
+    assert row_texts(structure) == [[f"L{line}B{block}" for block in range(25)] for line in range(60)]
+    assert elapsed < 0.25, f"build_page_structure took {elapsed:.3f}s for {len(texts)} blocks"
+
+
+if __name__ == '__main__':
+    tests = [name for name in sorted(globals()) if name.startswith('test_')]
+    for name in tests:
+        globals()[name]()
+        print(f"✅ {name}")
+    print(f"{len(tests)} layout tests passed")
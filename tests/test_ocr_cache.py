@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Eviction, expiry, counter and digest table tests for ai/ocr_cache.py
+Runs under pytest or directly: python tests/test_ocr_cache.py
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ai'))
+
+import ocr_cache
+from ocr_cache import CacheStore
+
+
+class Clock:
+    """Stands in for the time module so access order and ages are exact"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def tick(self, seconds=1.0):
+        self.now += seconds
+
+
+@contextmanager
+def cache_store(**options):
+    clock = Clock()
+    real_time = ocr_cache.time
+    ocr_cache.time = clock
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CacheStore(os.path.join(tmp, "cache.db"), **options)
+        try:
+            yield store, clock
+        finally:
+            store.close()
+            ocr_cache.time = real_time
+
+
+def keys(store):
+    return sorted(key for (key,) in store._conn.execute("SELECT key FROM entries"))
+
+
+def test_evicts_least_recently_used():
+    with cache_store(max_bytes=1000) as (store, clock):
+        for key in ("a", "b", "c"):
+            store.put(key, b"x" * 300)
+            clock.tick()
+        # Reading "a" makes "b" the least recently used
+        assert store.get("a") is not None
+        clock.tick()
+        store.put("d", b"x" * 300)
+        assert keys(store) == ["a", "c", "d"]
+        assert store.counters["evictions"] == 1
+        assert store.stats()["total_bytes"] == 900
+
+
+def test_evicts_down_to_ninety_percent():
+    with cache_store(max_bytes=1000) as (store, clock):
+        for key in "abcdefghij":
+            store.put(key, b"x" * 100)
+            clock.tick()
+        store.put("k", b"x" * 100)
+        # 1100 bytes: the two oldest go to get under 900
+        assert keys(store) == list("cdefghijk")
+        assert store.counters["evictions"] == 2
+
+
+def test_expired_entries_are_misses():
+    with cache_store(max_age_seconds=10) as (store, clock):
+        store.put("k", b"value")
+        clock.tick(5)
+        assert store.get("k") == b"value"
+        clock.tick(6)
+        assert store.get("k") is None
+        assert store.counters["evictions"] == 1
+        assert store.stats()["entries"] == 0
+
+
+def test_counters():
+    with cache_store() as (store, clock):
+        store.put("k", b"12345")
+        store.put("other", b"123", namespace="pdf")
+        assert store.get("k") == b"12345"
+        assert store.get("k") == b"12345"
+        assert store.get("missing") is None
+        # Namespaces are separate
+        assert store.get("other") is None
+        stats = store.stats()
+        assert (stats["hits"], stats["misses"], stats["writes"]) == (2, 2, 2)
+        assert stats["bytes_read"] == 10 and stats["bytes_written"] == 8
+        assert stats["hit_ratio"] == 0.5
+        assert stats["entries"] == 2 and stats["total_bytes"] == 8
+
+
+def test_running_total_follows_replace_delete_and_expiry():
+    with cache_store(max_age_seconds=10) as (store, clock):
+        store.put("a", b"x" * 600)
+        store.put("a", b"x" * 200)
+        store.put("b", b"x" * 300)
+        store.delete("b")
+        store.delete("missing")
+        assert store._size == store.stats()["total_bytes"] == 200
+        clock.tick(11)
+        store.get("a")
+        assert store._size == store.stats()["total_bytes"] == 0
+
+
+def test_shared_file_resyncs_before_evicting():
+    with cache_store(max_bytes=1000) as (store, clock):
+        store.put("ours", b"x" * 600)
+        other = CacheStore(store.db_path, max_bytes=1000)
+        try:
+            # Another process drops the entry: our count is now 600 too high
+            other.delete("ours")
+            clock.tick()
+            store.put("new", b"x" * 500)
+            # 1100 by our count, 500 in the file: nothing is evicted
+            assert keys(store) == ["new"]
+            assert store.counters["evictions"] == 0
+            assert store._size == 500
+        finally:
+            other.close()
+
+
+def write_files(directory, count):
+    paths = []
+    for n in range(count):
+        path = os.path.join(directory, f"scan{n}.png")
+        with open(path, "wb") as f:
+            f.write(b"page %d" % n)
+        paths.append(path)
+    return paths
+
+
+def digest_paths(store):
+    return sorted(os.path.basename(path) for (path,) in store._conn.execute("SELECT path FROM file_digests"))
+
+
+def test_digest_table_prunes_least_recently_used_paths():
+    with cache_store(max_digests=10) as (store, clock):
+        paths = write_files(os.path.dirname(store.db_path), 12)
+        for path in paths[:10]:
+            store.file_digest(path)
+            clock.tick()
+        # A lookup keeps scan0 recent, so scan1 and scan2 are the oldest
+        store.file_digest(paths[0])
+        clock.tick()
+        store.file_digest(paths[10])
+        # 11 rows: pruned down to 9
+        assert digest_paths(store) == sorted(f"scan{n}.png" for n in [0] + list(range(3, 11)))
+        clock.tick()
+        store.file_digest(paths[11])
+        assert store._digests == store.stats()["file_digests"] == 10
+        # A forgotten path is simply hashed again
+        assert store.file_digest(paths[1]) == ocr_cache.file_digest(paths[1])
+
+
+def test_digest_table_from_older_cache_gains_used_column():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE file_digests (path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                     "mtime_ns INTEGER NOT NULL, ino INTEGER NOT NULL, digest TEXT NOT NULL)")
+        conn.execute("INSERT INTO file_digests VALUES ('/gone.png', 1, 1, 1, 'b2-00')")
+        conn.commit()
+        conn.close()
+        store = CacheStore(db_path, max_digests=1)
+        try:
+            path = write_files(tmp, 1)[0]
+            store.file_digest(path)
+            # The old row sorts first (used = 0) and is the one pruned
+            assert digest_paths(store) == ["scan0.png"]
+        finally:
+            store.close()
+
+
+if __name__ == '__main__':
+    tests = [name for name in sorted(globals()) if name.startswith('test_')]
+    for name in tests:
+        globals()[name]()
+        print(f"✅ {name}")
+    print(f"{len(tests)} cache tests passed")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Render lifetime tests for ai/pdf_session.py
+Runs under pytest or directly: python tests/test_pdf_session.py
+"""
+
+import gc
+import os
+import sys
+import tempfile
+import weakref
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ai'))
+
+import fitz  # PyMuPDF
+
+from pdf_session import PDFSession
+
+
+def write_pages(path, count):
+    doc = fitz.open()
+    for n in range(count):
+        doc.new_page().insert_text((72, 72), f"Page {n + 1}", fontsize=11)
+    doc.save(path)
+    doc.close()
+
+
+def test_render_freed_once_caller_drops_it():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "doc.pdf")
+        write_pages(path, 3)
+        with PDFSession(path) as session:
+            refs = []
+            for page_num in range(1, 4):
+                array = session.render_array(page_num, 72)
+                assert array.shape[2] == 3 and not array.flags.writeable
+                refs.append(weakref.ref(array))
+                del array
+            gc.collect()
+            # The session holds no page buffers between renders
+            assert all(ref() is None for ref in refs)
+
+
+def test_grayscale_render_matches_page_size():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "doc.pdf")
+        write_pages(path, 1)
+        with PDFSession(path) as session:
+            image = session.render(1, 72, grayscale=True)
+            rect = session.page(1).rect
+            assert image.mode == "L" and image.size == (round(rect.width), round(rect.height))
+
+
+if __name__ == '__main__':
+    tests = [name for name in sorted(globals()) if name.startswith('test_')]
+    for name in tests:
+        globals()[name]()
+        print(f"✅ {name}")
+    print(f"{len(tests)} PDF session tests passed")
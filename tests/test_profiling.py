@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Concurrency tests for ai/profiling.py
+Runs under pytest or directly: python tests/test_profiling.py
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ai'))
+
+from profiling import DocumentProfiler
+
+
+def busy(n=20000):
+    return sum(i * i for i in range(n))
+
+
+def test_overlapping_documents_share_one_cprofile():
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = DocumentProfiler(tmp, memory=False)
+        inside = threading.Barrier(2, timeout=10)
+        captures, errors = [], []
+
+        def document(label):
+            try:
+                with profiler.profile(label) as capture:
+                    inside.wait()
+                    busy()
+                    inside.wait()
+                captures.append(capture)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=document, args=(f"doc{n}.pdf",)) for n in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors, errors
+        with_cprofile = [c for c in captures if "cprofile" in c]
+        assert len(with_cprofile) == 1 and os.path.exists(with_cprofile[0]["cprofile"])
+        other = next(c for c in captures if "cprofile" not in c)
+        assert other["cprofile_skipped"] and "top_functions" not in other
+        # Both still get the process-wide stack samples
+        assert all(os.path.exists(c["collapsed"]) for c in captures)
+
+
+def test_cprofile_released_after_document_fails():
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = DocumentProfiler(tmp, memory=False)
+        try:
+            with profiler.profile("broken.pdf"):
+                raise RuntimeError("OCR failed")
+        except RuntimeError:
+            pass
+        with profiler.profile("next.pdf") as capture:
+            busy()
+        assert "cprofile_skipped" not in capture
+        assert any(f["function"].startswith("busy ") for f in capture["top_functions"])
+
+
+def test_nested_call_belongs_to_outer_document():
+    with tempfile.TemporaryDirectory() as tmp:
+        profiler = DocumentProfiler(tmp, memory=False)
+        with profiler.profile("outer.pdf") as outer:
+            with profiler.profile("inner.pdf") as inner:
+                busy()
+        assert inner is None and "cprofile" in outer
+        assert (profiler.documents, profiler.profiled) == (1, 1)
+
+
+if __name__ == '__main__':
+    tests = [name for name in sorted(globals()) if name.startswith('test_')]
+    for name in tests:
+        globals()[name]()
+        print(f"✅ {name}")
+    print(f"{len(tests)} profiling tests passed")
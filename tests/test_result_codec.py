@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for ai/result_codec.py
+Runs under pytest or directly: python tests/test_result_codec.py
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ai'))
+
+import result_codec
+from layout import build_page_structure
+from result_codec import LazyResult, decode_result, encode_result
+
+
+def _quad(x, y, width=80, height=20):
+    return [[x, y], [x + width, y], [x + width, y + height], [x, y + height]]
+
+
+def sample_result(float_boxes=False):
+    """A two-page result shaped like SimpleOCR's, sharing block dicts between lists"""
+    pages = []
+    for page in range(2):
+        boxes = [_quad(10 + 100 * i, 15 + 40 * row) for row in range(2) for i in range(3)]
+        texts = [f"p{page}r{row}w{i}" for row in range(2) for i in range(3)]
+        bboxes = None
+        if float_boxes:
+            # EasyOCR free-form boxes come back with float corners
+            bboxes = [[[x + 0.25, y + 0.5] for x, y in box] for box in boxes]
+        structure = build_page_structure(boxes, texts, np.linspace(0.5, 0.99, len(texts)).round(3), bboxes)
+        structure["page_number"] = page + 1
+        pages.append(structure)
+    return {
+        "success": True,
+        "file_path": "/tmp/doc.pdf",
+        "total_pages": 2,
+        "pages": pages,
+        "combined": {
+            "full_text": " ".join(p["full_text"] for p in pages),
+            "text_blocks": [b for p in pages for b in p["text_blocks"]],
+            "rows": [r for p in pages for r in p["rows"]],
+            "total_text_blocks": sum(p["total_blocks"] for p in pages)
+        },
+        "engines": {"easyocr": 2}
+    }
+
+
+@contextmanager
+def json_codec():
+    saved = result_codec.HAS_MSGPACK
+    result_codec.HAS_MSGPACK = False
+    try:
+        yield
+    finally:
+        result_codec.HAS_MSGPACK = saved
+
+
+def _encode_json(result):
+    with json_codec():
+        return encode_result(result)
+
+
+def codec_of(data):
+    return result_codec._PREFIX.unpack_from(data)[2]
+
+
+def test_msgpack_round_trip():
+    if not result_codec.HAS_MSGPACK:
+        return
+    result = sample_result()
+    data = encode_result(result)
+    assert codec_of(data) == result_codec._CODEC_MSGPACK
+    assert decode_result(data) == result
+
+
+def test_json_fallback_round_trip():
+    result = sample_result()
+    data = _encode_json(result)
+    assert codec_of(data) == result_codec._CODEC_JSON
+    assert decode_result(data) == result
+
+
+def test_float_bboxes_kept():
+    for encode in (encode_result, _encode_json):
+        result = sample_result(float_boxes=True)
+        decoded = decode_result(encode(result))
+        assert decoded == result
+        assert decoded["pages"][0]["text_blocks"][0]["bbox"][0] == [10.25, 15.5]
+
+
+def test_integer_bboxes_stay_integers_next_to_float_ones():
+    result = sample_result()
+    block = result["pages"][0]["text_blocks"][0]
+    block["bbox"] = [[x + 0.5, y] for x, y in block["bbox"]]
+    decoded = decode_result(encode_result(result))
+    assert decoded == result
+    assert decoded["pages"][0]["text_blocks"][0]["bbox"][0] == [10.5, 15]
+    assert all(isinstance(v, int) for point in decoded["pages"][1]["text_blocks"][0]["bbox"] for v in point)
+
+
+def test_widths_from_truncated_extents_survive():
+    # int(max - min) differs from int(max) - int(min) for fractional boxes
+    structure = build_page_structure([_quad(0.6, 0.6, 9.8, 9.8)], ["w"], [0.9])
+    result = {"success": True, "pages": [structure], "combined": {"full_text": "w"}}
+    position = decode_result(encode_result(result))["pages"][0]["text_blocks"][0]["position"]
+    assert position == structure["text_blocks"][0]["position"]
+    assert position["width"] == 9 and position["x_max"] - position["x_min"] == 10
+
+
+def test_missing_bbox_kept():
+    result = sample_result()
+    result["pages"][0]["text_blocks"][0]["bbox"] = None
+    assert decode_result(encode_result(result)) == result
+
+
+def test_shared_blocks_decode_to_shared_dicts():
+    decoded = decode_result(encode_result(sample_result()))
+    page_blocks = [b for p in decoded["pages"] for b in p["text_blocks"]]
+    assert all(a is b for a, b in zip(page_blocks, decoded["combined"]["text_blocks"]))
+    row_blocks = {id(b) for p in decoded["pages"] for row in p["rows"] for b in row}
+    assert row_blocks == {id(b) for b in page_blocks}
+
+
+def test_blocks_stored_once():
+    result = sample_result()
+    lazy = LazyResult(encode_result(result))
+    assert lazy.block_count == sum(len(p["text_blocks"]) for p in result["pages"])
+
+
+def test_full_text_without_decoding_blocks():
+    result = sample_result()
+    data = bytearray(encode_result(result))
+    lazy = LazyResult(bytes(data))
+    # Garble the block columns: full_text must not touch them
+    offset, length = lazy._segments["texts"]
+    start = lazy._base + offset
+    data[start:start + length] = b"\xff" * length
+    lazy = LazyResult(bytes(data))
+    assert lazy.full_text == result["combined"]["full_text"]
+    assert lazy._blocks is None
+
+
+def test_numpy_values_encode_as_plain_types():
+    result = {"success": True, "total_pages": np.int64(1), "scale": np.float32(0.5),
+              "shape": np.array([2, 3]), "combined": {"full_text": ""}}
+    for encode in (encode_result, _encode_json):
+        assert decode_result(encode(result)) == {"success": True, "total_pages": 1, "scale": 0.5,
+                                                 "shape": [2, 3], "combined": {"full_text": ""}}
+
+
+def test_rejects_other_data():
+    try:
+        LazyResult(b"not a result at all")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+
+if __name__ == '__main__':
+    tests = [name for name in sorted(globals()) if name.startswith('test_')]
+    for name in tests:
+        globals()[name]()
+        print(f"✅ {name}")
+    print(f"{len(tests)} result codec tests passed")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Seam handling tests for ai/tiling.py
+Runs under pytest or directly: python tests/test_tiling.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ai'))
+
+from tiling import merge_tiles, tile_grid
+
+
+def _quad(x0, y0, x1, y1):
+    return [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+
+
+def read_tiles(words, origins, size):
+    """What a reader sees on each tile: every word inside it, clipped to the
+    tile edges, in tile coordinates; the confidence tells the tiles apart"""
+    results = []
+    for n, (left, top) in enumerate(origins):
+        tile = []
+        for text, (x0, y0, x1, y1) in words:
+            cx0, cy0 = max(x0, left), max(y0, top)
+            cx1, cy1 = min(x1, left + size), min(y1, top + size)
+            if cx0 < cx1 and cy0 < cy1:
+                tile.append((_quad(cx0 - left, cy0 - top, cx1 - left, cy1 - top), text, n / 10))
+        results.append(tile)
+    return results
+
+
+def merged(words, width, height, size=600, overlap=200):
+    origins = tile_grid(width, height, size, overlap)
+    return merge_tiles(read_tiles(words, origins, size), origins, size, width, height)
+
+
+def test_box_inside_overlap_emitted_once():
+    # Tiles start at x=0 and x=400, overlap 400..600, seam at 500
+    words = [("left-of-seam", (450, 100, 540, 130)), ("right-of-seam", (460, 200, 560, 230))]
+    results = merged(words, width=1000, height=400)
+    assert sorted(text for _, text, _ in results) == ["left-of-seam", "right-of-seam"]
+    by_text = {text: (bbox, conf) for bbox, text, conf in results}
+    # Global coordinates, whichever tile kept it
+    assert by_text["left-of-seam"] == (_quad(450, 100, 540, 130), 0.0)
+    assert by_text["right-of-seam"] == (_quad(460, 200, 560, 230), 0.1)
+
+
+def test_box_cut_by_tile_edge_keeps_whole_copy():
+    # Tile 0 ends at x=600 and sees a clipped piece; tile 1 sees it whole
+    words = [("cut", (540, 50, 680, 80))]
+    results = merged(words, width=1000, height=400)
+    assert results == [(_quad(540, 50, 680, 80), "cut", 0.1)]
+
+
+def test_line_longer_than_overlap_not_duplicated():
+    # Both tiles only see a clipped piece; the larger one is kept
+    words = [("long line", (350, 300, 700, 330))]
+    results = merged(words, width=1000, height=400)
+    assert [text for _, text, _ in results] == ["long line"]
+
+
+def test_box_in_four_tile_corner_emitted_once():
+    words = [("corner", (480, 480, 530, 510)), ("far", (900, 900, 950, 930))]
+    origins = tile_grid(1000, 1000, 600, 200)
+    assert len(origins) == 4
+    results = merged(words, width=1000, height=1000)
+    assert sorted((text, bbox) for bbox, text, _ in results) == [
+        ("corner", _quad(480, 480, 530, 510)),
+        ("far", _quad(900, 900, 950, 930))
+    ]
+
+
+def test_single_tile_page_unchanged():
+    words = [("a", (10, 10, 50, 30)), ("b", (60, 10, 90, 30))]
+    results = merged(words, width=500, height=300)
+    assert [(bbox, text) for bbox, text, _ in results] == [(_quad(10, 10, 50, 30), "a"), (_quad(60, 10, 90, 30), "b")]
+
+
+def test_overlapping_boxes_away_from_seams_kept():
+    # Only copies seen from two tiles are duplicates; one tile's own
+    # overlapping detections (e.g. a stamp over text) are left alone
+    words = [("text", (100, 100, 300, 130)), ("stamp", (120, 95, 200, 135))]
+    results = merged(words, width=1000, height=400)
+    assert sorted(text for _, text, _ in results) == ["stamp", "text"]
+
+
+def test_dense_page_merges_quickly():
+    # 4,000 words on a 4x4-tile page: only boxes in the seam bands are compared
+    words = [(f"w{row}-{col}", (5 + 34 * col, 5 + 21 * row, 33 + 34 * col, 21 + 21 * row))
+             for row in range(80) for col in range(50)]
+    start = time.perf_counter()
+    results = merged(words, width=1710, height=1690)
+    elapsed = time.perf_counter() - start
+    assert sorted(text for _, text, _ in results) == sorted(text for text, _ in words)
+    assert elapsed < 1.0, f"merge_tiles took {elapsed:.2f}s for {len(words)} words"
+
+
+if __name__ == '__main__':
+    tests = [name for name in sorted(globals()) if name.startswith('test_')]
+    for name in tests:
+        globals()[name]()
+        print(f"✅ {name}")
+    print(f"{len(tests)} tiling tests passed")